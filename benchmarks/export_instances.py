@@ -0,0 +1,105 @@
+"""
+Benchmark `crud.export_instances`: rows/sec and peak memory per format,
+compared to paging through `crud.list_instances`.
+
+Usage:
+    python benchmarks/export_instances.py [--rows 100000] [--url URL]
+
+The default database is an in-memory sqlite3 database.  The arrow and
+parquet formats are skipped unless pyarrow is installed.
+"""
+import time
+import asyncio
+import argparse
+import tracemalloc
+
+import sqlalchemy
+from sqlalchemy.pool import StaticPool
+
+from fastapi_sqlalchemy import crud, models
+
+from list_instances import Item, _load  # pylint: disable=import-error
+
+FORMATS = ("csv", "ndjson", "arrow", "parquet")
+
+
+async def _export(session, fmt: str, chunk_size: int) -> int:
+    response = await crud.export_instances(
+        Item, session, format=fmt, chunk_size=chunk_size
+    )
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+
+async def _paginate(session, page_size: int) -> int:
+    """ The alternative: paging through list_instances """
+    offset = 0
+    while True:
+        page = await crud.list_instances(
+            Item, session, offset=offset, limit=page_size
+        )
+        session.expunge_all()
+        if not page:
+            return offset
+        offset += len(page)
+
+
+def _measure(coroutine):
+    loop = asyncio.new_event_loop()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = loop.run_until_complete(coroutine)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    loop.close()
+    return result, elapsed, peak
+
+
+def main():
+    """ Run the benchmark and print the results """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    engine = sqlalchemy.create_engine(
+        args.url,
+        connect_args={"check_same_thread": False}
+        if args.url.startswith("sqlite") else {},
+        poolclass=StaticPool,
+    )
+    table = sqlalchemy.inspect(Item).local_table
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+
+    session = models.Session(bind=engine)
+    _load(session, args.rows)
+
+    print(f"rows: {args.rows}")
+    _, elapsed, peak = _measure(_paginate(session, args.chunk_size))
+    print(f"list_instances pages: {args.rows / elapsed:12,.0f} rows/sec "
+          f"peak {peak / 2 ** 20:8.1f} MiB")
+
+    for fmt in FORMATS:
+        # pylint: disable=protected-access
+        if fmt in crud.bulk_export._ARROW_FORMATS \
+                and crud.bulk_export.pyarrow is None:
+            print(f"{fmt:20}: skipped (pyarrow is not installed)")
+            continue
+        size, elapsed, peak = _measure(
+            _export(session, fmt, args.chunk_size)
+        )
+        print(f"{fmt:20}: {args.rows / elapsed:12,.0f} rows/sec "
+              f"peak {peak / 2 ** 20:8.1f} MiB "
+              f"size {size / 2 ** 20:8.1f} MiB")
+
+    table.drop(engine)
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark `crud.list_instances`: rows/sec of the ORM and read-only paths.
+
+Usage:
+    python benchmarks/list_instances.py [--rows 20000] [--repeat 5] [--url URL]
+
+The default database is an in-memory sqlite3 database.
+"""
+import time
+import uuid
+import asyncio
+import argparse
+
+import sqlalchemy
+from sqlalchemy.pool import StaticPool
+
+from fastapi_sqlalchemy import crud, models
+
+
+class Item(models.BASE, models.GuidMixin, models.TimestampMixin):
+    """ Table with a typical mix of column types """
+    __tablename__ = "benchmark_items"
+
+    name = sqlalchemy.Column(sqlalchemy.String(255), nullable=False)
+    count = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+    enabled = sqlalchemy.Column(sqlalchemy.Boolean, nullable=False)
+    data = sqlalchemy.Column(models.JSON_TYPE)
+
+
+def _load(session, rows: int):
+    session.bulk_insert_mappings(Item, [
+        {
+            "id": uuid.UUID(int=index),
+            "name": f"item {index}",
+            "count": index,
+            "enabled": index % 2 == 0,
+            "data": {"index": index},
+        }
+        for index in range(rows)
+    ])
+    session.commit()
+
+
+def _run(session, repeat: int, **kwargs) -> float:
+    loop = asyncio.new_event_loop()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = loop.run_until_complete(
+            crud.list_instances(Item, session, **kwargs)
+        )
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        session.expunge_all()
+    loop.close()
+    return len(result) / best
+
+
+def main():
+    """ Run the benchmark and print the results """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = sqlalchemy.create_engine(
+        args.url,
+        connect_args={"check_same_thread": False}
+        if args.url.startswith("sqlite") else {},
+        poolclass=StaticPool,
+    )
+    table = sqlalchemy.inspect(Item).local_table
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+
+    session = models.Session(bind=engine)
+    _load(session, args.rows)
+
+    orm = _run(session, args.repeat)
+    read_only = _run(session, args.repeat, read_only=True)
+    fields = _run(session, args.repeat, fields=["id", "name"])
+
+    print(f"rows: {args.rows}")
+    print(f"orm:              {orm:12,.0f} rows/sec")
+    print(f"read_only:        {read_only:12,.0f} rows/sec "
+          f"({read_only / orm:.1f}x)")
+    print(f"fields=[id,name]: {fields:12,.0f} rows/sec "
+          f"({fields / orm:.1f}x)")
+
+    table.drop(engine)
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
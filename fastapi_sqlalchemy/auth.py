@@ -8,10 +8,11 @@ from fastapi import status
 from starlette.authentication import (
     AuthenticationBackend, AuthCredentials, SimpleUser
 )
-from starlette.concurrency import run_in_threadpool
 from starlette.exceptions import HTTPException
 from starlette.requests import HTTPConnection
 
+from fastapi_sqlalchemy import concurrency
+
 ADMIN_SCOPE = "*"
 
 logger = logging.getLogger(__name__)
@@ -74,8 +75,8 @@ class PayloadAuthBackend(AuthenticationBackend):
                     "try adding 'middleware.SessionMiddleware'"
                 )
 
-            user = await run_in_threadpool(
-                self.user_cls.get_by_username, session, username
+            user = await concurrency.run_sync(
+                session, self.user_cls.get_by_username, username
             )
             if not user:
                 logger.warning("User not found: %s", username)
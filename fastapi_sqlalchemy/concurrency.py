@@ -0,0 +1,164 @@
+"""
+Running synchronous ORM code from async code.
+
+The ORM (Query, Session) is synchronous, so database code is written as
+functions of a synchronous session.  With a regular `Session`, they run
+in a thread pool.  With an `AsyncSession` (SQLAlchemy 1.4+), they run in
+the event loop using `AsyncSession.run_sync`: the async driver is awaited
+directly, without a thread per request.
+
+The threads are those of a `DatabaseExecutor`, separate from the thread
+pool used by Starlette for other synchronous work and sized to the
+connection pool (see `SessionMiddleware`): threads never wait for a
+connection, calls wait in the executor queue instead, where it is measured.
+"""
+import os
+import time
+import typing
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import Session
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession
+except ImportError:  # sqlalchemy < 1.4
+    AsyncSession = None
+
+
+# ThreadPoolExecutor default, if the size of the connection pool is unknown
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class DatabaseExecutor:
+    """Thread pool dedicated to database work, with metrics."""
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self._executor = ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix="database"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    async def run(
+            self,
+            func: typing.Callable,
+            *args,
+            **kwargs
+    ) -> typing.Any:
+        """Call `func(*args, **kwargs)` in the executor.
+
+        If the caller is cancelled while the call is still queued, func is
+        not called at all.
+        """
+        loop = asyncio.get_event_loop()
+        context = contextvars.copy_context()
+        submitted = time.monotonic()
+        state = {"started": False, "cancelled": False}
+        with self._lock:
+            self.queued += 1
+
+        def _call():
+            wait_time = time.monotonic() - submitted
+            with self._lock:
+                if state["cancelled"]:
+                    return None
+                state["started"] = True
+                self.queued -= 1
+                self.active += 1
+                self.wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+            try:
+                return context.run(func, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        try:
+            return await loop.run_in_executor(self._executor, _call)
+        except asyncio.CancelledError:
+            with self._lock:
+                if not state["started"]:
+                    state["cancelled"] = True
+                    self.queued -= 1
+            raise
+
+    def metrics(self) -> typing.Dict[str, typing.Any]:
+        """Executor statistics: queue depth and wait times in seconds."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shutdown the threads, once the pending calls are complete."""
+        self._executor.shutdown(wait=wait)
+
+
+__LOCK = threading.Lock()
+
+__EXECUTOR: typing.Optional[DatabaseExecutor] = None
+
+
+def get_executor() -> DatabaseExecutor:
+    """The executor of all synchronous database work."""
+    global __EXECUTOR  # pylint: disable=global-statement
+    with __LOCK:
+        if __EXECUTOR is None:
+            __EXECUTOR = DatabaseExecutor()
+        return __EXECUTOR
+
+
+def configure_executor(max_workers: int = None) -> DatabaseExecutor:
+    """Replace the executor with one of max_workers threads.
+
+    Calls already submitted to the previous executor still complete.
+    """
+    global __EXECUTOR  # pylint: disable=global-statement
+    with __LOCK:
+        previous = __EXECUTOR
+        __EXECUTOR = DatabaseExecutor(max_workers)
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return __EXECUTOR
+
+
+def is_async(session) -> bool:
+    """Whether session is an `AsyncSession`."""
+    return AsyncSession is not None and isinstance(session, AsyncSession)
+
+
+def sync_session(session) -> Session:
+    """The synchronous `Session` of session, to build queries with.
+
+    NOTE: the queries of an `AsyncSession` may only be executed by
+    `run_sync`.
+    """
+    if is_async(session):
+        return session.sync_session
+    return session
+
+
+async def run_sync(
+        session,
+        func: typing.Callable,
+        *args,
+        **kwargs
+) -> typing.Any:
+    """Call `func(session, *args, **kwargs)` with the synchronous session."""
+    if is_async(session):
+        return await session.run_sync(func, *args, **kwargs)
+    return await get_executor().run(func, session, *args, **kwargs)
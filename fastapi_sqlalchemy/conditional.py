@@ -0,0 +1,100 @@
+"""
+HTTP conditional requests: validators (ETag, Last-Modified) and 304 responses.
+
+Usage:
+>>> etag = conditional.weak_etag("people", count, last_modified)
+>>> if conditional.not_modified(request, etag, last_modified):
+...     return conditional.not_modified_response(etag, last_modified)
+"""
+import hashlib
+import typing
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from fastapi_sqlalchemy import tz
+
+
+def weak_etag(*values) -> str:
+    """Build a weak ETag from the values that identify a representation."""
+    data = "\x1f".join(str(value) for value in values).encode("utf-8")
+    return 'W/"' + hashlib.sha1(data).hexdigest() + '"'
+
+
+def last_modified_utc(value: tz.datetime) -> typing.Optional[tz.datetime]:
+    """UTC timestamp of value, at the one second resolution of HTTP dates.
+
+    Naive values are assumed to be UTC, as stored by `TimestampMixin`.
+    """
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz.UTC)
+    return tz.as_utc(value).replace(microsecond=0)
+
+
+def headers(
+        etag: str,
+        last_modified: tz.datetime = None,
+) -> typing.Dict[str, str]:
+    """The ETag and Last-Modified response headers."""
+    result = {"ETag": etag}
+    last_modified = last_modified_utc(last_modified)
+    if last_modified is not None:
+        result["Last-Modified"] = format_datetime(
+            last_modified.replace(tzinfo=timezone.utc), usegmt=True
+        )
+    return result
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """Weak comparison of etag with an If-None-Match header."""
+    if if_none_match.strip() == "*":
+        return True
+
+    def _opaque(value: str) -> str:
+        value = value.strip()
+        return value[2:] if value.startswith("W/") else value
+
+    return _opaque(etag) in {
+        _opaque(value) for value in if_none_match.split(",")
+    }
+
+
+def not_modified(
+        request: Request,
+        etag: str,
+        last_modified: tz.datetime = None,
+) -> bool:
+    """Whether request is a conditional GET that the validators satisfy.
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 7232).
+    """
+    if request.method not in ("GET", "HEAD"):
+        return False
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(etag, if_none_match)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = last_modified_utc(last_modified)
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError, IndexError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=tz.UTC)
+        return last_modified <= since
+    return False
+
+
+def not_modified_response(
+        etag: str,
+        last_modified: tz.datetime = None,
+) -> Response:
+    """An empty `304 Not Modified` response with the validators."""
+    return Response(status_code=304, headers=headers(etag, last_modified))
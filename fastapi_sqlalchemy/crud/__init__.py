@@ -0,0 +1,840 @@
+""" Generic CRUD operations """
+import asyncio
+import json
+from uuid import UUID
+from typing import List, Dict, Any, Tuple, Union
+
+
+import sqlalchemy
+import sqlalchemy.exc
+import sqlalchemy.orm
+from pydantic import BaseModel, PositiveInt
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+from .. import conditional, models, timeouts, types, tz
+from ..response_cache import touch
+from . import common
+
+# pylint: disable=unused-import
+from .common import QUERY_CACHE, RESPONSE_CACHE, MAX_BIND_PARAMS  # noqa
+from .aggregate import (  # noqa
+    AGGREGATES, aggregate_instances, approximate_count
+)
+from .batch import BatchOperation, batch_instances  # noqa
+from .bulk_export import stream_instances, export_instances  # noqa
+from .bulk_import import import_instances  # noqa
+from .pagination import paginate_instances  # noqa
+from .upsert import upsert_instances, upsert_instance  # noqa
+# pylint: enable=unused-import
+
+
+# NOTE: always use the session of the caller
+# i.e. don't us models.Session in the thread pool synchronous functions
+# This is necessary in sqlite3 (at least) to ensure consistency.
+#
+# The synchronous functions take the session as argument and are run by
+# `timeouts.run_sync` (see `concurrency.run_sync`), which passes the
+# synchronous session of an `AsyncSession`: queries must be built from that
+# session.  The default statement timeout of the session applies to all,
+# and the coroutines below take a timeout (in seconds) to override it.
+
+
+async def list_instances(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]] = None,
+        sort_spec: List[Dict[str, str]] = None,
+        offset: types.NonNegativeInt = 0,
+        limit: PositiveInt = None,
+        options: Any = None,
+        fields: List[str] = None,
+        read_only: bool = False,
+        cache: bool = False,
+        request: Request = None,
+        response: Response = None,
+        timeout: float = None,
+        include: List[str] = None,
+        search: str = None
+) -> Union[List[dict], Response]:
+    """ Return all instances of cls
+
+    With read_only, the rows are read with a Core SELECT and converted to
+    dicts directly, bypassing the ORM (identity map, instance state and
+    any `as_dict` override).  With fields, only the given columns are
+    selected - which implies read_only.  Options are then ignored.
+
+    With cache, the result is cached in `common.RESPONSE_CACHE` until instances
+    of cls are modified (not with options, which cannot be compared).
+
+    With request - for models with an `updated_at` column - a weak ETag is
+    computed from COUNT(*) and MAX(updated_at) of the matching rows first:
+    if the request is a satisfied conditional GET (If-None-Match only, see
+    `_list_etag`), a `304 Not Modified` response is returned without
+    loading the rows.  Otherwise the ETag header is set on response (if
+    given).  An index on updated_at keeps the MAX cheap.
+
+    The statements are limited to timeout seconds (default: that of the
+    `SessionMiddleware`) and cancelled if the client of request disconnects,
+    see `timeouts.run_sync`.
+
+    With include, the given relationships (e.g. `["groups.permissions"]`)
+    are loaded in one query per relationship - whatever the number of
+    instances - and nested in the result, see `_include_options`.  Since
+    the related rows are not tracked, the result is neither cached nor
+    validated then.
+
+    With search, only the instances matching the words of search in the
+    full-text indexed columns of cls are returned - ordered by relevance
+    unless sort_spec is given, see `models.fulltext`.
+    """
+    # pylint: disable=too-many-locals
+    columns = common.field_columns(cls, fields) if fields or read_only else []
+    include_options, tree = _include_options(cls, include)
+    _check_include(columns, tree)
+    common.check_search(cls, search)
+    key = common.cache_key(
+        cls, session, "list", filter_spec, sort_spec, offset, limit,
+        fields, read_only, search
+    ) if cache and not options and not tree else None
+
+    etag = None
+    if request is not None and hasattr(cls, "updated_at") and not tree:
+        etag = await timeouts.run_sync(
+            session, _list_etag, cls, filter_spec, search,
+            sort_spec, offset, limit, fields, read_only,
+            timeout=timeout, request=request
+        )
+        if conditional.not_modified(request, etag):
+            return conditional.not_modified_response(etag)
+
+    def _list(session):
+        query = common.QUERY_CACHE.query(cls, session, filter_spec, sort_spec)
+        query = common.search_query(cls, query, search, rank=not sort_spec)
+
+        if columns:
+            query = query.with_entities(*columns)
+        elif options:
+            query = query.options(options)
+        if include_options:
+            query = query.options(*include_options)
+
+        if limit:
+            query = query.limit(limit)
+        query = query.offset(offset)
+
+        if columns:
+            return _read_only(cls, session, query)
+        return [
+            _include_as_dict(instance, tree) for instance in query.all()
+        ]
+
+    data = await common.run_cached(
+        cls, session, key, _list, timeout=timeout, request=request
+    )
+    if etag is not None and response is not None:
+        response.headers.update(conditional.headers(etag))
+    return data
+
+
+def _list_etag(
+        session: models.Session,
+        cls: models.BASE,
+        filter_spec: List[Dict[str, Any]],
+        search: str,
+        *args
+) -> str:
+    """ The ETag of the instances of cls matching filter_spec (and search)
+
+    Computed from COUNT(*) and MAX(updated_at) of the matching rows, along
+    with args - the other arguments of the read.
+
+    NOTE: there is no Last-Modified: MAX(updated_at) does not change when a
+    row is deleted, unlike the COUNT(*) of the ETag.
+    """
+    query = common.search_query(
+        cls, common.QUERY_CACHE.query(cls, session, filter_spec), search
+    )
+    count, last_modified = query \
+        .with_entities(
+            sqlalchemy.func.count(), sqlalchemy.func.max(cls.updated_at)
+        ) \
+        .one()
+    etag = conditional.weak_etag(
+        cls.__tablename__, count, last_modified,
+        json.dumps([filter_spec, search, *args], sort_keys=True, default=str)
+    )
+    return etag
+
+
+def _instance_validators(
+        session: models.Session,
+        cls: models.BASE,
+        instance_id: UUID,
+        *args
+) -> Tuple[str, Any]:
+    """ The (ETag, Last-Modified) of an instance of cls (or None) """
+    query = session.query(cls.updated_at).filter(cls.id == instance_id)
+    last_modified = common.live(cls, query).scalar()
+    if last_modified is None:
+        return None
+    etag = conditional.weak_etag(
+        cls.__tablename__, instance_id, last_modified, *args
+    )
+    return etag, last_modified
+
+
+def _read_only(cls: models.BASE, session: models.Session, query) -> list:
+    """ Execute the column query as Core statement and convert the rows """
+    if session.autoflush:
+        session.flush()
+    # positional: looking cells up by Column builds an expression per cell
+    # with sqlalchemy 1.4
+    keys = [entity["name"] for entity in query.column_descriptions]
+    result = session.execute(query.statement)
+    return [
+        models.base.values_as_dict(cls, dict(zip(keys, row)))
+        for row in result
+    ]
+
+
+def _include_options(
+        cls: models.BASE,
+        include: List[str] = None
+) -> Tuple[list, dict]:
+    """ The loader options and the (nested) tree of the include paths
+
+    A path is a dot separated chain of relationships, each loaded for all
+    the parent instances at once by `selectinload`.  The last name may also
+    be an entry of the `__includes__` of the model instead: an attribute
+    computed from the relationship paths it maps to, which are loaded.
+    """
+    options = []
+    tree = {}
+    for path in include or ():
+        _include_path(cls, path, path.split("."), None, tree, options)
+    return options, tree
+
+
+def _include_path(
+        cls: models.BASE,
+        path: str,
+        names: List[str],
+        option: Any,
+        tree: dict,
+        options: list
+):
+    name, names = names[0], names[1:]
+    relationships = sqlalchemy.inspect(cls).relationships
+    if name in relationships:
+        attr = getattr(cls, name)
+        option = sqlalchemy.orm.selectinload(attr) if option is None \
+            else option.selectinload(attr)
+        subtree = tree.setdefault(name, {})
+        if names:
+            _include_path(
+                relationships[name].mapper.class_, path, names,
+                option, subtree, options
+            )
+        else:
+            options.append(option)
+        return
+
+    includes = getattr(cls, "__includes__", {})
+    if name not in includes or names:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid include: {path}"
+        )
+    tree.setdefault(name, {})
+    for include_path in includes[name]:
+        _include_path(
+            cls, path, include_path.split("."), option, {}, options
+        )
+
+
+def _include_as_dict(instance, tree: dict) -> dict:
+    """ `as_dict` of instance along with the included attributes """
+    result = instance.as_dict()
+    for name, subtree in tree.items():
+        value = getattr(instance, name)
+        if value is None:
+            result[name] = None
+        elif isinstance(value, models.BASE):
+            result[name] = _include_as_dict(value, subtree)
+        else:
+            result[name] = [
+                _include_as_dict(item, subtree) for item in value
+            ]
+    return result
+
+
+def _check_include(columns: list, tree: dict):
+    """ Included relationships require instances, i.e. no read_only """
+    if columns and tree:
+        raise HTTPException(
+            status_code=400,
+            detail="include cannot be combined with fields or read_only"
+        )
+
+
+async def list_with_total(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]] = None,
+        sort_spec: List[Dict[str, str]] = None,
+        offset: types.NonNegativeInt = 0,
+        limit: PositiveInt = None,
+        options: Any = None,
+        timeout: float = None
+) -> dict:
+    """ Return instances of cls as `data` along with the `total` count
+
+    The total is computed in the same statement by a COUNT(*) OVER ()
+    window, so a paginated listing costs a single query instead of
+    `list_instances` followed by `count_instances`.  Only when the page is
+    empty (offset past the end) is a separate count necessary.
+    """
+
+    def _list(session):
+        query = common.QUERY_CACHE.query(cls, session, filter_spec, sort_spec)
+        query = query.add_columns(
+            sqlalchemy.func.count().over().label("total")
+        )
+
+        if options:
+            query = query.options(options)
+
+        if limit:
+            query = query.limit(limit)
+        query = query.offset(offset)
+
+        rows = query.all()
+        if rows:
+            total = rows[0].total
+        elif offset:
+            total = common.QUERY_CACHE.query(cls, session, filter_spec).count()
+        else:
+            total = 0
+        return {
+            "data": [instance.as_dict() for instance, _ in rows],
+            "total": total,
+        }
+
+    return await timeouts.run_sync(session, _list, timeout=timeout)
+
+
+async def count_instances(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]] = None,
+        sort_spec: List[Dict[str, Any]] = None,
+        timeout: float = None,
+        search: str = None
+) -> int:
+    """ Total count of instances matching the given criteria
+
+    NOTE: sort_spec is accepted for symmetry with `list_instances`, but
+    ignored since the order does not affect the count.
+    """
+    # pylint: disable=unused-argument
+    common.check_search(cls, search)
+
+    def _count(session):
+        query = common.QUERY_CACHE.query(cls, session, filter_spec)
+        return common.search_query(cls, query, search).count()
+
+    return await timeouts.run_sync(session, _count, timeout=timeout)
+
+
+async def create_instance(
+        cls: models.BASE,
+        session: models.Session,
+        data: BaseModel,
+        timeout: float = None
+) -> dict:
+    """ Create an instances of cls with the provided data
+
+    The response is serialized after the INSERT is flushed but before the
+    commit expires the instance, which would otherwise be reloaded.
+    """
+    instance = cls(**data.dict())
+
+    def _create(session):
+        session.add(instance)
+        session.flush()
+        result = instance.as_dict()
+        session.commit()
+        return result
+
+    try:
+        return await timeouts.run_sync(session, _create, timeout=timeout)
+    except sqlalchemy.exc.IntegrityError as ex:
+        raise HTTPException(status_code=409, detail=str(ex.orig))
+
+
+def _filter_criterion(
+        cls: models.BASE,
+        filter_spec: List[Dict[str, Any]]
+):
+    """ The WHERE clause of filter_spec, which may only refer to cls """
+    criterion = common.QUERY_CACHE.criterion(cls, filter_spec)
+    if criterion is None:
+        return sqlalchemy.true()
+
+    tables = sqlalchemy.sql.util.find_tables(criterion, check_columns=True)
+    if set(tables) - {cls.__table__}:
+        raise HTTPException(
+            status_code=400,
+            detail=f"The filter may only refer to '{cls.__name__}'"
+        )
+    return criterion
+
+
+async def create_instances(
+        cls: models.BASE,
+        session: models.Session,
+        items: List[BaseModel],
+        batch_size: PositiveInt = 1000,
+        commit_per_batch: bool = False,
+        timeout: float = None
+) -> dict:
+    """ Create many instances of cls using batched, multi-row INSERTs
+
+    Each batch is inserted with executemany inside a SAVEPOINT.  If the
+    batch violates a constraint, its rows are retried one at a time so
+    that only the offending rows are rejected.  All rows are committed
+    at once, or after every batch if commit_per_batch is set.
+
+    The result contains the created rows as `data` and the rejected rows
+    as `errors`, each with the `index` of the item and the `detail`.
+    """
+    rows = [common.insert_values(cls, item.dict()) for item in items]
+
+    def _insert(session, batch: List[dict]):
+        savepoint = common.begin_nested(session)
+        try:
+            session.bulk_insert_mappings(cls, batch)
+            touch(session, cls)
+            savepoint.commit()
+        except sqlalchemy.exc.IntegrityError:
+            savepoint.rollback()
+            raise
+
+    def _create(session):
+        result = {"data": [], "errors": []}
+        indexes = range(len(rows))
+        for batch in common.batches(indexes, batch_size):
+            try:
+                _insert(session, [rows[index] for index in batch])
+                created = batch
+            except sqlalchemy.exc.IntegrityError:
+                created = []
+                for index in batch:
+                    try:
+                        _insert(session, [rows[index]])
+                        created.append(index)
+                    except sqlalchemy.exc.IntegrityError as ex:
+                        result["errors"].append(
+                            {"index": index, "detail": str(ex.orig)}
+                        )
+            result["data"].extend(
+                models.base.values_as_dict(cls, rows[index])
+                for index in created
+            )
+            if commit_per_batch:
+                session.commit()
+        session.commit()
+        return result
+
+    return await timeouts.run_sync(session, _create, timeout=timeout)
+
+
+async def retrieve_instance(
+        cls: models.BASE,
+        session: models.Session,
+        instance_id: UUID,
+        options: Any = None,
+        fields: List[str] = None,
+        read_only: bool = False,
+        cache: bool = False,
+        request: Request = None,
+        response: Response = None,
+        timeout: float = None,
+        include: List[str] = None
+) -> Union[dict, Response]:
+    """ Get an instance of cls by UUID
+
+    See `list_instances` for fields, read_only, cache, request, response,
+    timeout and include: the ETag is computed from the `updated_at` of the
+    instance.
+    """
+    # pylint: disable=too-many-locals
+    columns = common.field_columns(cls, fields) if fields or read_only else []
+    include_options, tree = _include_options(cls, include)
+    _check_include(columns, tree)
+    key = common.cache_key(
+        cls, session, "retrieve", instance_id, fields, read_only
+    ) if cache and not options and not tree else None
+
+    validators = None
+    if request is not None and hasattr(cls, "updated_at") and not tree:
+        validators = await timeouts.run_sync(
+            session, _instance_validators, cls, instance_id,
+            fields, read_only, timeout=timeout, request=request
+        )
+        if validators is None:
+            raise HTTPException(status_code=404)
+        if conditional.not_modified(request, *validators):
+            return conditional.not_modified_response(*validators)
+
+    def _retrieve(session):
+        if columns:
+            query = session.query(*columns).filter(cls.id == instance_id)
+            query = common.live(cls, query)
+            data = _read_only(cls, session, query)
+            return data[0] if data else None
+
+        query = session.query(cls)
+        if options:
+            query = query.options(options)
+        if include_options:
+            query = query.options(*include_options)
+        instance = common.get_live(query, instance_id)
+        if instance:
+            return _include_as_dict(instance, tree)
+        return None
+
+    data = await common.run_cached(
+        cls, session, key, _retrieve, timeout=timeout, request=request
+    )
+    if data is None:
+        raise HTTPException(status_code=404)
+    if validators is not None and response is not None:
+        response.headers.update(conditional.headers(*validators))
+    return data
+
+
+async def retrieve_instances(
+        cls: models.BASE,
+        session: models.Session,
+        instance_ids: List[UUID],
+        options: Any = None,
+        fields: List[str] = None,
+        read_only: bool = False,
+        timeout: float = None
+) -> dict:
+    """ Get many instances of cls by UUID
+
+    The instances are fetched with as few `IN (...)` queries as the
+    database allows.  The result contains the instances found as `data`,
+    in the order of instance_ids, and the ids not found as `missing` (as
+    UUIDs).
+
+    See `list_instances` for fields and read_only.
+    """
+    # as UUIDs: the ids may be given as strings in any case or format
+    try:
+        instance_ids = list(dict.fromkeys(
+            UUID(str(instance_id)) for instance_id in instance_ids
+        ))
+    except ValueError as ex:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid id: {ex}"
+        ) from ex
+    columns = common.field_columns(cls, fields) if fields or read_only else []
+
+    def _retrieve(session):
+        chunk_size = common.MAX_BIND_PARAMS.get(
+            session.get_bind().dialect.name, 999
+        )
+        if columns:
+            # not twice: the rows of `_read_only` are read by position
+            query = session.query(cls.id, *[
+                column for column in columns if column.key != "id"
+            ])
+        else:
+            query = session.query(cls)
+            if options:
+                query = query.options(options)
+        query = common.live(cls, query)
+
+        found = {}
+        for chunk in common.batches(instance_ids, chunk_size):
+            chunk_query = query.filter(cls.id.in_(chunk))
+            if columns:
+                for data in _read_only(cls, session, chunk_query):
+                    found[data["id"]] = data
+            else:
+                for instance in chunk_query:
+                    data = instance.as_dict()
+                    found[data["id"]] = data
+        return found
+
+    found = await timeouts.run_sync(session, _retrieve, timeout=timeout)
+
+    result = {"data": [], "missing": []}
+    for instance_id in instance_ids:
+        data = found.get(str(instance_id))
+        if data is None:
+            result["missing"].append(instance_id)
+        else:
+            if fields and "id" not in fields:
+                del data["id"]
+            result["data"].append(data)
+    return result
+
+
+async def update_instance(
+        cls: models.BASE,
+        session: models.Session,
+        instance_id: UUID,
+        data: BaseModel,
+        timeout: float = None
+) -> dict:
+    """ Fully update an instances using the provided data
+
+    See `create_instance` regarding the serialization before the commit.
+    """
+
+    def _update(session):
+        instance = common.get_live(session.query(cls), instance_id)
+        if not instance:
+            return None
+        for key, value in data.dict().items():
+            setattr(instance, key, value)
+        session.flush()
+        result = instance.as_dict()
+        session.commit()
+        return result
+
+    data = await timeouts.run_sync(session, _update, timeout=timeout)
+    if data is None:
+        raise HTTPException(status_code=404)
+    return data
+
+
+async def patch_instance(
+        cls: models.BASE,
+        session: models.Session,
+        instance_id: UUID,
+        data: Union[BaseModel, Dict[str, Any]],
+        timeout: float = None
+) -> dict:
+    """ Partially update an instance by UUID in one statement
+
+    Only the fields set in data are updated (`exclude_unset`), along with
+    `onupdate` columns such as `updated_at`, by a single
+    UPDATE ... WHERE id = ... RETURNING - without loading the instance.
+    Without RETURNING, the row is read back with a second statement.
+    """
+    if isinstance(data, BaseModel):
+        data = data.dict(exclude_unset=True)
+    values = common.update_values(cls, data)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    statement = cls.__table__.update() \
+        .where(cls.id == instance_id) \
+        .values(common.column_values(cls, values))
+    if common.soft_delete(cls):
+        statement = statement.where(cls.deleted_at.is_(None))
+
+    def _patch(session, statement):
+        if common.supports_returning(session):
+            statement = statement.returning(*cls.__table__.columns)
+            row = session.execute(statement).first()
+        else:
+            row = None
+            if session.execute(statement).rowcount:
+                row = session.execute(
+                    cls.__table__.select().where(cls.id == instance_id)
+                ).first()
+        touch(session, cls)
+        session.commit()
+        if row is None:
+            return None
+        return models.base.values_as_dict(cls, common.row_values(cls, row))
+
+    try:
+        data = await timeouts.run_sync(
+            session, _patch, statement, timeout=timeout
+        )
+    except sqlalchemy.exc.IntegrityError as ex:
+        raise HTTPException(status_code=409, detail=str(ex.orig))
+    if data is None:
+        raise HTTPException(status_code=404)
+    return data
+
+
+async def delete_instance(
+        cls: models.BASE,
+        session: models.Session,
+        instance_id: UUID,
+        timeout: float = None
+) -> dict:
+    """ Delete an instance by UUID
+
+    Instances of `models.SoftDeleteMixin` models are only marked deleted,
+    see `purge_instances`.
+    """
+
+    def _delete(session):
+        instance = common.get_live(session.query(cls), instance_id)
+        if not instance:
+            return None
+        result = common.delete_or_mark(session, instance)
+        session.commit()
+        return result
+
+    data = await timeouts.run_sync(session, _delete, timeout=timeout)
+    if data is None:
+        raise HTTPException(status_code=404)
+    return data
+
+
+async def update_where(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]],
+        data: Union[BaseModel, Dict[str, Any]],
+        timeout: float = None
+) -> dict:
+    """ Update all instances of cls matching filter_spec in one statement
+
+    Only the fields set in data are updated.  The rows are not loaded into
+    the session: the result contains the number of updated rows as `count`
+    and - if the database supports UPDATE ... RETURNING - the updated rows
+    as `data` (otherwise None).
+    """
+    if isinstance(data, BaseModel):
+        data = data.dict(exclude_unset=True)
+    values = common.update_values(cls, data)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    criterion = _filter_criterion(cls, filter_spec)
+    statement = cls.__table__.update() \
+        .where(criterion) \
+        .values(common.column_values(cls, values))
+
+    return await _execute_where(cls, session, statement, timeout=timeout)
+
+
+async def delete_where(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]],
+        timeout: float = None
+) -> dict:
+    """ Delete all instances of cls matching filter_spec in one statement
+
+    The result has the same format as `update_where`, with the deleted rows.
+    Instances of `models.SoftDeleteMixin` models are only marked deleted.
+    """
+    criterion = _filter_criterion(cls, filter_spec)
+    if common.soft_delete(cls):
+        statement = cls.__table__.update() \
+            .where(criterion) \
+            .values(deleted_at=tz.utcnow())
+    else:
+        statement = cls.__table__.delete().where(criterion)
+
+    return await _execute_where(cls, session, statement, timeout=timeout)
+
+
+async def purge_instances(
+        cls: models.BASE,
+        session: models.Session,
+        older_than: tz.timedelta = tz.timedelta(0),
+        batch_size: PositiveInt = 1000,
+        pause: float = 0.0,
+        timeout: float = None
+) -> int:
+    """ Hard delete the instances of cls marked deleted before older_than
+
+    For `models.SoftDeleteMixin` models, typically run as an off-peak job.
+    The tombstones are deleted in batches of (at most) batch_size, each in
+    its own transaction - so that locks and foreign key checks stay short -
+    with pause seconds in between.  Return the number of instances deleted.
+
+    The statements of every batch are limited to timeout seconds.
+    """
+    if not common.soft_delete(cls):
+        raise HTTPException(
+            status_code=400,
+            detail=f"{cls.__name__} does not support soft delete"
+        )
+    cutoff = tz.utcnow() - older_than
+    keys = list(cls.__table__.primary_key.columns)
+
+    def _purge(session):
+        size = min(batch_size, common.MAX_BIND_PARAMS.get(
+            session.get_bind().dialect.name, 999
+        ) // len(keys))
+        rows = session.query(*keys) \
+            .filter(cls.deleted_at < cutoff) \
+            .order_by(cls.deleted_at) \
+            .limit(size) \
+            .all()
+        if rows:
+            key = keys[0] if len(keys) == 1 else sqlalchemy.tuple_(*keys)
+            session.execute(cls.__table__.delete().where(key.in_(
+                [row[0] for row in rows] if len(keys) == 1 else rows
+            )))
+        session.commit()
+        return len(rows), size
+
+    total = 0
+    while True:
+        count, size = await timeouts.run_sync(
+            session, _purge, timeout=timeout
+        )
+        total += count
+        if count < size:
+            return total
+        await asyncio.sleep(pause)
+
+
+async def _execute_where(
+        cls: models.BASE,
+        session: models.Session,
+        statement,
+        timeout: float = None
+) -> dict:
+    """ Execute the UPDATE/DELETE statement of cls and commit
+
+    See `update_where` for the result.  A constraint violation is rolled
+    back and raises a 409 error.
+    """
+
+    def _execute(session, statement):
+        returning = common.supports_returning(session)
+        if returning:
+            statement = statement.returning(*cls.__table__.columns)
+
+        try:
+            result = session.execute(statement)
+        except sqlalchemy.exc.IntegrityError:
+            session.rollback()
+            raise
+        if returning:
+            data = [
+                models.base.values_as_dict(cls, common.row_values(cls, row))
+                for row in result
+            ]
+            count = len(data)
+        else:
+            data = None
+            count = result.rowcount
+        touch(session, cls)
+        session.commit()
+        return {"count": count, "data": data}
+
+    try:
+        return await timeouts.run_sync(
+            session, _execute, statement, timeout=timeout
+        )
+    except sqlalchemy.exc.IntegrityError as ex:
+        raise HTTPException(status_code=409, detail=str(ex.orig))
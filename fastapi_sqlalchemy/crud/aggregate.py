@@ -0,0 +1,319 @@
+""" Aggregation and approximate counts of instances """
+import json
+from typing import List, Dict, Any, Tuple, Union
+
+
+import sqlalchemy
+import sqlalchemy.orm
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from pydantic import PositiveInt
+from starlette.exceptions import HTTPException
+
+
+from .. import models, timeouts
+from . import common
+
+
+# Aggregate functions of aggregate_instances metrics
+AGGREGATES = {
+    "count": sqlalchemy.func.count,
+    "sum": sqlalchemy.func.sum,
+    "avg": sqlalchemy.func.avg,
+    "min": sqlalchemy.func.min,
+    "max": sqlalchemy.func.max,
+}
+
+
+# Dialects supporting GROUP BY GROUPING SETS (...) and GROUPING()
+GROUPING_SETS_DIALECTS = {"postgresql", "mssql", "oracle"}
+
+
+def _aggregate_metrics(
+        cls: models.BASE,
+        metrics: Dict[str, Union[str, List[str]]]
+) -> List[Tuple[str, Any]]:
+    """ The (key, expression) of the requested metrics
+
+    The key of a metric is its function name for "*" (COUNT only) and
+    "<function>_<field>" otherwise.
+    """
+    result = []
+    for name, fields in metrics.items():
+        function = AGGREGATES.get(name)
+        if function is None:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid metric: {name}"
+            )
+        for field in [fields] if isinstance(fields, str) else fields:
+            if field == "*":
+                if name != "count":
+                    raise HTTPException(
+                        status_code=400, detail=f"Invalid metric: {name}(*)"
+                    )
+                result.append((name, function()))
+            else:
+                column, = common.field_columns(cls, [field])
+                result.append((name + "_" + field, function(column)))
+    return result
+
+
+def _grouping_sets(
+        group_by: List[str] = None,
+        grouping_sets: List[List[str]] = None
+) -> Tuple[List[str], List[List[str]]]:
+    """ The grouped fields, and the grouping sets (if any) """
+    if grouping_sets is None:
+        return list(dict.fromkeys(group_by or [])), None
+    if group_by is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="group_by and grouping_sets are mutually exclusive"
+        )
+
+    sets = [list(dict.fromkeys(fields)) for fields in grouping_sets]
+    if not sets or len({frozenset(fields) for fields in sets}) < len(sets):
+        raise HTTPException(
+            status_code=400, detail="Invalid grouping sets"
+        )
+    fields = list(dict.fromkeys(field for item in sets for field in item))
+    return fields, sets
+
+
+async def aggregate_instances(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]] = None,
+        group_by: List[str] = None,
+        metrics: Dict[str, Union[str, List[str]]] = None,
+        grouping_sets: List[List[str]] = None,
+        search: str = None,
+        cache: bool = False,
+        timeout: float = None
+) -> List[dict]:
+    """ Aggregate the instances of cls matching the given criteria
+
+    Metrics map an aggregate function (see `AGGREGATES`) to a field - or
+    a list of fields - e.g. `{"count": "*", "sum": ["age"]}`, returned as
+    `count` and `sum_age` along with the group_by fields, ordered by them.
+    Without metrics, the rows are counted.
+
+    With grouping_sets instead of group_by - e.g. `[["gender"], ["age"],
+    []]` - the rows of every set (facet) are aggregated separately, but in
+    one statement: `GROUP BY GROUPING SETS` where supported, else a
+    `UNION ALL` of the GROUP BY of every set.  The result lists the
+    groups of every set in turn, each with the fields of its set only.
+
+    With cache, the result is cached in `common.RESPONSE_CACHE` like that of
+    `list_instances`.
+    """
+    fields, sets = _grouping_sets(group_by, grouping_sets)
+    columns = common.field_columns(cls, fields) if fields else []
+    aggregates = _aggregate_metrics(cls, metrics or {"count": "*"})
+    common.check_search(cls, search)
+    key = common.cache_key(
+        cls, session, "aggregate", filter_spec, fields, sets,
+        [name for name, _ in aggregates], search
+    ) if cache else None
+
+    def _aggregate(session):
+        query = common.search_query(
+            cls, common.QUERY_CACHE.query(cls, session, filter_spec), search
+        )
+        statement = _aggregate_statement(
+            session, cls, query, columns, [item for _, item in aggregates],
+            None if sets is None else [
+                [fields.index(field) for field in items] for items in sets
+            ]
+        )
+        if session.autoflush:
+            session.flush()
+
+        result = []
+        for row in session.execute(statement):
+            mapping = getattr(row, "_mapping", row)
+            items = fields if sets is None else sets[mapping["_grouping"]]
+            data = models.base.values_as_dict(cls, {
+                field: mapping["_group_%d" % fields.index(field)]
+                for field in items
+            })
+            for index, (name, _) in enumerate(aggregates):
+                data[name] = mapping["_metric_%d" % index]
+            result.append(data)
+        return result
+
+    return await common.run_cached(
+        cls, session, key, _aggregate, timeout=timeout
+    )
+
+
+def _aggregate_statement(
+        session: models.Session,
+        cls: models.BASE,
+        query: sqlalchemy.orm.Query,
+        columns: list,
+        aggregates: list,
+        sets: List[List[int]] = None
+):
+    """ The aggregation SELECT of the rows of query
+
+    The columns are labelled `_group_<index>`, the aggregates
+    `_metric_<index>` and - with sets, lists of column indexes - the number
+    of the set of a row `_grouping`.
+    """
+    def _statement(query):
+        # the table of cls, even if only aggregates are selected
+        return query.statement.select_from(cls.__table__)
+
+    groups = [
+        column.label("_group_%d" % index)
+        for index, column in enumerate(columns)
+    ]
+    metrics = [
+        aggregate.label("_metric_%d" % index)
+        for index, aggregate in enumerate(aggregates)
+    ]
+    if sets is None:
+        return _statement(
+            query.with_entities(*groups, *metrics)
+            .group_by(*columns)
+            .order_by(*columns)
+        )
+
+    if session.get_bind().dialect.name in GROUPING_SETS_DIALECTS:
+        # the GROUPING() bit of a column is 1 when not grouped by
+        grouping = sqlalchemy.case([
+            (
+                sqlalchemy.func.grouping(*columns) == sum(
+                    1 << (len(columns) - 1 - index)
+                    for index in range(len(columns)) if index not in items
+                ),
+                number
+            )
+            for number, items in enumerate(sets)
+        ]).label("_grouping") if columns else \
+            sqlalchemy.literal(0).label("_grouping")
+        return _statement(
+            query.with_entities(*groups, *metrics, grouping)
+            .group_by(sqlalchemy.func.grouping_sets(*[
+                sqlalchemy.tuple_(*[columns[index] for index in items])
+                for items in sets
+            ]))
+            .order_by(grouping, *columns)
+        )
+
+    union = sqlalchemy.union_all(*[
+        _statement(query.with_entities(
+            *[
+                group if index in items
+                else sqlalchemy.null().label(group.name)
+                for index, group in enumerate(groups)
+            ],
+            *metrics,
+            sqlalchemy.literal(number).label("_grouping")
+        ).group_by(*[columns[index] for index in items]))
+        for number, items in enumerate(sets)
+    ]).alias()
+    return sqlalchemy.select([union]).order_by(
+        union.c["_grouping"],
+        *[union.c[group.name] for group in groups]
+    )
+
+
+class _Explain(Executable, ClauseElement):
+    """ EXPLAIN (FORMAT JSON) <statement> - PostgreSQL only """
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kwargs):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(
+        element.statement, **kwargs
+    )
+
+
+def _estimate_count(session: models.Session, query, table) -> int:
+    """ The planner estimate of the rows returned by query (or None) """
+    dialect = session.get_bind().dialect
+
+    if dialect.name == "postgresql":
+        if query.whereclause is None:
+            estimate = session.execute(
+                sqlalchemy.text(
+                    "SELECT reltuples FROM pg_class "
+                    "WHERE oid = CAST(:table AS regclass)"
+                ),
+                {"table": table.fullname}
+            ).scalar()
+        else:
+            plan = session.execute(_Explain(query.statement)).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = plan[0]["Plan"]["Plan Rows"]
+        # reltuples is -1 (or 0 before PostgreSQL 14) if never analyzed
+        return int(estimate) if estimate and estimate > 0 else None
+
+    if dialect.name == "sqlite" and query.whereclause is None:
+        exists = session.execute(
+            sqlalchemy.text(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )
+        ).scalar()
+        if exists:
+            # The first integer of 'stat' is the number of rows in the table
+            stat = session.execute(
+                sqlalchemy.text(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = :table"
+                ),
+                {"table": table.name}
+            ).scalar()
+            if stat:
+                return int(stat.split()[0])
+
+    return None
+
+
+async def approximate_count(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]] = None,
+        cap: PositiveInt = None,
+        estimate: bool = False,
+        timeout: float = None
+) -> dict:
+    """ Cheap count of instances matching the given criteria
+
+    With estimate, the query planner's row estimate is returned where
+    available: PostgreSQL `reltuples` (unfiltered) or EXPLAIN, and SQLite
+    `sqlite_stat1` (unfiltered, populated by ANALYZE).  Otherwise - or if no
+    estimate is available - rows are counted, but with cap, the scan stops
+    after cap rows and the result means "at least cap".
+
+    The result contains the `count` and whether it is `exact`.
+    """
+
+    def _count(session):
+        query = common.QUERY_CACHE.query(cls, session, filter_spec)
+        if estimate:
+            count = _estimate_count(session, query, cls.__table__)
+            if count is not None:
+                return {"count": count, "exact": False}
+
+        if cap:
+            subquery = query \
+                .with_entities(*sqlalchemy.inspect(cls).primary_key) \
+                .limit(cap + 1) \
+                .subquery()
+            count = session.query(sqlalchemy.func.count()) \
+                .select_from(subquery) \
+                .scalar()
+            if count > cap:
+                return {"count": cap, "exact": False}
+            return {"count": count, "exact": True}
+
+        return {"count": query.count(), "exact": True}
+
+    return await timeouts.run_sync(session, _count, timeout=timeout)
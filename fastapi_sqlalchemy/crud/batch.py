@@ -0,0 +1,141 @@
+""" Batches of create/update/delete operations """
+from uuid import UUID
+from typing import List, Dict, Any, Union
+
+
+import sqlalchemy
+import sqlalchemy.exc
+from pydantic import BaseModel, ValidationError
+from starlette.exceptions import HTTPException
+
+
+from .. import models, timeouts
+from . import common, bulk_import
+
+
+class BatchOperation(BaseModel):
+    """ An operation of `batch_instances`
+
+    op is one of `create` (from data), `update` (the fields of data, of the
+    instance with id) or `delete` (the instance with id), and model the name
+    of the model in the registry.
+    """
+    op: str
+    model: str
+    id: UUID = None
+    data: Dict[str, Any] = {}
+
+
+def _batch_values(cls: models.BASE, data: dict) -> dict:
+    """ The values of data, converted to the types of the columns of cls
+
+    Raise a 400 error unless the fields are column attributes that are
+    not excluded from `as_dict` (e.g. `hashed_password`), or if a value
+    is invalid.
+    """
+    common.check_fields(cls, data)
+    exclude = getattr(cls, "__as_dict_exclude__", ())
+    invalid = [field for field in data if field in exclude]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid field(s): {', '.join(invalid)}"
+        )
+
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    values = {}
+    for key, value in data.items():
+        try:
+            values[key] = bulk_import.import_value(attrs[key].columns[0], value)
+        except (TypeError, ValueError, ArithmeticError) as ex:
+            raise HTTPException(
+                status_code=400, detail=f"{key}: {ex!r}"
+            ) from ex
+    return values
+
+
+def _batch_operation(
+        session: models.Session,
+        registry: Dict[str, models.BASE],
+        operation: BatchOperation
+) -> dict:
+    """ Execute operation (within a SAVEPOINT) - return its result """
+    cls = registry.get(operation.model)
+    if cls is None:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid model: {operation.model}"
+        )
+
+    values = _batch_values(cls, operation.data)
+    if operation.op == "create":
+        instance = cls(**values)
+        session.add(instance)
+        session.flush()
+        return {"status": 201, "data": instance.as_dict()}
+
+    if operation.op not in ("update", "delete"):
+        raise HTTPException(
+            status_code=400, detail=f"Invalid op: {operation.op}"
+        )
+
+    instance = common.get_live(session.query(cls), operation.id) \
+        if operation.id is not None else None
+    if instance is None:
+        raise HTTPException(status_code=404)
+
+    if operation.op == "delete":
+        result = common.delete_or_mark(session, instance)
+        session.flush()
+        return {"status": 200, "data": result}
+
+    for key, value in values.items():
+        setattr(instance, key, value)
+    session.flush()
+    return {"status": 200, "data": instance.as_dict()}
+
+
+async def batch_instances(
+        session: models.Session,
+        operations: List[Union[BatchOperation, Dict[str, Any]]],
+        registry: Dict[str, models.BASE],
+        timeout: float = None
+) -> List[dict]:
+    """ Execute many create, update and delete operations at once
+
+    The operations (see `BatchOperation`) are executed in order, in a
+    single transaction that is committed once.  Each one runs inside a
+    SAVEPOINT, so that a failed operation is rolled back alone: the
+    result of an operation is its `status` (HTTP status code) along with
+    either the serialized instance as `data` or the error `detail`.
+
+    The models are looked up by name in registry: only the models it
+    lists may be modified - e.g. not `models.User`, unless given.
+    """
+
+    def _batch(session):
+        results = []
+        for operation in operations:
+            savepoint = common.begin_nested(session)
+            try:
+                if not isinstance(operation, BatchOperation):
+                    operation = BatchOperation.parse_obj(operation)
+                result = _batch_operation(session, registry, operation)
+                savepoint.commit()
+            except ValidationError as ex:
+                savepoint.rollback()
+                result = {"status": 400, "detail": str(ex)}
+            except HTTPException as ex:
+                savepoint.rollback()
+                result = {"status": ex.status_code, "detail": ex.detail}
+            except sqlalchemy.exc.IntegrityError as ex:
+                savepoint.rollback()
+                result = {"status": 409, "detail": str(ex.orig)}
+            except sqlalchemy.exc.StatementError as ex:
+                # e.g. a value the column type cannot bind
+                savepoint.rollback()
+                result = {"status": 400, "detail": str(ex.orig)}
+            results.append(result)
+        session.commit()
+        return results
+
+    return await timeouts.run_sync(session, _batch, timeout=timeout)
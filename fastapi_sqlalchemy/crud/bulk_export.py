@@ -0,0 +1,416 @@
+""" Streaming and export of instances """
+import io
+import csv
+import json
+from typing import List, Dict, Any, Iterable, Iterator, AsyncIterator
+
+
+import sqlalchemy
+from pydantic import PositiveInt
+from starlette.exceptions import HTTPException
+from starlette.responses import StreamingResponse
+
+
+from .. import concurrency, models, types
+from . import common
+
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional, for the arrow and parquet export formats
+    pyarrow = None
+
+
+class _JsonEncoder:
+    """ Encode batches of items as a single JSON array """
+    media_type = "application/json"
+
+    # Whether the items are column values as read (see `export_instances`)
+    # instead of `as_dict` values
+    native_values = False
+
+    def __init__(self, columns: list = None):
+        # pylint: disable=unused-argument
+        self._separator = ""
+
+    def begin(self) -> str:
+        """ The start of the response body """
+        return "["
+
+    def encode(self, batch: List[dict]) -> str:
+        """ The chunk of the response body for a batch of items """
+        chunk = self._separator + ",".join(
+            json.dumps(item, default=str) for item in batch
+        )
+        self._separator = ","
+        return chunk
+
+    def end(self) -> str:
+        """ The end of the response body """
+        return "]"
+
+
+class _NdjsonEncoder(_JsonEncoder):
+    """ Encode batches of items as newline delimited JSON """
+    media_type = "application/x-ndjson"
+
+    def begin(self) -> str:
+        return ""
+
+    def encode(self, batch: List[dict]) -> str:
+        return "".join(json.dumps(item, default=str) + "\n" for item in batch)
+
+    def end(self) -> str:
+        return ""
+
+
+_STREAM_FORMATS = {
+    "json": _JsonEncoder,
+    "ndjson": _NdjsonEncoder,
+}
+
+
+class _CsvEncoder(_NdjsonEncoder):
+    """ Encode batches of items as CSV, with a header row """
+    media_type = "text/csv"
+
+    def __init__(self, columns: list):
+        super().__init__(columns)
+        self._fields = [column.key for column in columns]
+
+    def _rows(self, rows: Iterable[list]) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    def begin(self) -> str:
+        return self._rows([self._fields])
+
+    def encode(self, batch: List[dict]) -> str:
+        return self._rows(
+            [
+                json.dumps(value) if isinstance(value, (dict, list))
+                else value
+                for value in map(item.get, self._fields)
+            ]
+            for item in batch
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """ Binary file collecting the written chunks until drained """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        """ The chunks written since the previous call """
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# Arrow type of the SQL types (in order: Float is a Numeric), default: string
+_ARROW_TYPES = (
+    (sqlalchemy.Boolean, lambda type_: pyarrow.bool_()),
+    (sqlalchemy.Integer, lambda type_: pyarrow.int64()),
+    (sqlalchemy.Float, lambda type_: pyarrow.float64()),
+    (sqlalchemy.DateTime, lambda type_: pyarrow.timestamp(
+        "us", tz="UTC" if type_.timezone else None
+    )),
+    (sqlalchemy.Date, lambda type_: pyarrow.date32()),
+)
+
+
+def _arrow_schema(columns: list) -> "pyarrow.Schema":
+    """ The Arrow schema of the column attributes """
+    fields = []
+    for column in columns:
+        type_ = column.property.columns[0].type
+        if isinstance(type_, sqlalchemy.types.TypeDecorator):
+            type_ = type_.impl
+        arrow_type = next(
+            (
+                arrow_type(type_) for sql_type, arrow_type in _ARROW_TYPES
+                if isinstance(type_, sql_type)
+            ),
+            pyarrow.string()
+        )
+        fields.append(pyarrow.field(column.key, arrow_type))
+    return pyarrow.schema(fields)
+
+
+def _arrow_string(value) -> str:
+    """ The string of a value of a column without Arrow type """
+    value = models.base.serialize_value(value)
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+class _ArrowEncoder:
+    """ Encode batches of items as an Arrow IPC stream of record batches """
+    media_type = "application/vnd.apache.arrow.stream"
+    native_values = True
+
+    def __init__(self, columns: list):
+        self.schema = _arrow_schema(columns)
+        self._sink = _ChunkSink()
+        self._writer = None
+
+    def _open(self):
+        return pyarrow.ipc.new_stream(self._sink, self.schema)
+
+    def _record_batch(self, batch: List[dict]) -> "pyarrow.RecordBatch":
+        arrays = []
+        for field in self.schema:
+            values = [item[field.name] for item in batch]
+            if pyarrow.types.is_string(field.type):
+                values = [_arrow_string(value) for value in values]
+            arrays.append(pyarrow.array(values, type=field.type))
+        return pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+    def _write(self, record_batch: "pyarrow.RecordBatch"):
+        self._writer.write_batch(record_batch)
+
+    def begin(self) -> bytes:
+        """ The start of the response body """
+        self._writer = self._open()
+        return self._sink.drain()
+
+    def encode(self, batch: List[dict]) -> bytes:
+        """ The chunk of the response body for a batch of items """
+        self._write(self._record_batch(batch))
+        return self._sink.drain()
+
+    def end(self) -> bytes:
+        """ The end of the response body """
+        self._writer.close()
+        return self._sink.drain()
+
+
+class _ParquetEncoder(_ArrowEncoder):
+    """ Encode batches of items as Parquet, a row group per batch """
+    media_type = "application/vnd.apache.parquet"
+
+    def _open(self):
+        return pyarrow.parquet.ParquetWriter(self._sink, self.schema)
+
+    def _write(self, record_batch: "pyarrow.RecordBatch"):
+        self._writer.write_table(
+            pyarrow.Table.from_batches([record_batch], schema=self.schema)
+        )
+
+
+_EXPORT_FORMATS = {
+    **_STREAM_FORMATS,
+    "csv": _CsvEncoder,
+    "arrow": _ArrowEncoder,
+    "parquet": _ParquetEncoder,
+}
+
+
+# Formats requiring pyarrow
+_ARROW_FORMATS = ("arrow", "parquet")
+
+
+async def _encode_chunks(encoder, batches) -> AsyncIterator[str]:
+    """ The response body chunks of an async iterable of batches of items """
+    yield encoder.begin()
+    async for batch in batches:
+        yield encoder.encode(batch)
+    yield encoder.end()
+
+
+async def _fetch_batches(
+        session: models.Session,
+        batches: Iterator[List[dict]]
+) -> AsyncIterator[List[dict]]:
+    """ The batches read by session, each in the `DatabaseExecutor`
+
+    i.e. one call of the executor per batch - rather than a thread of the
+    pool of Starlette.  The session is closed once done.
+    """
+    executor = concurrency.get_executor()
+    try:
+        while True:
+            batch = await executor.run(next, batches, None)
+            if batch is None:
+                return
+            yield batch
+    finally:
+        await executor.run(session.close)
+
+
+async def stream_instances(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]] = None,
+        sort_spec: List[Dict[str, str]] = None,
+        offset: types.NonNegativeInt = 0,
+        limit: PositiveInt = None,
+        options: Any = None,
+        format: str = "json",  # pylint: disable=redefined-builtin
+        chunk_size: PositiveInt = 1000
+) -> StreamingResponse:
+    """ Stream all instances of cls as a JSON array or NDJSON
+
+    Rows are fetched chunk_size at a time from a server-side cursor (where
+    the driver supports it) and encoded as they arrive, so memory usage is
+    bounded regardless of the size of the result.  Each chunk is fetched
+    in the `concurrency.DatabaseExecutor`, like the other database work.
+
+    The rows are read using a separate session on the same bind, which is
+    closed once the response is complete: the caller's session may be closed
+    (e.g. by `SessionMiddleware`) before the body is fully sent.
+    """
+    if format not in _STREAM_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported format: {format}"
+        )
+    encoder = _STREAM_FORMATS[format]()
+
+    query = common.QUERY_CACHE.query(
+        cls, concurrency.sync_session(session), filter_spec, sort_spec
+    )
+
+    if options:
+        query = query.options(options)
+
+    if limit:
+        query = query.limit(limit)
+    query = query.offset(offset)
+
+    if concurrency.is_async(session):
+        body = _stream_async(session, query, encoder, chunk_size)
+        return StreamingResponse(body, media_type=encoder.media_type)
+
+    stream_session = models.Session(bind=session.get_bind())
+    query = query.with_session(stream_session) \
+        .execution_options(stream_results=True) \
+        .yield_per(chunk_size)
+    batches = common.batches(
+        (instance.as_dict() for instance in query), chunk_size
+    )
+    body = _encode_chunks(encoder, _fetch_batches(stream_session, batches))
+    return StreamingResponse(body, media_type=encoder.media_type)
+
+
+async def _stream_async(session, query, encoder, chunk_size: int):
+    """ See `stream_instances`, for an `AsyncSession` """
+    stream_session = concurrency.AsyncSession(bind=session.bind)
+    try:
+        result = await stream_session.stream(
+            query.statement.execution_options(yield_per=chunk_size)
+        )
+
+        async def _batches_async():
+            async for partition in result.scalars().partitions(chunk_size):
+                yield [instance.as_dict() for instance in partition]
+
+        async for chunk in _encode_chunks(encoder, _batches_async()):
+            yield chunk
+    finally:
+        await stream_session.close()
+
+
+async def export_instances(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]] = None,
+        sort_spec: List[Dict[str, str]] = None,
+        fields: List[str] = None,
+        format: str = "csv",  # pylint: disable=redefined-builtin
+        chunk_size: PositiveInt = 10000
+) -> StreamingResponse:
+    """ Stream the columns of the instances of cls for bulk export
+
+    The format is one of csv, json, ndjson, arrow (IPC stream) or parquet -
+    the last two require pyarrow.  The rows are read like `stream_instances`
+    (server-side cursor, separate session) but as Core rows, without the
+    ORM: each chunk of chunk_size rows becomes an Arrow record batch or a
+    Parquet row group.  Arrow types follow the column types, strings
+    otherwise.
+    """
+    # pylint: disable=too-many-locals
+    if format not in _EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported format: {format}"
+        )
+    if format in _ARROW_FORMATS and pyarrow is None:
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported format: {format} "
+                                    "(pyarrow is not installed)"
+        )
+    columns = common.field_columns(cls, fields)
+    encoder = _EXPORT_FORMATS[format](columns)
+
+    # NOTE: on sqlalchemy 1.4 the statement is ORM-enabled - the ORM
+    # fetches all the rows at once unless yield_per is given.
+    statement = common.QUERY_CACHE.query(
+        cls, concurrency.sync_session(session), filter_spec, sort_spec
+    ).with_entities(*columns).statement.execution_options(
+        stream_results=True, yield_per=chunk_size
+    )
+    keys = [column.key for column in columns]
+
+    def _items(rows) -> List[dict]:
+        if encoder.native_values:
+            return [dict(zip(keys, row)) for row in rows]
+        return [
+            models.base.values_as_dict(cls, dict(zip(keys, row)))
+            for row in rows
+        ]
+
+    if concurrency.is_async(session):
+        body = _export_async(session, statement, encoder, _items, chunk_size)
+        return StreamingResponse(body, media_type=encoder.media_type)
+
+    stream_session = models.Session(bind=session.get_bind())
+
+    def _batches_sync():
+        result = stream_session.execute(statement)
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield _items(rows)
+
+    body = _encode_chunks(
+        encoder, _fetch_batches(stream_session, _batches_sync())
+    )
+    return StreamingResponse(body, media_type=encoder.media_type)
+
+
+async def _export_async(session, statement, encoder, items, chunk_size: int):
+    """ See `export_instances`, for an `AsyncSession` """
+    stream_session = concurrency.AsyncSession(bind=session.bind)
+    try:
+        result = await stream_session.stream(statement)
+
+        async def _batches_async():
+            async for partition in result.partitions(chunk_size):
+                yield items(partition)
+
+        async for chunk in _encode_chunks(encoder, _batches_async()):
+            yield chunk
+    finally:
+        await stream_session.close()
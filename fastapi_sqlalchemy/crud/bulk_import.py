@@ -0,0 +1,361 @@
+""" Import of instances from CSV or NDJSON """
+import io
+import csv
+import json
+import codecs
+from uuid import UUID
+from typing import (
+    List, Any, Tuple, Iterable, AsyncIterable, AsyncIterator, Union
+)
+
+
+import dateutil.parser
+import sqlalchemy
+import sqlalchemy.exc
+from pydantic import PositiveInt
+from starlette.concurrency import iterate_in_threadpool
+from starlette.exceptions import HTTPException
+
+
+from .. import models, timeouts, tz
+from ..response_cache import touch
+from . import common
+
+
+# Input formats of `import_instances`
+_IMPORT_FORMATS = ("csv", "ndjson")
+
+
+async def _text_lines(source) -> AsyncIterator[str]:
+    """ The lines of a (sync or async) iterable of bytes or str chunks
+
+    A sync iterable (e.g. a file) is read in the thread pool.
+    """
+    if not hasattr(source, "__aiter__"):
+        source = iterate_in_threadpool(iter(source))
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in source:
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk)
+        *lines, pending = (pending + chunk).split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _import_records(
+        cls: models.BASE,
+        lines: AsyncIterator[str],
+        format: str  # pylint: disable=redefined-builtin
+) -> AsyncIterator[Tuple[int, Union[dict, ValueError]]]:
+    """ The (index, record) of the lines - or (index, error) if invalid
+
+    A CSV record may span lines (quoted newlines), its first record is the
+    header: the names of the columns.  Blank lines are skipped.
+
+    NOTE: the error is a ValueError rather than its message, since a valid
+    NDJSON line may be a JSON string.
+    """
+    header = None
+    record = ""
+    index = 0
+    async for line in lines:
+        record += line
+        if format == "csv" and record.count('"') % 2:
+            continue  # inside a quoted value
+        if not record.strip():
+            record = ""
+            continue
+
+        if format == "ndjson":
+            try:
+                item = json.loads(record)
+            except ValueError as ex:
+                item = ValueError(f"Invalid JSON: {ex}")
+            if not isinstance(item, (dict, ValueError)):
+                item = ValueError("Expected a JSON object")
+        else:
+            values = list(csv.reader([record]))[0]
+            if header is None:
+                header = values
+                common.check_fields(cls, header)
+                record = ""
+                continue
+            if len(values) != len(header):
+                item = ValueError(
+                    f"Expected {len(header)} values, got {len(values)}"
+                )
+            else:
+                item = dict(zip(header, values))
+        record = ""
+        yield index, item
+        index += 1
+
+
+def _parse_boolean(_type, value: str) -> bool:
+    """ Parse a boolean such as true/false, t/f, 1/0 or yes/no """
+    if value.lower() not in _BOOLEANS:
+        raise ValueError(f"Invalid boolean: {value}")
+    return _BOOLEANS[value.lower()]
+
+
+def _parse_datetime(type_, value: str) -> tz.datetime:
+    """ Parse an ISO 8601 datetime - UTC unless it has a timezone """
+    result = dateutil.parser.isoparse(value)
+    if result.tzinfo is None and type_.timezone:
+        result = result.replace(tzinfo=tz.UTC)
+    return result
+
+
+_BOOLEANS = {
+    "true": True, "t": True, "1": True, "yes": True,
+    "false": False, "f": False, "0": False, "no": False,
+}
+
+
+# Parsers of string values per column type (in order: Enum is a String)
+_IMPORT_PARSERS = (
+    (models.GUID, lambda type_, value: UUID(value)),
+    ((models.JSONEncodedDict, sqlalchemy.JSON),
+     lambda type_, value: json.loads(value)),
+    (sqlalchemy.Boolean, _parse_boolean),
+    (sqlalchemy.DateTime, _parse_datetime),
+    (sqlalchemy.Date, lambda type_, value: _parse_datetime(
+        type_, value).date()),
+    (sqlalchemy.Enum, lambda type_, value: type_.enum_class[value]
+     if type_.enum_class else value),
+    ((sqlalchemy.Integer, sqlalchemy.Numeric),
+     lambda type_, value: type_.python_type(value)),
+)
+
+
+def import_value(column: sqlalchemy.Column, value) -> Any:
+    """ Convert a parsed (CSV or JSON) value to the type of column
+
+    An empty string is NULL, except in string columns.
+    """
+    type_ = column.type
+    if isinstance(type_, sqlalchemy.types.TypeDecorator) and \
+            not isinstance(type_, (models.GUID, models.JSONEncodedDict)):
+        type_ = type_.impl
+    if value == "" and not isinstance(type_, sqlalchemy.String):
+        return None
+    if isinstance(value, str):
+        for sql_type, parse in _IMPORT_PARSERS:
+            if isinstance(type_, sql_type):
+                return parse(type_, value)
+    return value
+
+
+def _import_values(cls: models.BASE, record: dict) -> dict:
+    """ Column attribute values of a new instance of cls from record """
+    try:
+        common.check_fields(cls, record)
+    except HTTPException as ex:
+        raise ValueError(ex.detail) from ex
+
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    values = {}
+    for key, value in record.items():
+        try:
+            values[key] = import_value(attrs[key].columns[0], value)
+        except (KeyError, TypeError, ValueError, ArithmeticError) as ex:
+            raise ValueError(f"{key}: {ex!r}") from ex
+    return common.insert_values(cls, values)
+
+
+def _copy_value(value) -> str:
+    """ A (bound) value in the CSV format of COPY, see `_copy_text` """
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_text(
+        dialect,
+        columns: List[sqlalchemy.Column],
+        rows: List[list]
+) -> str:
+    """ The CSV data of rows for `COPY ... FROM STDIN (FORMAT csv)`
+
+    The values are converted by the bind processors of the column types,
+    like the parameters of a statement.  All values are quoted, so that
+    only the unquoted `\\N` is NULL.
+    """
+    processors = [
+        column.type.dialect_impl(dialect).bind_processor(dialect)
+        for column in columns
+    ]
+    return "".join(
+        ",".join(
+            _copy_value(process(value) if process else value)
+            for process, value in zip(processors, row)
+        ) + "\n"
+        for row in rows
+    )
+
+
+def _copy_rows(session: models.Session, cls: models.BASE, rows: List[dict]):
+    """ Insert rows (see `common.insert_values`) with `COPY FROM STDIN`
+    (psycopg2)
+
+    Rows are grouped by their keys, since omitted columns are left to the
+    database defaults.
+    """
+    connection = session.connection()
+    dialect = connection.dialect
+    preparer = dialect.identifier_preparer
+    attrs = sqlalchemy.inspect(cls).column_attrs
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(row)
+
+    cursor = connection.connection.cursor()
+    try:
+        for keys, group in groups.items():
+            columns = [attrs[key].columns[0] for key in keys]
+            data = _copy_text(
+                dialect, columns, [[row[key] for key in keys] for row in group]
+            )
+            cursor.copy_expert(
+                f"COPY {preparer.format_table(cls.__table__)} "
+                f"({', '.join(preparer.quote(c.name) for c in columns)}) "
+                "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                io.StringIO(data)
+            )
+    finally:
+        cursor.close()
+
+
+def _import_errors(dialect, copy: bool) -> tuple:
+    """ The errors of rows rejected by the database, see `_import_rows`
+
+    Only COPY - on the psycopg2 cursor - raises the errors of the driver:
+    the DBAPI of an asyncio driver (e.g. aiosqlite) has no such attributes.
+    """
+    errors = (sqlalchemy.exc.IntegrityError, sqlalchemy.exc.DataError)
+    if copy:
+        errors += (dialect.dbapi.IntegrityError, dialect.dbapi.DataError)
+    return errors
+
+
+def _import_rows(
+        session: models.Session,
+        cls: models.BASE,
+        rows: List[dict],
+        copy: bool
+):
+    """ Insert rows inside a SAVEPOINT, rolled back on error """
+    dialect = session.connection().dialect
+    savepoint = common.begin_nested(session)
+    try:
+        if copy:
+            _copy_rows(session, cls, rows)
+        else:
+            session.bulk_insert_mappings(cls, rows)
+        touch(session, cls)
+        savepoint.commit()
+    except _import_errors(dialect, copy):
+        savepoint.rollback()
+        raise
+
+
+def _import_batch(
+        session: models.Session,
+        cls: models.BASE,
+        batch: List[Tuple[int, dict]],
+        commit: bool
+) -> Tuple[int, List[dict]]:
+    """ Insert a batch of (index, row) - return the count and the errors
+
+    The batch is loaded with COPY (psycopg2) or executemany.  If it fails,
+    the rows are retried one at a time, so that only the offending rows
+    are rejected.
+    """
+    dialect = session.connection().dialect
+    copy = dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+    rejected = []
+    try:
+        _import_rows(session, cls, [row for _, row in batch], copy)
+        count = len(batch)
+    except _import_errors(dialect, copy):
+        count = 0
+        for index, row in batch:
+            try:
+                _import_rows(session, cls, [row], copy=False)
+                count += 1
+            except _import_errors(dialect, copy=False) as ex:
+                rejected.append({
+                    "index": index, "detail": str(getattr(ex, "orig", ex))
+                })
+    if commit:
+        session.commit()
+    return count, rejected
+
+
+async def import_instances(
+        cls: models.BASE,
+        session: models.Session,
+        source: Union[Iterable, AsyncIterable],
+        format: str = "csv",  # pylint: disable=redefined-builtin
+        batch_size: PositiveInt = 1000,
+        commit_per_batch: bool = True,
+        timeout: float = None
+) -> dict:
+    """ Bulk load instances of cls from CSV (with a header) or NDJSON
+
+    source is an iterable or async iterable of bytes or str chunks - e.g.
+    a file, or `request.stream()` - parsed as it is read: only a batch of
+    batch_size rows is held in memory.  The values are converted to the
+    types of the columns (GUID, JSON, dates, ...) and the defaults of the
+    model applied, see `common.insert_values`.
+
+    Each batch is loaded with `COPY FROM STDIN` on PostgreSQL (psycopg2),
+    executemany otherwise, and committed - or all at once at the end
+    unless commit_per_batch.
+
+    Invalid rows are rejected without aborting the load: the result
+    contains the `count` of inserted rows, and the `errors` as the `index`
+    of the row (0 based, excluding the header) and the `detail`.
+    """
+    if format not in _IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported format: {format}"
+        )
+
+    result = {"count": 0, "errors": []}
+
+    async def _load(batch):
+        count, errors = await timeouts.run_sync(
+            session, _import_batch, cls, batch, commit_per_batch,
+            timeout=timeout
+        )
+        result["count"] += count
+        result["errors"].extend(errors)
+
+    batch = []
+    records = _import_records(cls, _text_lines(source), format)
+    async for index, record in records:
+        try:
+            if isinstance(record, ValueError):
+                raise record
+            batch.append((index, _import_values(cls, record)))
+        except (TypeError, ValueError) as ex:
+            result["errors"].append({"index": index, "detail": str(ex)})
+        if len(batch) >= batch_size:
+            await _load(batch)
+            batch = []
+    if batch:
+        await _load(batch)
+    if not commit_per_batch:
+        await timeouts.run_sync(
+            session, lambda session: session.commit(), timeout=timeout
+        )
+    return result
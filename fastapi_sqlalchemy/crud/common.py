@@ -0,0 +1,250 @@
+""" Helpers shared by the CRUD operations """
+import json
+from uuid import UUID
+from typing import List, Any, Iterable, Iterator
+
+
+import sqlalchemy
+import sqlalchemy.orm
+from starlette.exceptions import HTTPException
+
+
+from .. import concurrency, models, timeouts, tz
+from ..query_cache import QueryCache
+from ..response_cache import ResponseCache
+
+
+# Translated filter_spec/sort_spec queries, see `query_cache`
+QUERY_CACHE = QueryCache()
+
+
+# Results of reads with cache=True, see `response_cache`
+RESPONSE_CACHE = ResponseCache()
+
+
+# Maximum number of bind parameters (or IN list items) per statement
+MAX_BIND_PARAMS = {
+    "sqlite": 999,  # SQLITE_MAX_VARIABLE_NUMBER before sqlite 3.32
+    "postgresql": 32767,
+    "mysql": 65535,
+    "mssql": 2000,  # 2100 in total, leaving some for the rest of the query
+    "oracle": 1000,  # ORA-01795
+}
+
+
+def check_search(cls: models.BASE, search: str = None) -> None:
+    """ Fail with 400 if cls cannot be searched """
+    if search is not None and not models.fulltext.indexed(cls):
+        raise HTTPException(
+            status_code=400,
+            detail=f"{cls.__name__} does not support search"
+        )
+
+
+def search_query(
+        cls: models.BASE,
+        query: sqlalchemy.orm.Query,
+        search: str = None,
+        rank: bool = False
+) -> sqlalchemy.orm.Query:
+    """ Restrict the query of cls to the matches of search (if given)
+
+    With rank, the matches are ordered by relevance.
+    """
+    if search is None:
+        return query
+    return models.fulltext.search(query, cls, search, rank=rank)
+
+
+def cache_key(cls: models.BASE, session: models.Session, *args) -> tuple:
+    """ The `RESPONSE_CACHE` key of a read of cls with the given arguments """
+    bind = concurrency.sync_session(session).get_bind()
+    return (
+        cls,
+        str(bind.url),
+        json.dumps(args, sort_keys=True, default=str),
+    )
+
+
+async def run_cached(
+        cls: models.BASE,
+        session: models.Session,
+        key: tuple,
+        func,
+        **kwargs
+) -> Any:
+    """ Call func (see `timeouts.run_sync`) unless cached under key
+
+    The result is only cached if it is not None.
+    """
+    if key is None:
+        return await timeouts.run_sync(session, func, **kwargs)
+
+    data = RESPONSE_CACHE.get(key)
+    if data is None:
+        generation = RESPONSE_CACHE.generation(cls)
+        data = await timeouts.run_sync(session, func, **kwargs)
+        if data is not None:
+            RESPONSE_CACHE.set(key, data, generation)
+    return data
+
+
+def field_columns(cls: models.BASE, fields: List[str] = None) -> list:
+    """ The column attributes of cls for the requested (or all) fields """
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    exclude = getattr(cls, "__as_dict_exclude__", ())
+    if not fields:
+        fields = [attr.key for attr in attrs if attr.key not in exclude]
+
+    invalid = [
+        field for field in fields if field not in attrs or field in exclude
+    ]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid field(s): {', '.join(map(str, invalid))}"
+        )
+    return [getattr(cls, field) for field in dict.fromkeys(fields)]
+
+
+def batches(items: Iterable, size: int) -> Iterator[list]:
+    """ Group items into lists of (at most) size elements """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_values(cls: models.BASE, data: dict) -> dict:
+    """ Column attribute values of a new instance of cls created from data
+
+    The instance is only used to apply the ORM-level behaviour of the
+    model (validators, setters) and is never added to a session.  Python-side
+    column defaults are evaluated here, so that the values are known without
+    reading the row back; columns left to the database are omitted.
+    """
+    instance = cls(**data)
+    values = {}
+    for attr in sqlalchemy.inspect(cls).column_attrs:
+        column = attr.columns[0]
+        value = getattr(instance, attr.key)
+        if value is None and column.default is not None:
+            default = column.default
+            if getattr(default, "is_callable", False):
+                value = default.arg(None)
+            elif getattr(default, "is_scalar", False):
+                value = default.arg
+            else:
+                # SQL expression or sequence: evaluated by the database
+                continue
+        if value is None and column.server_default is not None:
+            continue
+        values[attr.key] = value
+    return values
+
+
+def update_values(cls: models.BASE, data: dict) -> dict:
+    """ Column attribute values set by data, see `insert_values` """
+    try:
+        instance = cls(**data)
+    except TypeError as ex:
+        raise HTTPException(status_code=400, detail=str(ex)) from ex
+    state = sqlalchemy.inspect(instance)
+    return {
+        attr.key: getattr(instance, attr.key)
+        for attr in sqlalchemy.inspect(cls).column_attrs
+        if state.attrs[attr.key].history.has_changes()
+    }
+
+
+def column_values(cls: models.BASE, values: dict) -> dict:
+    """ Re-key column attribute values by table column, for Core statements """
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    return {attrs[key].columns[0]: value for key, value in values.items()}
+
+
+def row_values(cls: models.BASE, row) -> dict:
+    """ Column attribute values of cls from a Core result row """
+    mapping = getattr(row, "_mapping", row)
+    return {
+        attr.key: mapping[attr.columns[0]]
+        for attr in sqlalchemy.inspect(cls).column_attrs
+    }
+
+
+def supports_returning(
+        session: models.Session,
+        statement: str = "update"
+) -> bool:
+    """ Whether <statement> ... RETURNING is available for the session
+
+    The statement is one of "insert", "update" or "delete".
+    """
+    dialect = session.get_bind().dialect
+    for name in (f"{statement}_returning", "full_returning"):
+        if hasattr(dialect, name):
+            return bool(getattr(dialect, name))
+    return dialect.name in ("postgresql", "mssql")
+
+
+def begin_nested(session: models.Session):
+    """ Begin a SAVEPOINT (the outer transaction must have begun)
+
+    pysqlite defers BEGIN until the first DML statement, in which case
+    the SAVEPOINT itself would start - and its release commit - the
+    transaction, so BEGIN is issued explicitly.
+    """
+    connection = session.connection()
+    if connection.dialect.name == "sqlite" and \
+            not getattr(connection.connection, "in_transaction", True):
+        connection.execute(sqlalchemy.text("BEGIN"))
+    return session.begin_nested()
+
+
+def check_fields(cls: models.BASE, fields: Iterable[str]):
+    """ Raise a 400 error unless fields are column attributes of cls
+
+    NOTE: the constructor of a model accepts any attribute, methods included.
+    """
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    invalid = [field for field in fields if field not in attrs]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid field(s): {', '.join(map(str, invalid))}"
+        )
+
+
+def soft_delete(cls: models.BASE) -> bool:
+    """ Whether cls is a `models.SoftDeleteMixin` model """
+    return issubclass(cls, models.SoftDeleteMixin)
+
+
+def live(cls: models.BASE, query: sqlalchemy.orm.Query):
+    """ Exclude the instances of cls marked deleted from query """
+    if soft_delete(cls):
+        return query.filter(cls.deleted_at.is_(None))
+    return query
+
+
+def get_live(query: sqlalchemy.orm.Query, instance_id: UUID):
+    """ `query.get(instance_id)`, or None if the instance is marked deleted """
+    instance = query.get(instance_id)
+    if isinstance(instance, models.SoftDeleteMixin) and instance.deleted:
+        return None
+    return instance
+
+
+def delete_or_mark(session: models.Session, instance) -> dict:
+    """ Delete instance - or mark it deleted - and return it as dict """
+    if isinstance(instance, models.SoftDeleteMixin):
+        instance.deleted_at = tz.utcnow()
+        session.flush()
+        return instance.as_dict()
+    result = instance.as_dict()
+    session.delete(instance)
+    return result
@@ -0,0 +1,191 @@
+""" Keyset (cursor) pagination of instances """
+import json
+import base64
+import binascii
+from uuid import UUID
+from typing import List, Dict, Any, Tuple
+
+
+import sqlalchemy
+from pydantic import PositiveInt
+from starlette.exceptions import HTTPException
+
+
+from .. import models, timeouts, tz
+from . import common
+
+
+def _keyset_keys(
+        cls: models.BASE,
+        sort_spec: List[Dict[str, str]] = None
+) -> List[Tuple[Any, str]]:
+    """ The (attribute, direction) pairs that make up the keyset of cls.
+
+    The primary key `id` is always appended - unless already sorted on -
+    so that the keyset is unique even when the sort keys contain ties.
+
+    Nullable columns are rejected: NULL compares neither greater nor less
+    than a cursor value (and sorts first or last depending on the database),
+    so the rows with NULL keys would be skipped.
+    """
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    keys = []
+    for spec in sort_spec or []:
+        model = spec.get("model")
+        field = spec.get("field")
+        direction = spec.get("direction")
+        invalid = field not in attrs or attrs[field].columns[0].nullable
+        if model not in (None, cls.__name__) or invalid or \
+                spec.get("nullsfirst") or spec.get("nullslast") or \
+                direction not in ("asc", "desc"):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid keyset sort specification: {spec}"
+            )
+        keys.append((getattr(cls, field), direction))
+
+    if all(attr.key != "id" for attr, _ in keys):
+        keys.append((cls.id, keys[-1][1] if keys else "asc"))
+    return keys
+
+
+def _encode_cursor(instance, keys: List[Tuple[Any, str]]) -> str:
+    """ Build an opaque cursor from the keyset values of instance """
+    values = [
+        models.base.serialize_value(getattr(instance, attr.key))
+        for attr, _ in keys
+    ]
+    data = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, keys: List[Tuple[Any, str]]) -> list:
+    """ Convert a cursor back to the keyset values, typed per column """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data.decode("utf-8"))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+
+        result = []
+        for (attr, _), value in zip(keys, values):
+            column_type = attr.property.columns[0].type
+            if value is None:
+                pass
+            elif isinstance(column_type, sqlalchemy.DateTime):
+                value = tz.datetime.fromisoformat(value)
+            elif isinstance(column_type, sqlalchemy.Date):
+                value = tz.date.fromisoformat(value)
+            elif isinstance(column_type, models.GUID):
+                value = UUID(value)
+            elif isinstance(column_type, sqlalchemy.Enum) and \
+                    column_type.enum_class is not None:
+                value = column_type.enum_class[value]
+            result.append(value)
+        return result
+    except (ValueError, TypeError, KeyError, binascii.Error) as ex:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from ex
+
+
+def _keyset_criterion(
+        keys: List[Tuple[Any, str]],
+        values: list,
+        backwards: bool
+):
+    """ WHERE clause selecting the rows after (or before) the given values """
+    def _after(direction):
+        return (direction == "asc") != backwards
+
+    directions = {direction for _, direction in keys}
+    if len(directions) == 1:
+        # Uniform direction: use a row-value comparison, which the database
+        # can satisfy with a single range scan of a composite index.
+        columns = sqlalchemy.tuple_(*[attr for attr, _ in keys])
+        bounds = sqlalchemy.tuple_(*[
+            sqlalchemy.literal(value, attr.property.columns[0].type)
+            for (attr, _), value in zip(keys, values)
+        ])
+        if _after(keys[0][1]):
+            return columns > bounds
+        return columns < bounds
+
+    # Mixed directions: (a > x) OR (a = x AND b < y) OR ...
+    clauses = []
+    for index, (attr, direction) in enumerate(keys):
+        equal = [keys[i][0] == values[i] for i in range(index)]
+        if _after(direction):
+            clauses.append(sqlalchemy.and_(*equal, attr > values[index]))
+        else:
+            clauses.append(sqlalchemy.and_(*equal, attr < values[index]))
+    return sqlalchemy.or_(*clauses)
+
+
+async def paginate_instances(
+        cls: models.BASE,
+        session: models.Session,
+        filter_spec: List[Dict[str, Any]] = None,
+        sort_spec: List[Dict[str, str]] = None,
+        limit: PositiveInt = None,
+        after: str = None,
+        before: str = None,
+        options: Any = None,
+        timeout: float = None
+) -> dict:
+    """ Return a page of instances of cls using keyset (seek) pagination
+
+    Unlike `offset`, the cost of a page does not depend on its position.
+    The result contains the page `data` along with the opaque `next` and
+    `previous` cursors (or None), which are passed back as `after` and
+    `before` respectively to fetch the adjacent pages.
+    """
+    if after and before:
+        raise HTTPException(
+            status_code=400,
+            detail="Only one of 'after' and 'before' may be specified"
+        )
+
+    keys = _keyset_keys(cls, sort_spec)
+    backwards = before is not None
+
+    cursor = after or before
+    criterion = None
+    if cursor:
+        values = _decode_cursor(cursor, keys)
+        criterion = _keyset_criterion(keys, values, backwards)
+
+    def _paginate(session):
+        query = common.QUERY_CACHE.query(cls, session, filter_spec)
+        if criterion is not None:
+            query = query.filter(criterion)
+
+        query = query.order_by(*[
+            attr.asc() if (direction == "asc") != backwards else attr.desc()
+            for attr, direction in keys
+        ])
+
+        if options:
+            query = query.options(options)
+
+        if limit:
+            query = query.limit(limit + 1)
+
+        instances = query.all()
+        has_more = bool(limit) and len(instances) > limit
+        if has_more:
+            instances = instances[:limit]
+        if backwards:
+            instances.reverse()
+
+        result = {
+            "data": [instance.as_dict() for instance in instances],
+            "next": None,
+            "previous": None,
+        }
+        if instances:
+            if has_more or backwards:
+                result["next"] = _encode_cursor(instances[-1], keys)
+            if (has_more and backwards) or after:
+                result["previous"] = _encode_cursor(instances[0], keys)
+        return result
+
+    return await timeouts.run_sync(session, _paginate, timeout=timeout)
@@ -0,0 +1,311 @@
+""" Insert or update of instances """
+from typing import List, Iterator
+
+
+import sqlalchemy
+import sqlalchemy.exc
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException
+
+
+from .. import models, timeouts
+from ..response_cache import touch
+from . import common
+
+
+def _onupdate_values(cls: models.BASE) -> dict:
+    """ Column attribute values of cls set by `onupdate` (e.g. updated_at) """
+    values = {}
+    for attr in sqlalchemy.inspect(cls).column_attrs:
+        onupdate = attr.columns[0].onupdate
+        if onupdate is None:
+            continue
+        if getattr(onupdate, "is_callable", False):
+            values[attr.key] = onupdate.arg(None)
+        else:
+            values[attr.key] = onupdate.arg
+    return values
+
+
+def _upsert_statement(
+        cls: models.BASE,
+        dialect,
+        rows: List[dict],
+        conflict_columns: List[str],
+        update: dict
+):
+    """ Dialect-native INSERT ... ON CONFLICT DO UPDATE of rows (or None)
+
+    The existing rows are updated with the inserted values of the
+    attributes of update - or with the value given in update, if not None.
+    """
+    values = [common.column_values(cls, row) for row in rows]
+    attrs = sqlalchemy.inspect(cls).column_attrs
+
+    def _set(inserted) -> dict:
+        # Conflict columns are set to themselves if there is nothing else,
+        # so that the conflicting row is still updated (and returned).
+        keys = update or dict.fromkeys(conflict_columns)
+        return {
+            attrs[key].columns[0].key: inserted[attrs[key].columns[0].key]
+            if value is None else value
+            for key, value in keys.items()
+        }
+
+    insert = {
+        "postgresql": postgresql.insert,
+        "sqlite": getattr(sqlite, "insert", None),  # sqlalchemy 1.4+
+    }.get(dialect.name)
+    if insert is not None:
+        statement = insert(cls.__table__).values(values)
+        return statement.on_conflict_do_update(
+            index_elements=[
+                attrs[key].columns[0] for key in conflict_columns
+            ],
+            # matches the unique `models.live_index` of a soft deleted model
+            # (as well as the indexes of all rows)
+            index_where=cls.__table__.c.deleted_at.is_(None)
+            if common.soft_delete(cls) else None,
+            set_=_set(statement.excluded)
+        )
+
+    if dialect.name == "mysql":
+        # NOTE: MySQL updates on a conflict with *any* unique key
+        statement = mysql.insert(cls.__table__).values(values)
+        return statement.on_duplicate_key_update(_set(statement.inserted))
+
+    return None
+
+
+def _upsert(
+        cls: models.BASE,
+        session: models.Session,
+        rows: List[dict],
+        conflict_columns: List[str],
+        update: dict
+) -> List[dict]:
+    """ Upsert rows and return the resulting rows in the same order """
+    def _key(values) -> tuple:
+        return tuple(
+            models.base.serialize_value(values[key])
+            for key in conflict_columns
+        )
+
+    # Only one row per conflict key: the last one wins
+    unique = list({_key(row): row for row in rows}.values())
+
+    found = {}
+    for values in _upsert_batches(
+            cls, session, unique, conflict_columns, update
+    ):
+        found[_key(values)] = values
+
+    missing = [row for row in unique if _key(row) not in found]
+    for values in _select_by_keys(cls, session, missing, conflict_columns):
+        found[_key(values)] = values
+
+    return [
+        models.base.values_as_dict(cls, found[_key(row)]) for row in rows
+    ]
+
+
+def _upsert_batches(
+        cls: models.BASE,
+        session: models.Session,
+        rows: List[dict],
+        conflict_columns: List[str],
+        update: dict
+) -> Iterator[dict]:
+    """ Upsert rows in batches, yielding the values RETURNING (if any) """
+    dialect = session.get_bind().dialect
+    returning = common.supports_returning(session, "insert")
+
+    # The rows of a (multi-row) statement must all have the same columns
+    groups = {}
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+
+    for group in groups.values():
+        size = common.MAX_BIND_PARAMS.get(dialect.name, 999) // len(group[0])
+        for batch in common.batches(group, max(size, 1)):
+            statement = _upsert_statement(
+                cls, dialect, batch, conflict_columns, update
+            )
+            if statement is None:
+                _upsert_fallback(cls, session, batch, conflict_columns, update)
+            elif returning:
+                statement = statement.returning(*cls.__table__.columns)
+                for row in session.execute(statement):
+                    yield common.row_values(cls, row)
+            else:
+                session.execute(statement)
+
+
+def _select_by_keys(
+        cls: models.BASE,
+        session: models.Session,
+        rows: List[dict],
+        keys: List[str]
+) -> Iterator[dict]:
+    """ Column attribute values of the rows of cls matching rows on keys """
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    columns = [attrs[key].columns[0] for key in keys]
+    dialect = session.get_bind().dialect
+    size = common.MAX_BIND_PARAMS.get(dialect.name, 999) // len(columns)
+    for batch in common.batches(rows, max(size, 1)):
+        criterion = sqlalchemy.or_(*[
+            sqlalchemy.and_(*[
+                column == row[key] for key, column in zip(keys, columns)
+            ])
+            for row in batch
+        ])
+        statement = cls.__table__.select().where(criterion)
+        if common.soft_delete(cls):
+            # the tombstones with the same keys of a `models.live_index`
+            statement = statement.where(cls.deleted_at.is_(None))
+        for row in session.execute(statement):
+            yield common.row_values(cls, row)
+
+
+def _live_conflict(cls: models.BASE, conflict_columns: List[str]) -> bool:
+    """ Whether only the live rows of cls conflict on conflict_columns
+
+    i.e. for a `models.SoftDeleteMixin` model whose conflict columns are
+    only unique by a `models.live_index`, not by a constraint of all rows.
+    """
+    if not common.soft_delete(cls):
+        return False
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    columns = {attrs[key].columns[0] for key in conflict_columns}
+    table = cls.__table__
+    for constraint in table.constraints:
+        if isinstance(constraint, (
+                sqlalchemy.PrimaryKeyConstraint, sqlalchemy.UniqueConstraint
+        )) and set(constraint.columns) == columns:
+            return False
+    return not any(
+        index.unique and set(index.columns) == columns and all(
+            options.get("where") is None for options in
+            index.dialect_options.values()
+        )
+        for index in table.indexes
+    )
+
+
+def _upsert_fallback(
+        cls: models.BASE,
+        session: models.Session,
+        rows: List[dict],
+        conflict_columns: List[str],
+        update: dict
+):
+    """ UPDATE - or INSERT if there is no row - for dialects without upsert """
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    live = _live_conflict(cls, conflict_columns)
+    for row in rows:
+        criterion = sqlalchemy.and_(*[
+            attrs[key].columns[0] == row[key] for key in conflict_columns
+        ])
+        if live:
+            criterion = sqlalchemy.and_(criterion, cls.deleted_at.is_(None))
+        values = {
+            key: row[key] if value is None else value
+            for key, value in update.items()
+        }
+        result = None
+        if values:
+            result = session.execute(
+                cls.__table__.update()
+                .where(criterion)
+                .values(common.column_values(cls, values))
+            )
+        exists = result.rowcount > 0 if result is not None else \
+            session.execute(
+                sqlalchemy.select([sqlalchemy.literal(1)])
+                .where(sqlalchemy.exists().where(criterion))
+            ).scalar()
+        if not exists:
+            session.execute(
+                cls.__table__.insert().values(common.column_values(cls, row))
+            )
+
+
+async def upsert_instances(
+        cls: models.BASE,
+        session: models.Session,
+        items: List[BaseModel],
+        conflict_columns: List[str] = None,
+        timeout: float = None
+) -> List[dict]:
+    """ Create or update many instances of cls in as few statements as possible
+
+    Rows that conflict with an existing row on conflict_columns (default:
+    the primary key) - which must have a unique constraint - update all
+    the fields of the item instead, along with `onupdate` columns such as
+    `updated_at`.  This uses INSERT ... ON CONFLICT DO UPDATE on PostgreSQL
+    and SQLite (sqlalchemy 1.4+) and INSERT ... ON DUPLICATE KEY UPDATE on
+    MySQL, otherwise an UPDATE followed, if necessary, by an INSERT.
+
+    The resulting rows are returned in the order of items: with RETURNING
+    where available, otherwise read back with a single query.
+
+    For `models.SoftDeleteMixin` models, the conflict may also be on a
+    unique `models.live_index`, and an instance marked deleted that
+    conflicts is restored.
+    """
+    attrs = sqlalchemy.inspect(cls).column_attrs
+    if not conflict_columns:
+        conflict_columns = [
+            attr.key for attr in attrs
+            if attr.columns[0].primary_key
+        ]
+    invalid = [key for key in conflict_columns if key not in attrs]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid conflict column(s): {', '.join(invalid)}"
+        )
+
+    rows = [common.insert_values(cls, item.dict()) for item in items]
+    if not rows:
+        return []
+
+    exclude = set(conflict_columns).union(
+        attr.key for attr in attrs if attr.columns[0].primary_key
+    )
+    update = {
+        key: None for key in items[0].dict()
+        if key in attrs and key not in exclude
+    }
+    update.update(_onupdate_values(cls))
+    if common.soft_delete(cls):
+        update["deleted_at"] = None  # as inserted: restored
+
+    def _upsert_all(session):
+        result = _upsert(cls, session, rows, conflict_columns, update)
+        touch(session, cls)
+        session.commit()
+        return result
+
+    try:
+        return await timeouts.run_sync(session, _upsert_all, timeout=timeout)
+    except sqlalchemy.exc.IntegrityError as ex:
+        raise HTTPException(status_code=409, detail=str(ex.orig))
+
+
+async def upsert_instance(
+        cls: models.BASE,
+        session: models.Session,
+        data: BaseModel,
+        conflict_columns: List[str] = None,
+        timeout: float = None
+) -> dict:
+    """ Create or update an instance of cls (in one statement if possible)
+
+    See `upsert_instances`.
+    """
+    result = await upsert_instances(
+        cls, session, [data], conflict_columns, timeout=timeout
+    )
+    return result[0]
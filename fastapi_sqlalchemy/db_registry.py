@@ -9,11 +9,19 @@ import typing
 import threading
 
 from sqlalchemy.engine import Connectable, Engine, create_engine
+from sqlalchemy.pool import QueuePool
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+except ImportError:  # sqlalchemy < 1.4
+    AsyncEngine = create_async_engine = None
 
 __LOCK = threading.Lock()
 
 __ENGINE_REGISTRY: typing.Dict[str, Engine] = {}
 
+__ASYNC_ENGINE_REGISTRY: typing.Dict[str, "AsyncEngine"] = {}
+
 
 def register(
         bind: typing.Union[str, Connectable],
@@ -32,6 +40,19 @@ def register(
     return bind
 
 
+def pool_capacity(engine: Engine) -> typing.Optional[int]:
+    """The maximum number of connections of engine (None if unbounded)."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        # e.g. NullPool, StaticPool, SingletonThreadPool (whose size is the
+        # number of threads with a connection, not a limit)
+        return None
+    overflow = getattr(pool, "_max_overflow", 0)
+    if overflow < 0:
+        return None
+    return pool.size() + overflow
+
+
 def get_or_create(
         url: str,
         **engine_kwargs
@@ -39,3 +60,34 @@ def get_or_create(
     """Get an engine from the registry or create it if does not exist."""
     with __LOCK:
         return __ENGINE_REGISTRY.get(url) or register(url, **engine_kwargs)
+
+
+def register_async(
+        bind: typing.Union[str, "AsyncEngine"],
+        pool_pre_ping=True,
+        **engine_kwargs
+) -> "AsyncEngine":
+    """Register an async engine or create a new one (non thread-safe).
+
+    The URL must use an asyncio driver, e.g. `postgresql+asyncpg://` or
+    `sqlite+aiosqlite://`.  Requires sqlalchemy 1.4+.
+    """
+    if create_async_engine is None:
+        raise RuntimeError("sqlalchemy >= 1.4 is required for asyncio")
+    if isinstance(bind, str):
+        bind = create_async_engine(
+            bind, pool_pre_ping=pool_pre_ping, **engine_kwargs)
+
+    __ASYNC_ENGINE_REGISTRY[str(bind.url)] = bind
+    return bind
+
+
+def get_or_create_async(
+        url: str,
+        **engine_kwargs
+) -> "AsyncEngine":
+    """Get an async engine from the registry or create it if does not exist.
+    """
+    with __LOCK:
+        return __ASYNC_ENGINE_REGISTRY.get(url) or \
+            register_async(url, **engine_kwargs)
@@ -3,3 +3,4 @@ from .login import LoginEndpoint
 from .logout import LogoutEndpoint
 from .register import RegisterEndpoint
 from .confirm import ConfirmEndpoint
+from .batch import BatchEndpoint
@@ -0,0 +1,51 @@
+""" Batch operations """
+import logging
+from typing import Any, Dict, List, Union
+
+from starlette.responses import JSONResponse
+
+from fastapi_sqlalchemy import crud, models
+
+logger = logging.getLogger(__name__)
+
+
+class BatchEndpoint:
+    """ Class-based endpoint executing many crud operations at once
+
+    See `crud.batch_instances`: the operations are executed in a single
+    transaction, and the response contains the result of each one.  Only
+    the models of registry (by name) may be modified.
+    """
+
+    def __init__(
+            self,
+            registry: Dict[str, models.BASE],
+            max_operations: int = 100,
+    ):
+        self.registry = registry
+        self.max_operations = max_operations
+
+    # NOTE: no GET handler
+    async def on_post(
+            self,
+            session: models.Session,
+            operations: List[Union[crud.BatchOperation, Dict[str, Any]]],
+    ) -> JSONResponse:
+        """ POST /batch """
+        if len(operations) > self.max_operations:
+            return JSONResponse(
+                status_code=413,
+                content={
+                    "detail": f"At most {self.max_operations} operations "
+                              "may be batched"
+                }
+            )
+
+        results = await crud.batch_instances(
+            session, operations, registry=self.registry
+        )
+        logger.debug(
+            "Batch: %d operation(s), %d failed", len(results),
+            sum(1 for result in results if result["status"] >= 400)
+        )
+        return JSONResponse(content={"results": results})
@@ -6,9 +6,8 @@ from typing import Union
 from itsdangerous import URLSafeTimedSerializer, BadData
 
 from starlette.responses import HTMLResponse, JSONResponse
-from starlette.concurrency import run_in_threadpool
 
-from fastapi_sqlalchemy import models, tz, utils
+from fastapi_sqlalchemy import concurrency, models, tz, utils
 
 logger = logging.getLogger(__name__)
 
@@ -54,7 +53,7 @@ class ConfirmEndpoint:
     ) -> Union[HTMLResponse, JSONResponse]:
         """ Handle GET requests """
 
-        def _confirm() -> Union[dict, str]:
+        def _confirm(session) -> Union[dict, str]:
             try:
                 serializer = URLSafeTimedSerializer(self.secret)
                 email = serializer.loads(
@@ -87,7 +86,7 @@ class ConfirmEndpoint:
                 )
             return user.as_dict()
 
-        result = await run_in_threadpool(_confirm)
+        result = await concurrency.run_sync(session, _confirm)
         if isinstance(result, str):
             # Error condition
             return HTMLResponse(status_code=400, content=result)
@@ -7,7 +7,7 @@ from typing import Any, Optional
 from starlette.responses import HTMLResponse, JSONResponse
 from starlette.concurrency import run_in_threadpool
 
-from fastapi_sqlalchemy import tz, models, utils
+from fastapi_sqlalchemy import concurrency, tz, models, utils
 
 logger = logging.getLogger(__name__)
 
@@ -80,10 +80,9 @@ class LoginEndpoint:
     ) -> Optional[dict]:
         """ Perform authentication against database """
 
-        def _get_by_username():
-            return self.user_cls.get_by_username(session, username)
-
-        user = await run_in_threadpool(_get_by_username)
+        user = await concurrency.run_sync(
+            session, self.user_cls.get_by_username, username
+        )
         if not user:
             logger.info("Invalid user '%s'", username)
             return None
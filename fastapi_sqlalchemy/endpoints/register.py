@@ -14,7 +14,7 @@ from pydantic import EmailStr
 from starlette.responses import HTMLResponse
 from starlette.concurrency import run_in_threadpool
 
-from fastapi_sqlalchemy import models, utils
+from fastapi_sqlalchemy import concurrency, models, utils
 
 logger = logging.getLogger(__name__)
 
@@ -199,7 +199,7 @@ class RegisterEndpoint:
 
         email = EmailStr.validate(email)
 
-        def _register() -> (int, str):
+        def _register(session) -> (int, str):
 
             try:
                 self.validate_password(password)
@@ -243,15 +243,19 @@ class RegisterEndpoint:
                 return 409, self.render_form(
                     error="That username already exists.", **kwargs
                 )
+            return 200, None
 
+        def _send() -> str:
             self.send_email_confirmation(
                 base_url, email, username=username, **kwargs
             )
-
-            return 200, self.render(
+            return self.render(
                 self.sent_template,
                 username=username, email=email, **kwargs
             )
 
-        status_code, content = await run_in_threadpool(_register)
+        status_code, content = await concurrency.run_sync(session, _register)
+        if content is None:
+            # Not database work: use the default thread pool
+            content = await run_in_threadpool(_send)
         return HTMLResponse(status_code=status_code, content=content)
@@ -9,8 +9,8 @@ from starlette.responses import Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
 
-from fastapi_sqlalchemy import db_registry
-from fastapi_sqlalchemy.models import Session
+from fastapi_sqlalchemy import concurrency, db_registry, timeouts
+from fastapi_sqlalchemy.models import Session, AsyncSession
 
 
 PAYLOAD_HEADER_PREFIX = "x-payload-"
@@ -26,16 +26,39 @@ class SessionMiddleware(BaseHTTPMiddleware):
 
     Given bind will be added to `fastapi_sqlalchemy.db_registry` and so can be
     accessed from there.
+
+    With asynchronous, bind is an async engine (or URL) and the session is a
+    `models.AsyncSession` instead (sqlalchemy 1.4+).
+
+    Otherwise the `concurrency` database executor is sized to the connection
+    pool of bind - unless max_workers is given.
+
+    With statement_timeout (in seconds), the crud statements of the session
+    are limited to that time by default, see `timeouts`.
     """
     def __init__(
             self,
             app: ASGIApp,
             bind: Union[str, Connectable],
+            asynchronous: bool = False,
+            max_workers: int = None,
+            statement_timeout: float = None,
             **engine_kwargs
     ):
         super().__init__(app)
-        bind = db_registry.register(bind, **engine_kwargs)
-        Session.configure(bind=bind)
+        if asynchronous:
+            bind = db_registry.register_async(bind, **engine_kwargs)
+            AsyncSession.configure(bind=bind)
+            self.session_factory = AsyncSession
+        else:
+            bind = db_registry.register(bind, **engine_kwargs)
+            Session.configure(bind=bind)
+            self.session_factory = Session
+            concurrency.configure_executor(
+                max_workers or db_registry.pool_capacity(bind.engine)
+            )
+        self.asynchronous = asynchronous
+        self.statement_timeout = statement_timeout
 
     async def dispatch(
             self,
@@ -45,13 +68,19 @@ class SessionMiddleware(BaseHTTPMiddleware):
         added = False
         try:
             if not hasattr(request.state, "session"):
-                request.state.session = Session()
+                request.state.session = self.session_factory()
                 added = True
+                if self.statement_timeout is not None:
+                    concurrency.sync_session(request.state.session) \
+                        .info[timeouts.INFO_KEY] = self.statement_timeout
             response = await call_next(request)
         finally:
             if added:
                 # Only close a session if we added it, useful for testing
-                request.state.session.close()
+                if self.asynchronous:
+                    await request.state.session.close()
+                else:
+                    request.state.session.close()
         return response
 
 
@@ -1,8 +1,10 @@
 """ The SQLAlchemy model """
-from .base import BASE, Session
+from .base import BASE, Session, AsyncSession
 
 from .types import GUID, JSONEncodedDict, JSON_TYPE
-from .mixins import GuidMixin, TimestampMixin, DictMixin
+from .mixins import (
+    GuidMixin, TimestampMixin, SoftDeleteMixin, DictMixin, live_index
+)
 
 from .users import User
 from .groups import Group
@@ -15,3 +17,4 @@ from .associations import (
 )
 
 from . import events
+from . import fulltext
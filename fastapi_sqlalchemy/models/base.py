@@ -8,7 +8,7 @@ import sqlalchemy
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-from fastapi_sqlalchemy import tz
+from fastapi_sqlalchemy import concurrency, tz
 
 
 class Base:
@@ -22,6 +22,10 @@ class Base:
 BASE = declarative_base(cls=Base)
 Session = sessionmaker()
 
+# sqlalchemy 1.4+ only, see `concurrency`
+AsyncSession = sessionmaker(class_=concurrency.AsyncSession) \
+    if concurrency.AsyncSession is not None else None
+
 
 class ModelMapping(dict):
     """ Class to hold model information """
@@ -46,16 +50,42 @@ class ModelMapping(dict):
 MODEL_MAPPING = ModelMapping()
 
 
+def serialize_value(value):
+    """Convert a column value to its JSON-compatible representation."""
+    if isinstance(value, (tz.datetime, tz.date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
 def model_as_dict(model) -> dict:
-    """Convert given sqlalchemy model to dict (relationships not included)."""
+    """Convert given sqlalchemy model to dict (relationships not included,
+    see the include of `crud.list_instances`).
+
+    Attributes listed in the model's `__as_dict_exclude__` are omitted.
+    """
+    exclude = getattr(model, "__as_dict_exclude__", ())
     result = {}
     for attr in sqlalchemy.inspect(model).mapper.column_attrs:
-        value = getattr(model, attr.key)
-        if isinstance(value, (tz.datetime, tz.date)):
-            value = value.isoformat()
-        elif isinstance(value, uuid.UUID):
-            value = str(value)
-        elif isinstance(value, enum.Enum):
-            value = value.name
-        result[attr.key] = value
+        if attr.key in exclude:
+            continue
+        result[attr.key] = serialize_value(getattr(model, attr.key))
+    return result
+
+
+def values_as_dict(cls, values: Mapping) -> dict:
+    """Convert a mapping of column attribute values of `cls` to dict.
+
+    The result has the same format as `model_as_dict`, without having to
+    instantiate the model. Attributes missing from `values` are omitted.
+    """
+    exclude = getattr(cls, "__as_dict_exclude__", ())
+    result = {}
+    for attr in sqlalchemy.inspect(cls).column_attrs:
+        if attr.key in exclude or attr.key not in values:
+            continue
+        result[attr.key] = serialize_value(values[attr.key])
     return result
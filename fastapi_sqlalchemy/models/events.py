@@ -97,6 +97,11 @@ def _after_configured():
             )
 
     def _permissions(user):
+        # eager loaded by `crud` include: no query necessary
+        loaded = _loaded_permissions(user)
+        if loaded is not None:
+            return loaded
+
         session = inspect(user).session
         return session.query(permission_cls) \
             .join(user_permissions_table, user_cls) \
@@ -114,3 +119,20 @@ def _after_configured():
             group_permissions_table is not None and \
             group_membership_table is not None:
         user_cls.permissions = property(_permissions)
+        user_cls.__includes__ = {
+            **getattr(user_cls, "__includes__", {}),
+            "permissions": ("user_permissions", "groups.permissions"),
+        }
+
+
+def _loaded_permissions(user):
+    """ The permissions of user from its loaded relationships (or None) """
+    if {"user_permissions", "groups"} & inspect(user).unloaded:
+        return None
+    if any("permissions" in inspect(group).unloaded for group in user.groups):
+        return None
+
+    permissions = list(user.user_permissions)
+    for group in user.groups:
+        permissions.extend(group.permissions)
+    return list(dict.fromkeys(permissions))
@@ -0,0 +1,228 @@
+"""
+Full-text indexing of model columns.
+
+A model opts in by listing the columns to index:
+>>> class Document(BASE, GuidMixin):
+...     __tablename__ = "documents"
+...     __fulltext__ = ("title", "body")
+...     __fulltext_config__ = "english"  # PostgreSQL only, default "simple"
+
+When the table is created, the index is created along with it:
+ * SQLite: an FTS5 table `<table>_fts` of the columns and the primary key,
+   kept in sync by triggers on the table;
+ * PostgreSQL: a GIN index on the `tsvector` of the columns.
+
+`search` then filters (and ranks) a query using the index.  Other dialects
+fall back to ILIKE on the columns - without an index.
+
+NOTE: for a table created without the index, call `create_index`.
+"""
+import re
+import typing
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Query, mapper
+
+DEFAULT_CONFIG = "simple"
+
+# Search terms: the words of the search string, any other character ignored
+_TERM = re.compile(r"\w+")
+
+
+def _columns(table: sqlalchemy.Table) -> typing.List[sqlalchemy.Column]:
+    """ The indexed columns of table """
+    return [table.c[name] for name in table.info["fulltext"]]
+
+
+def _key(table: sqlalchemy.Table) -> sqlalchemy.Column:
+    """ The primary key column of table, that identifies the FTS5 rows
+
+    NOTE: not the rowid - which an FTS5 external content table would use -
+    since it is not stable (e.g. across VACUUM) unless aliased by an INTEGER
+    PRIMARY KEY, and `GuidMixin` tables have none.
+    """
+    columns = list(table.primary_key.columns)
+    if len(columns) != 1:
+        raise RuntimeError(
+            f"Full-text indexed table '{table.name}' must have a single "
+            "primary key column"
+        )
+    return columns[0]
+
+
+def _fts_name(table: sqlalchemy.Table) -> str:
+    """ Name of the SQLite FTS5 table of table """
+    return table.name + "_fts"
+
+
+def _index_name(table: sqlalchemy.Table) -> str:
+    """ Name of the PostgreSQL GIN index of table """
+    return "ix_" + table.name + "_fulltext"
+
+
+def _document(table: sqlalchemy.Table):
+    """ The PostgreSQL tsvector of the indexed columns of table
+
+    The expression contains no bind parameters, so that it matches the
+    expression of the index.
+    """
+    config = sqlalchemy.literal_column("'%s'" % table.info["fulltext_config"])
+    text = None
+    for column in _columns(table):
+        value = sqlalchemy.func.coalesce(
+            column, sqlalchemy.literal_column("''")
+        )
+        text = value if text is None else \
+            text.op("||")(sqlalchemy.literal_column("' '")).op("||")(value)
+    return sqlalchemy.func.to_tsvector(config, text)
+
+
+def _sqlite_ddl(table: sqlalchemy.Table) -> typing.List[str]:
+    """ The FTS5 table of table, and the triggers keeping it in sync
+
+    The primary key is indexed too (as a token), so that the row of an
+    updated or deleted key is found with the full-text index rather than a
+    scan of the FTS5 table.
+    """
+    fts = _fts_name(table)
+    key = _key(table).name
+    names = [column.name for column in _columns(table)] + [key]
+    columns = ", ".join(names)
+    new = ", ".join("new." + name for name in names)
+    delete = f"DELETE FROM {fts} WHERE {fts} MATCH " \
+        f"'{key} : \"' || replace(old.{key}, '\"', '\"\"') || '\"';"
+    insert = f"INSERT INTO {fts}({columns}) VALUES ({new});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({columns})",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table.name} "
+        f"BEGIN {insert} END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table.name} "
+        f"BEGIN {delete} END",
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {columns} "
+        f"ON {table.name} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def _after_create(table: sqlalchemy.Table, connection, **_kwargs):
+    dialect = connection.dialect
+    if dialect.name == "sqlite":
+        for statement in _sqlite_ddl(table):
+            connection.execute(sqlalchemy.DDL(statement))
+    elif dialect.name == "postgresql":
+        document = dialect.statement_compiler(dialect, None).process(
+            _document(table), include_table=False, literal_binds=True
+        )
+        connection.execute(sqlalchemy.DDL(
+            f"CREATE INDEX {_index_name(table)} ON {table.name} "
+            f"USING gin ({document})"
+        ))
+
+
+def _before_drop(table: sqlalchemy.Table, connection, **_kwargs):
+    # the triggers and the PostgreSQL index are dropped with the table
+    if connection.dialect.name == "sqlite":
+        connection.execute(sqlalchemy.DDL(
+            f"DROP TABLE IF EXISTS {_fts_name(table)}"
+        ))
+
+
+def create_index(cls, connection) -> None:
+    """ Create the full-text index of the existing table of cls
+
+    On SQLite, the FTS5 table is populated from the existing rows.
+    """
+    table = cls.__table__
+    _after_create(table, connection)
+    if connection.dialect.name == "sqlite":
+        columns = ", ".join(
+            column.name for column in _columns(table) + [_key(table)]
+        )
+        connection.execute(sqlalchemy.DDL(
+            f"INSERT INTO {_fts_name(table)}({columns}) "
+            f"SELECT {columns} FROM {table.name}"
+        ))
+
+
+@event.listens_for(mapper, "instrument_class")
+def _instrument_class(_mapper, cls):
+    names = cls.__dict__.get("__fulltext__")
+    table = getattr(cls, "__table__", None)
+    if not names or table is None:
+        return
+
+    invalid = [name for name in names if name not in table.c]
+    if invalid:
+        raise RuntimeError(
+            f"Invalid __fulltext__ column(s) of '{cls.__name__}': "
+            f"{', '.join(invalid)}"
+        )
+    _key(table)
+    table.info["fulltext"] = tuple(names)
+    table.info["fulltext_config"] = getattr(
+        cls, "__fulltext_config__", DEFAULT_CONFIG
+    )
+    event.listen(table, "after_create", _after_create)
+    event.listen(table, "before_drop", _before_drop)
+
+
+def indexed(cls) -> bool:
+    """ Whether cls has full-text indexed columns """
+    return "fulltext" in cls.__table__.info
+
+
+def terms(search_text: str) -> typing.List[str]:
+    """ The words of search_text, as searched for """
+    return _TERM.findall(search_text)
+
+
+def search(query: Query, cls, search_text: str, rank: bool = True) -> Query:
+    """ Filter query on the instances of cls matching search_text
+
+    Every word must match the prefix of a word of one of the indexed
+    columns (e.g. "jo sm" matches "John Smith").  With rank, the query is
+    ordered by relevance (after any existing order), except with the ILIKE
+    fallback.
+    """
+    table = cls.__table__
+    if not indexed(cls):
+        raise ValueError(f"'{cls.__name__}' has no __fulltext__ columns")
+
+    words = terms(search_text)
+    if not words:
+        return query.filter(sqlalchemy.false())
+
+    dialect = query.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        key = _key(table)
+        fts = sqlalchemy.table(
+            _fts_name(table),
+            sqlalchemy.column(key.name, key.type),
+            sqlalchemy.column("rank"),
+        )
+        # only the indexed columns, not the primary key
+        match = "{%s} : (%s)" % (
+            " ".join(column.name for column in _columns(table)),
+            " ".join('"%s"*' % word for word in words)
+        )
+        query = query \
+            .join(fts, fts.c[key.name] == key) \
+            .filter(sqlalchemy.literal_column(fts.name).op("MATCH")(match))
+        order = fts.c.rank
+    elif dialect == "postgresql":
+        document = _document(table)
+        tsquery = sqlalchemy.func.to_tsquery(
+            sqlalchemy.literal_column("'%s'" % table.info["fulltext_config"]),
+            " & ".join(word + ":*" for word in words)
+        )
+        query = query.filter(document.op("@@")(tsquery))
+        order = sqlalchemy.func.ts_rank(document, tsquery).desc()
+    else:
+        for word in words:
+            query = query.filter(sqlalchemy.or_(*[
+                column.ilike("%" + word + "%") for column in _columns(table)
+            ]))
+        return query
+
+    return query.order_by(order) if rank else query
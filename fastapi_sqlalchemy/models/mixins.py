@@ -2,6 +2,7 @@
 import uuid
 
 import sqlalchemy
+from sqlalchemy import event
 from sqlalchemy.ext.declarative import declared_attr
 
 from fastapi_sqlalchemy import tz
@@ -49,6 +50,70 @@ class TimestampMixin:
         return column
 
 
+class SoftDeleteMixin:
+    """ Mixin to add a deleted_at column: deleting an instance with `crud`
+    only sets deleted_at, and the reads of `crud` exclude such tombstones.
+
+    Partial indexes cover the live rows (`ix_<table>_live`, on the primary
+    key) and the tombstones (`ix_<table>_deleted_at`, for the purge, see
+    `crud.purge_instances`).  For other indexes of live rows only, see
+    `live_index`.
+    """
+    @declared_attr
+    def deleted_at(self):
+        """ Deletion timestamp """
+        column = sqlalchemy.Column(
+            sqlalchemy.DateTime(timezone=True),
+            nullable=True,
+        )
+        # pylint: disable=protected-access
+        column._creation_order = 9950
+        return column
+
+    @property
+    def deleted(self):
+        """ Whether or not the instance is deleted """
+        return self.deleted_at is not None
+
+
+def live_index(
+        name: str,
+        *columns,
+        unique: bool = False,
+        deleted_at: str = "deleted_at"
+) -> sqlalchemy.Index:
+    """ An index of the live rows of a `SoftDeleteMixin` table
+
+    e.g. `__table_args__ = (live_index("ix_people_name", "name",
+    unique=True),)` for names to be unique among live rows only.
+
+    NOTE: on databases without partial indexes (MySQL), the index covers
+    all rows.
+    """
+    where = sqlalchemy.column(deleted_at).is_(None)
+    return sqlalchemy.Index(
+        name, *columns, unique=unique,
+        postgresql_where=where, sqlite_where=where
+    )
+
+
+@event.listens_for(SoftDeleteMixin, "instrument_class", propagate=True)
+def _soft_delete_indexes(_mapper, cls):
+    table = cls.__dict__.get("__table__")
+    if table is None:  # e.g. single table inheritance
+        return
+    live = table.c.deleted_at.is_(None)
+    deleted = table.c.deleted_at.isnot(None)
+    sqlalchemy.Index(
+        "ix_%s_live" % table.name, *table.primary_key.columns,
+        postgresql_where=live, sqlite_where=live
+    )
+    sqlalchemy.Index(
+        "ix_%s_deleted_at" % table.name, table.c.deleted_at,
+        postgresql_where=deleted, sqlite_where=deleted
+    )
+
+
 class DictMixin:
     """ Mixin to add as_dict() """
 
@@ -19,6 +19,7 @@ class GUID(TypeDecorator):
     Backend-agnostic GUID Type
     """
     impl = CHAR
+    cache_ok = True  # sqlalchemy 1.4+ statement caching
 
     def load_dialect_impl(self, dialect):
         if dialect.name == "postgresql":
@@ -55,6 +56,7 @@ class JSONEncodedDict(TypeDecorator):
     """
 
     impl = TEXT
+    cache_ok = True
 
     _OPERATORS_FOR_STR = (
         operators.like_op,
@@ -29,11 +29,8 @@ class User(BASE, SimpleUser, mixins.GuidMixin, mixins.TimestampMixin):
         nullable=True,
     )
 
-    def as_dict(self):
-        """ Convert the User instance to a dictionary """
-        result = super().as_dict()
-        del result["hashed_password"]
-        return result
+    # Never include the password hash when converting to a dictionary
+    __as_dict_exclude__ = ("hashed_password",)
 
     @validates("username")
     def _set_name(
@@ -0,0 +1,154 @@
+"""
+Cache of queries translated from filter and sort specifications.
+
+Translating a `sqlalchemy_filters` specification resolves the models and
+fields and builds the SQL expressions from scratch each time, although an
+endpoint typically only ever sees a handful of specification shapes.
+
+The cache keeps the translated query per (model, specification shape),
+with the filter values replaced by bind parameters, so that subsequent
+calls only bind the new values.  Since the statements have the same
+structure for every call, they also hit the SQLAlchemy compiled cache
+(1.4+).
+
+The instances of `SoftDeleteMixin` models marked deleted are excluded.
+
+NOTE: the cache is thread-safe.
+"""
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import String, bindparam
+from sqlalchemy.orm import Query, Session
+from sqlalchemy_filters import apply_filters, apply_sort
+
+from .models.mixins import SoftDeleteMixin
+
+# Filter operators whose value is always a string pattern
+_PATTERN_OPERATORS = ("like", "ilike", "not_ilike")
+
+_BOOLEAN_FUNCTIONS = ("and", "or", "not")
+
+
+def _parametrize(filter_spec: Any, params: Dict[str, Any]) -> Tuple[Any, Any]:
+    """Replace the values of filter_spec with bind parameters.
+
+    Return the parametrized specification along with its shape, i.e. the
+    specification without the values - which is the same for all filters
+    that translate to the same SQL.  The values are added to params.
+    """
+    if isinstance(filter_spec, dict):
+        spec, shape = {}, {}
+        for key, value in filter_spec.items():
+            if key in _BOOLEAN_FUNCTIONS:
+                spec[key], shape[key] = _parametrize(value, params)
+            elif key == "value" and value is not None:
+                # NOTE: None is not parametrized as `== None` is `IS NULL`
+                name = f"spec_value_{len(params)}"
+                params[name] = value
+                expanding = isinstance(value, (list, tuple))
+                type_ = String() \
+                    if filter_spec.get("op") in _PATTERN_OPERATORS else None
+                spec[key] = bindparam(name, expanding=expanding, type_=type_)
+                shape[key] = "<list>" if expanding else "<value>"
+            else:
+                spec[key] = shape[key] = value
+        return spec, shape
+
+    if isinstance(filter_spec, (list, tuple)):
+        items = [_parametrize(item, params) for item in filter_spec]
+        return [spec for spec, _ in items], [shape for _, shape in items]
+
+    return filter_spec, filter_spec
+
+
+class QueryCache:
+    """LRU cache of queries translated by `sqlalchemy_filters`."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._templates = OrderedDict()
+
+    def _template(
+            self,
+            cls: type,
+            filter_spec: List[Dict[str, Any]] = None,
+            sort_spec: List[Dict[str, str]] = None,
+    ) -> Tuple[Query, Dict[str, Any]]:
+        params = {}
+        spec, shape = _parametrize(filter_spec, params)
+        key = (
+            cls,
+            json.dumps(shape, sort_keys=True, default=repr),
+            json.dumps(sort_spec, sort_keys=True, default=repr),
+        )
+
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template, params
+            self.misses += 1
+
+        template = Query(cls)
+        if issubclass(cls, SoftDeleteMixin):
+            template = template.filter(cls.deleted_at.is_(None))
+        if spec:
+            template = apply_filters(template, spec)
+        if sort_spec:
+            template = apply_sort(template, sort_spec)
+
+        with self._lock:
+            self._templates[key] = template
+            while len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        return template, params
+
+    def query(
+            self,
+            cls: type,
+            session: Session,
+            filter_spec: List[Dict[str, Any]] = None,
+            sort_spec: List[Dict[str, str]] = None,
+    ) -> Query:
+        """Return `session.query(cls)` with the specifications applied."""
+        template, params = self._template(cls, filter_spec, sort_spec)
+        query = template.with_session(session)
+        if params:
+            query = query.params(**params)
+        return query
+
+    def criterion(
+            self,
+            cls: type,
+            filter_spec: List[Dict[str, Any]] = None,
+    ):
+        """Return the WHERE clause of filter_spec (or None)."""
+        template, params = self._template(cls, filter_spec)
+        criterion = template.whereclause
+        if criterion is not None and params:
+            criterion = criterion.params(**params)
+        return criterion
+
+    def info(self) -> Dict[str, int]:
+        """Cache statistics."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._templates),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,160 @@
+"""
+In-process cache of crud read results.
+
+Entries are kept per model and dropped whenever rows of the model are
+created, updated or deleted through a session of this process: instances
+flushed by the ORM are detected by the `after_flush` event, while Core
+statements (e.g. `crud.update_where`) must call `touch`.  The invalidation
+is repeated `after_commit`, since another session may have re-populated the
+cache with the previous state in the meantime - and `after_rollback`, since
+a read after the flush may have cached the changes rolled back.
+
+Changes by other processes are only seen once the entries expire (ttl).
+
+The results are stored JSON encoded, which bounds the memory usage by
+max_bytes, and every hit returns a new copy that the caller may modify.
+
+NOTE: the cache is thread-safe.
+"""
+import json
+import time
+import threading
+import itertools
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Session.info key of the models modified in the current transaction
+_INFO_KEY = "response_cache_models"
+
+_CACHES = weakref.WeakSet()
+
+
+class ResponseCache:
+    """LRU cache with a TTL and a memory budget, invalidated per model."""
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            ttl: float = 60.0,
+            max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (expires, encoded value)
+        self._entries: Dict[Hashable, Tuple[float, str]] = OrderedDict()
+        self._keys: Dict[type, set] = {}
+        self._generations: Dict[type, int] = {}
+        self._bytes = 0
+        _CACHES.add(self)
+
+    def generation(self, cls: type) -> int:
+        """The current generation of cls, to pass to `set`."""
+        with self._lock:
+            return self._generations.get(cls, 0)
+
+    def get(self, key: Tuple[type, Any]) -> Any:
+        """Return a copy of the cached value of key (or None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return json.loads(entry[1])
+
+    def set(self, key: Tuple[type, Any], value: Any, generation: int):
+        """Cache value for key, whose first item is the model.
+
+        The value is only cached if the model has not been invalidated
+        since generation was taken, i.e. while the value was read.
+        """
+        cls = key[0]
+        encoded = json.dumps(value, default=str)
+        if len(encoded) > self.max_bytes:
+            return
+
+        with self._lock:
+            if self._generations.get(cls, 0) != generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, encoded)
+            self._keys.setdefault(cls, set()).add(key)
+            self._bytes += len(encoded)
+            while len(self._entries) > self.maxsize or \
+                    self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *classes: type):
+        """Remove all entries of the given models (and their bases)."""
+        with self._lock:
+            for cls in set(itertools.chain(*(cls.__mro__ for cls in classes))):
+                self._generations[cls] = self._generations.get(cls, 0) + 1
+                for key in self._keys.pop(cls, ()):
+                    self._remove(key)
+
+    def _remove(self, key):
+        _, encoded = self._entries.pop(key)
+        self._bytes -= len(encoded)
+        keys = self._keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+
+    def info(self) -> Dict[str, int]:
+        """Cache statistics."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+def touch(session: Session, *classes: type):
+    """Invalidate the given models, now and when session commits."""
+    session.info.setdefault(_INFO_KEY, set()).update(classes)
+    for cache in list(_CACHES):
+        cache.invalidate(*classes)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, _flush_context):
+    classes = {
+        type(instance) for instance in
+        itertools.chain(session.new, session.dirty, session.deleted)
+    }
+    if classes:
+        touch(session, *classes)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _after_end(session):
+    classes = session.info.pop(_INFO_KEY, None)
+    if classes:
+        for cache in list(_CACHES):
+            cache.invalidate(*classes)
@@ -0,0 +1,214 @@
+"""
+Statement timeouts and cancellation of database work.
+
+`run_sync` is `concurrency.run_sync` with a deadline: the statements of
+func are limited to the time left when it starts - with `SET LOCAL
+statement_timeout` on PostgreSQL and a progress handler on SQLite - and
+the running statement is cancelled when the ASGI client disconnects.
+
+The errors are reported as:
+ * 503 Service Unavailable - the work never started, because the database
+   executor was busy until the deadline or the client disconnected;
+ * 504 Gateway Timeout - a statement was interrupted by the timeout.
+
+The default timeout of a session is set by `SessionMiddleware`.
+
+NOTE: other dialects (and asyncio drivers other than asyncpg) cannot be
+interrupted: a started call then always runs to completion, so the session
+is never closed while still in use.
+"""
+import math
+import time
+import typing
+import asyncio
+import threading
+import contextlib
+
+import sqlalchemy.exc
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+
+from fastapi_sqlalchemy import concurrency
+
+# Session.info key of the default timeout, in seconds
+INFO_KEY = "statement_timeout"
+
+# Number of SQLite virtual machine instructions between deadline checks
+PROGRESS_STEPS = 1000
+
+# SQLSTATE of a statement canceled by statement_timeout (or a cancel request)
+_PG_QUERY_CANCELED = "57014"
+
+
+def default_timeout(session) -> typing.Optional[float]:
+    """The default statement timeout of session (if any)."""
+    session = concurrency.sync_session(session)
+    if not isinstance(session, Session):
+        return None
+    return session.info.get(INFO_KEY)
+
+
+def _interrupted(exc: sqlalchemy.exc.DBAPIError) -> bool:
+    """Whether exc is the error of an interrupted statement."""
+    if getattr(exc.orig, "pgcode", None) == _PG_QUERY_CANCELED:
+        return True
+    return str(exc.orig) == "interrupted"  # sqlite3
+
+
+@contextlib.contextmanager
+def statement_timeout(
+        session: Session,
+        seconds: float = None,
+) -> typing.Iterator[typing.Optional[typing.Callable]]:
+    """Limit the statements of session to seconds (if given).
+
+    Yields a function cancelling the running statement - that may be called
+    from another thread - or None if the dialect does not support it.
+
+    NOTE: on PostgreSQL the timeout lasts until the end of the transaction.
+    """
+    connection = session.connection()
+    dbapi_connection = connection.connection.connection
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql":
+        if seconds is not None:
+            session.execute(text(
+                "SET LOCAL statement_timeout = %d"
+                % max(1, math.ceil(seconds * 1000))
+            ))
+        yield getattr(dbapi_connection, "cancel", None)
+    elif dialect == "sqlite" and \
+            hasattr(dbapi_connection, "set_progress_handler"):
+        if seconds is not None:
+            # func may commit, returning the connection to the pool before
+            # the handler is removed: only interrupt the statements of func
+            thread = threading.get_ident()
+            deadline = time.monotonic() + seconds
+
+            def _expired() -> bool:
+                if threading.get_ident() != thread:
+                    return False
+                return time.monotonic() > deadline
+
+            dbapi_connection.set_progress_handler(_expired, PROGRESS_STEPS)
+        try:
+            yield dbapi_connection.interrupt
+        finally:
+            if seconds is not None:
+                # closed by the commit of func with a NullPool
+                with contextlib.suppress(
+                        connection.dialect.dbapi.ProgrammingError
+                ):
+                    dbapi_connection.set_progress_handler(
+                        None, PROGRESS_STEPS
+                    )
+    else:
+        yield None
+
+
+class _Call:
+    """A call of func with a deadline, that may be cancelled."""
+
+    def __init__(self, func: typing.Callable, timeout: float = None):
+        self.func = func
+        self.deadline = None if timeout is None \
+            else time.monotonic() + timeout
+        self.started = False
+        self.status_code = None
+        self._cancel = None
+        self._lock = threading.Lock()
+
+    def __call__(self, session: Session, *args) -> typing.Any:
+        with self._lock:
+            if self.status_code is not None:
+                raise HTTPException(status_code=503)
+            self.started = True
+
+        remaining = None
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                raise HTTPException(status_code=503)
+
+        try:
+            with statement_timeout(session, remaining) as cancel:
+                with self._lock:
+                    self._cancel = cancel
+                try:
+                    return self.func(session, *args)
+                finally:
+                    with self._lock:
+                        self._cancel = None
+        except sqlalchemy.exc.DBAPIError as ex:
+            if self.status_code is None and not _interrupted(ex):
+                raise
+            session.rollback()
+            raise HTTPException(status_code=self.status_code or 504) from ex
+
+    def cancel(self, status_code: int = 503) -> bool:
+        """Cancel the running statement, to fail with status_code.
+
+        Return whether func started: otherwise it will not.
+        """
+        with self._lock:
+            self.status_code = status_code
+            if self._cancel is not None:
+                self._cancel()
+            return self.started
+
+
+async def _disconnected(request: Request):
+    """Wait until the client of request disconnects.
+
+    NOTE: the request body must have been read already.
+    """
+    try:
+        while True:
+            message = await request.receive()
+            if message["type"] == "http.disconnect":
+                return
+    except RuntimeError:  # no receive channel, e.g. a Request built by hand
+        await asyncio.get_event_loop().create_future()
+
+
+async def run_sync(
+        session,
+        func: typing.Callable,
+        *args,
+        timeout: float = None,
+        request: Request = None
+) -> typing.Any:
+    """Call `func(session, *args)` like `concurrency.run_sync`, but give up
+    after timeout seconds (default: `default_timeout`) or when the client of
+    request disconnects.
+    """
+    if timeout is None:
+        timeout = default_timeout(session)
+    if timeout is None and request is None:
+        return await concurrency.run_sync(session, func, *args)
+
+    call = _Call(func, timeout)
+    task = asyncio.ensure_future(concurrency.run_sync(session, call, *args))
+    tasks = {task}
+    if request is not None:
+        tasks.add(asyncio.ensure_future(_disconnected(request)))
+    try:
+        done, _ = await asyncio.wait(
+            tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        if task not in done:
+            # timed out (504) or disconnected (503)
+            if not call.cancel(503 if done else 504):
+                task.cancel()
+                raise HTTPException(status_code=503)
+        return await task
+    except asyncio.CancelledError:
+        if not call.cancel():
+            task.cancel()
+        raise
+    finally:
+        for pending in tasks - {task}:
+            pending.cancel()
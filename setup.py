@@ -39,6 +39,9 @@ setup(
         "prod": [
             "uvicorn",
             "gunicorn",
+        ],
+        "arrow": [
+            "pyarrow",
         ]
     }
 )
@@ -7,10 +7,17 @@ import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
-from fastapi_sqlalchemy import models
+from fastapi_sqlalchemy import crud, models
 
 DATABASE_URL = os.environ["DATABASE_URL"]
 
+# asyncio driver per backend, for the async_session fixture
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
 
 @pytest.fixture(scope="function", name="loop")
 def loop_fixture():
@@ -41,6 +48,55 @@ def session_fixture(engine):
     session.close()
 
 
+@pytest.fixture(scope="function", name="statements")
+def statements_fixture(engine):
+    """ The SQL statements executed by the engine during the test """
+    statements = []
+
+    def _before_cursor_execute(_conn, _cursor, statement, *_args):
+        statements.append(statement)
+
+    sqlalchemy.event.listen(
+        engine, "before_cursor_execute", _before_cursor_execute
+    )
+    yield statements
+    sqlalchemy.event.remove(
+        engine, "before_cursor_execute", _before_cursor_execute
+    )
+
+
+@pytest.fixture(scope="function", name="async_url")
+def async_url_fixture():
+    pytest.importorskip("sqlalchemy.ext.asyncio")
+    url = sqlalchemy.engine.url.make_url(DATABASE_URL)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        pytest.skip(f"no asyncio driver for {url.get_backend_name()}")
+    pytest.importorskip(driver)
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+@pytest.fixture(scope="function", name="async_session")
+def async_session_fixture(session, async_url, loop):
+    """ An AsyncSession on the database of session (sqlalchemy 1.4+) """
+    # pylint: disable=unused-argument
+    asyncio_ext = pytest.importorskip("sqlalchemy.ext.asyncio")
+    engine = asyncio_ext.create_async_engine(async_url)
+    async_session = models.AsyncSession(bind=engine)
+
+    yield async_session
+    loop.run_until_complete(async_session.close())
+    loop.run_until_complete(engine.dispose())
+
+
+# autouse: the module level caches of crud must not leak between tests
+@pytest.fixture(scope="function", name="clear_query_cache", autouse=True)
+def clear_query_cache_fixture():
+    yield
+    crud.QUERY_CACHE.clear()
+    crud.RESPONSE_CACHE.clear()
+
+
 @pytest.fixture(scope="function", name="app")
 def app_fixture(engine):
     app = FastAPI(
@@ -11,3 +11,8 @@ class Group(models.Group):
 
 class Permission(models.Permission):
     pass
+
+
+models.create_group_membership_table()
+models.create_user_permissions_table()
+models.create_group_permissions_table()
@@ -0,0 +1,33 @@
+""" Full-text indexed test data """
+import sqlalchemy
+from sqlalchemy.orm import Session
+
+from fastapi_sqlalchemy import models
+
+NOTES_DATA = [
+    {"title": "Shopping", "body": "apples, bananas and oranges"},
+    {"title": "Recipes", "body": "apple pie: apples, flour and butter"},
+    {"title": "Apples", "body": "granny smith"},
+    {"title": "Travel", "body": "book the flights"},
+]
+
+
+class Note(models.BASE, models.GuidMixin, models.TimestampMixin):
+    __tablename__ = "notes"
+    __fulltext__ = ("title", "body")
+
+    title = sqlalchemy.Column(
+        sqlalchemy.String(255),
+        nullable=False
+    )
+
+    body = sqlalchemy.Column(
+        sqlalchemy.Text
+    )
+
+
+def load_notes(session: Session):
+    notes = [Note(**data) for data in NOTES_DATA]
+    session.add_all(notes)
+    session.commit()
+    return notes
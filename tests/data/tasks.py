@@ -0,0 +1,33 @@
+""" Soft deleted test data """
+import sqlalchemy
+from sqlalchemy.orm import Session
+
+from fastapi_sqlalchemy import models
+
+TASKS_DATA = [
+    {"name": "write"},
+    {"name": "review"},
+    {"name": "merge"},
+]
+
+
+class Task(
+        models.BASE, models.GuidMixin, models.TimestampMixin,
+        models.SoftDeleteMixin
+):
+    __tablename__ = "tasks"
+    __table_args__ = (
+        models.live_index("ix_tasks_name", "name", unique=True),
+    )
+
+    name = sqlalchemy.Column(
+        sqlalchemy.String(255),
+        nullable=False
+    )
+
+
+def load_tasks(session: Session):
+    tasks = [Task(**data) for data in TASKS_DATA]
+    session.add_all(tasks)
+    session.commit()
+    return tasks
@@ -0,0 +1,47 @@
+import pytest
+
+from fastapi_sqlalchemy import endpoints
+
+from tests.data.people import load_people, Person
+
+
+def test_batch_post(session, app, client):
+    endpoint = endpoints.BatchEndpoint({"Person": Person}, max_operations=2)
+    people = load_people(session)
+
+    @app.post("/batch")
+    async def _post(operations: list):
+        return await endpoint.on_post(session, operations)
+
+    res = client.post("/batch", json=[
+        {"op": "update", "model": "Person", "id": str(people[0].id),
+         "data": {"age": 40}},
+        {"op": "delete", "model": "Person", "id": str(people[1].id)},
+    ])
+    assert res.status_code == 200
+    assert [result["status"] for result in res.json()["results"]] == [
+        200, 200
+    ]
+
+    res = client.post("/batch", json=[{}, {}, {}])
+    assert res.status_code == 413
+
+
+def test_batch_registry(session, app, client):
+    with pytest.raises(TypeError):
+        endpoints.BatchEndpoint()  # pylint: disable=no-value-for-parameter
+
+    endpoint = endpoints.BatchEndpoint({"Person": Person})
+
+    @app.post("/batch")
+    async def _post(operations: list):
+        return await endpoint.on_post(session, operations)
+
+    # the built-in models are not batched unless registered
+    res = client.post("/batch", json=[
+        {"op": "create", "model": "User", "data": {"username": "admin"}},
+    ])
+    assert res.status_code == 200
+    assert res.json()["results"] == [
+        {"status": 400, "detail": "Invalid model: User"}
+    ]
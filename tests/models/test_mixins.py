@@ -1,7 +1,10 @@
+import pytest
+import sqlalchemy.exc
 import sqlalchemy.ext.declarative
 
-from fastapi_sqlalchemy import models
+from fastapi_sqlalchemy import models, tz
 from tests.data.models import User
+from tests.data.tasks import Task
 
 
 def test_timestamp_mixin(session):
@@ -37,3 +40,33 @@ def test_dict_mixin(mocker):
     result = model.as_dict()
     assert mock_model_as_dict.call_args == mocker.call(model)
     assert result is mock_model_as_dict.return_value
+
+
+def test_soft_delete_mixin(engine, session):
+    task = Task(name="test_soft_delete_mixin")
+    session.add(task)
+    session.commit()
+    assert task.deleted_at is None
+    assert not task.deleted
+
+    task.deleted_at = tz.utcnow()
+    session.commit()
+    assert task.deleted
+
+    # only unique among live rows
+    session.add(Task(name="test_soft_delete_mixin"))
+    session.commit()
+    session.add(Task(name="test_soft_delete_mixin"))
+    with pytest.raises(sqlalchemy.exc.IntegrityError):
+        session.commit()
+    session.rollback()
+
+    indexes = {
+        index["name"]: index["column_names"]
+        for index in sqlalchemy.inspect(engine).get_indexes("tasks")
+    }
+    assert indexes == {
+        "ix_tasks_name": ["name"],
+        "ix_tasks_live": ["id"],
+        "ix_tasks_deleted_at": ["deleted_at"],
+    }
@@ -12,10 +12,6 @@ from fastapi_sqlalchemy.models.base import MODEL_MAPPING
 
 from tests.data.models import User, Group, Permission
 
-models.create_group_membership_table()
-models.create_user_permissions_table()
-models.create_group_permissions_table()
-
 
 def _create_all(session):
 
@@ -228,6 +224,16 @@ def test_base_as_dict(mocker):
     assert result is mock_model_as_dict.return_value
 
 
+def test_user_as_dict_exclude():
+    user = User(username="alice")
+    user.password = "my_secret"
+    assert user.hashed_password
+    assert "hashed_password" not in user.as_dict()
+
+    values = {"username": "alice", "hashed_password": user.hashed_password}
+    assert base.values_as_dict(User, values) == {"username": "alice"}
+
+
 def test_user_password():
     password = "my_secret"
 
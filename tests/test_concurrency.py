@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from fastapi_sqlalchemy import concurrency
+
+
+def test_run_sync(session, loop):
+    def _func(sync_session, value, key=None):
+        assert sync_session is session
+        return value, key, threading.current_thread()
+
+    value, key, thread = loop.run_until_complete(
+        concurrency.run_sync(session, _func, 1, key="a")
+    )
+    assert (value, key) == (1, "a")
+    assert thread is not threading.current_thread()
+    assert not concurrency.is_async(session)
+    assert concurrency.sync_session(session) is session
+
+
+def test_run_sync_async(async_session, loop):
+    def _func(sync_session, value):
+        assert sync_session is async_session.sync_session
+        return value, threading.current_thread()
+
+    value, thread = loop.run_until_complete(
+        concurrency.run_sync(async_session, _func, 1)
+    )
+    assert value == 1
+    assert thread is threading.current_thread()
+    assert concurrency.is_async(async_session)
+    assert concurrency.sync_session(async_session) is \
+        async_session.sync_session
+
+
+def test_executor_metrics(loop):
+    executor = concurrency.DatabaseExecutor(max_workers=1)
+    release = threading.Event()
+
+    async def _run():
+        blocked = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: 42))
+        await asyncio.sleep(0.05)
+        metrics = executor.metrics()
+        release.set()
+        return metrics, await blocked, await queued
+
+    metrics, blocked, queued = loop.run_until_complete(_run())
+    assert (blocked, queued) == (True, 42)
+    assert metrics["active"] == 1
+    assert metrics["queued"] == 1
+
+    metrics = executor.metrics()
+    assert metrics["max_workers"] == 1
+    assert (metrics["active"], metrics["queued"]) == (0, 0)
+    assert metrics["completed"] == 2
+    assert metrics["max_wait_time"] >= 0.05
+    assert metrics["wait_time"] >= metrics["max_wait_time"]
+    executor.shutdown()
+
+
+def test_executor_cancel_queued(loop):
+    executor = concurrency.DatabaseExecutor(max_workers=1)
+    release = threading.Event()
+    calls = []
+
+    async def _run():
+        blocked = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(calls.append, 1))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await blocked
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    loop.run_until_complete(_run())
+    executor.shutdown()
+    assert not calls
+    assert executor.metrics()["queued"] == 0
+
+
+def test_configure_executor(loop):
+    previous = concurrency.get_executor()
+    executor = concurrency.configure_executor(3)
+    try:
+        assert executor is not previous
+        assert concurrency.get_executor() is executor
+        assert executor.max_workers == 3
+    finally:
+        concurrency.configure_executor()
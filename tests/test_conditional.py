@@ -0,0 +1,67 @@
+import pytest
+from starlette.requests import Request
+
+from fastapi_sqlalchemy import conditional, tz
+
+
+def _request(method="GET", **headers):
+    return Request({
+        "type": "http",
+        "method": method,
+        "headers": [
+            (key.replace("_", "-").encode(), value.encode())
+            for key, value in headers.items()
+        ],
+    })
+
+
+def test_weak_etag():
+    etag = conditional.weak_etag("people", 1, None)
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert etag == conditional.weak_etag("people", 1, None)
+    assert etag != conditional.weak_etag("people", 2, None)
+
+
+def test_headers():
+    last_modified = tz.utcdatetime(2020, 1, 2, 3, 4, 5, 678)
+    assert conditional.headers('W/"x"', last_modified) == {
+        "ETag": 'W/"x"',
+        "Last-Modified": "Thu, 02 Jan 2020 03:04:05 GMT",
+    }
+    # naive is UTC
+    assert conditional.headers('W/"x"', last_modified.replace(tzinfo=None)) \
+        == conditional.headers('W/"x"', last_modified)
+    assert conditional.headers('W/"x"') == {"ETag": 'W/"x"'}
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({}, False),
+    ({"if_none_match": 'W/"x"'}, True),
+    ({"if_none_match": '"x"'}, True),
+    ({"if_none_match": '"y", W/"x"'}, True),
+    ({"if_none_match": '"y"'}, False),
+    ({"if_none_match": "*"}, True),
+    ({"if_modified_since": "Thu, 02 Jan 2020 03:04:05 GMT"}, True),
+    ({"if_modified_since": "Thu, 02 Jan 2020 03:04:04 GMT"}, False),
+    ({"if_modified_since": "invalid"}, False),
+    # If-None-Match takes precedence
+    ({"if_none_match": '"y"',
+      "if_modified_since": "Thu, 02 Jan 2020 03:04:05 GMT"}, False),
+])
+def test_not_modified(headers, expected):
+    last_modified = tz.utcdatetime(2020, 1, 2, 3, 4, 5, 678)
+    request = _request(**headers)
+    assert conditional.not_modified(request, 'W/"x"', last_modified) \
+        is expected
+
+
+def test_not_modified_method():
+    request = _request("POST", if_none_match="*")
+    assert not conditional.not_modified(request, 'W/"x"')
+
+
+def test_not_modified_response():
+    response = conditional.not_modified_response('W/"x"')
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == 'W/"x"'
@@ -5,25 +5,22 @@ import sqlalchemy.exc
 
 from pydantic import PositiveInt
 from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
 
-from fastapi_sqlalchemy import crud
+from fastapi_sqlalchemy import crud, tz
 from fastapi_sqlalchemy.types import NonNegativeInt
 
+from tests.data.models import User
+from tests.data.tasks import Task, load_tasks
 from tests.data.people import (
     load_people, Person, PersonRequestModel, PEOPLE_DATA
 )
 
 
-@pytest.fixture(name="mock_sqlalchemy_filters")
-def fixture_mock_sqlalchemy_filters(mocker):
-    def __query(query, *_args, **__kwargs):
-        return query
-
-    apply_filters = mocker.patch(
-        "fastapi_sqlalchemy.crud.apply_filters", side_effect=__query)
-    apply_sort = mocker.patch(
-        "fastapi_sqlalchemy.crud.apply_sort", side_effect=__query)
-    return apply_filters, apply_sort
+@pytest.fixture(name="mock_query_cache")
+def fixture_mock_query_cache(mocker):
+    return mocker.patch("fastapi_sqlalchemy.crud.common.QUERY_CACHE")
 
 
 def test_crud_list(session, loop):
@@ -34,20 +31,18 @@ def test_crud_list(session, loop):
     assert expected == actual
 
 
-def test_crud_list_query(mocker, loop, mock_sqlalchemy_filters):
+def test_crud_list_query(mocker, loop, mock_query_cache):
     def __query(*_args, **__kwargs):
         return mock_query
 
-    apply_filters, apply_sort = mock_sqlalchemy_filters
-
     mock_query = mocker.Mock()
     mock_query.options = mocker.Mock(side_effect=__query)
     mock_query.offset = mocker.Mock(side_effect=__query)
     mock_query.limit = mocker.Mock(side_effect=__query)
     mock_query.all = mocker.Mock(return_value=[])
+    mock_query_cache.query.return_value = mock_query
 
     session = mocker.Mock()
-    session.query = mocker.Mock(return_value=mock_query)
 
     filter_spec = [{"filter1": "value1"}]
     sort_spec = [{"sort1": "value1"}]
@@ -58,8 +53,9 @@ def test_crud_list_query(mocker, loop, mock_sqlalchemy_filters):
     loop.run_until_complete(crud.list_instances(
         Person, session, filter_spec, sort_spec, offset, limit, options
     ))
-    assert apply_filters.call_args == mocker.call(mock_query, filter_spec)
-    assert apply_sort.call_args == mocker.call(mock_query, sort_spec)
+    assert mock_query_cache.query.call_args == mocker.call(
+        Person, session, filter_spec, sort_spec
+    )
     assert mock_query.options.call_args == mocker.call(options)
     assert mock_query.offset.call_args == mocker.call(offset)
     assert mock_query.limit.call_args == mocker.call(limit)
@@ -73,11 +69,8 @@ def test_crud_count(session, loop):
     assert len(data) == actual
 
 
-def test_crud_count_query(mocker, loop, mock_sqlalchemy_filters):
-    apply_filters, apply_sort = mock_sqlalchemy_filters
-
-    mock_query = mocker.Mock()
-    session = mocker.Mock(query=mocker.Mock(return_value=mock_query))
+def test_crud_count_query(mocker, loop, mock_query_cache):
+    session = mocker.Mock()
 
     filter_spec = [{"filter1": "value1"}]
     sort_spec = [{"sort1": "value1"}]
@@ -85,8 +78,35 @@ def test_crud_count_query(mocker, loop, mock_sqlalchemy_filters):
     loop.run_until_complete(
         crud.count_instances(Person, session, filter_spec, sort_spec)
     )
-    assert apply_filters.call_args == mocker.call(mock_query, filter_spec)
-    assert apply_sort.call_args == mocker.call(mock_query, sort_spec)
+    # The order does not matter for counting
+    assert mock_query_cache.query.call_args == mocker.call(
+        Person, session, filter_spec
+    )
+
+
+def test_crud_list_with_total(session, loop):
+    people = load_people(session)
+    filter_spec = [{"field": "gender", "value": "M"}]
+    sort_spec = [{"field": "age", "direction": "asc"}]
+    expected = sorted(
+        (person.as_dict() for person in people if person.gender == "M"),
+        key=lambda data: data["age"]
+    )
+
+    result = loop.run_until_complete(crud.list_with_total(
+        Person, session, filter_spec, sort_spec, offset=1, limit=1
+    ))
+    assert result == {"data": expected[1:2], "total": 3}
+
+    result = loop.run_until_complete(crud.list_with_total(
+        Person, session, filter_spec, sort_spec, offset=10
+    ))
+    assert result == {"data": [], "total": 3}
+
+    result = loop.run_until_complete(crud.list_with_total(
+        Person, session, [{"field": "age", "op": ">", "value": 100}]
+    ))
+    assert result == {"data": [], "total": 0}
 
 
 def test_crud_create(session, loop):
@@ -100,6 +120,27 @@ def test_crud_create(session, loop):
     assert result == PEOPLE_DATA[0]
 
 
+def _without_tz(data: dict) -> dict:
+    # sqlite does not store the timezone
+    return {
+        key: value.replace("+00:00", "") if key.endswith("_at") else value
+        for key, value in data.items()
+    }
+
+
+def test_crud_create_statements(session, loop, statements):
+    result = loop.run_until_complete(
+        crud.create_instance(
+            Person, session, PersonRequestModel(**PEOPLE_DATA[0])
+        )
+    )
+    # no SELECT to reload the instance expired by the commit
+    assert [statement.split()[0] for statement in statements] == ["INSERT"]
+
+    person = session.query(Person).get(result["id"])
+    assert _without_tz(result) == _without_tz(person.as_dict())
+
+
 def test_crud_create_409(mocker, loop):
     exc = sqlalchemy.exc.IntegrityError(
         statement="fake statement",
@@ -160,6 +201,131 @@ def test_crud_retrieve_query(mocker, loop):
     assert mock_query.options.call_args == mocker.call(options)
 
 
+def test_crud_list_fields(session, loop):
+    people = load_people(session)
+    sort_spec = [{"field": "order", "direction": "desc"}]
+
+    actual = loop.run_until_complete(crud.list_instances(
+        Person, session, sort_spec=sort_spec, limit=2,
+        fields=["name", "id", "name"]
+    ))
+    assert actual == [
+        {"id": str(person.id), "name": person.name}
+        for person in people[::-1][:2]
+    ]
+
+
+def test_crud_retrieve_fields(session, loop):
+    person = load_people(session)[0]
+
+    actual = loop.run_until_complete(crud.retrieve_instance(
+        Person, session, person.id, fields=["age", "created_at"]
+    ))
+    assert actual == {
+        "age": person.age, "created_at": person.created_at.isoformat()
+    }
+
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(crud.retrieve_instance(
+            Person, session, uuid.uuid4(), fields=["age"]
+        ))
+    assert exc_info.value.status_code == 404
+
+
+def test_crud_read_only(session, loop):
+    people = load_people(session)
+    filter_spec = [{"field": "age", "op": "<", "value": 50}]
+
+    expected = loop.run_until_complete(
+        crud.list_instances(Person, session, filter_spec)
+    )
+    actual = loop.run_until_complete(
+        crud.list_instances(Person, session, filter_spec, read_only=True)
+    )
+    assert len(actual) == 3
+    assert actual == expected
+
+    actual = loop.run_until_complete(crud.retrieve_instance(
+        Person, session, people[0].id, read_only=True
+    ))
+    assert actual == people[0].as_dict()
+
+
+def test_crud_read_only_exclude(session, loop):
+    user = User(username="alice", password="s0secret")
+    session.add(user)
+    session.commit()
+
+    actual = loop.run_until_complete(
+        crud.list_instances(User, session, read_only=True)
+    )
+    assert actual == [user.as_dict()]
+    assert "hashed_password" not in actual[0]
+
+
+@pytest.mark.parametrize("fields", [["unknown"], ["hashed_password"]])
+def test_crud_fields_400(session, loop, fields):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.list_instances(User, session, fields=fields)
+        )
+    assert exc_info.value.status_code == 400
+
+
+def test_crud_retrieve_many(mocker, session, loop, statements):
+    people = load_people(session)
+    missing = uuid.uuid4()
+    instance_ids = [people[2].id, missing, people[0].id, people[3].id,
+                    people[2].id]
+    expected = [people[2].as_dict(), people[0].as_dict(), people[3].as_dict()]
+
+    session.expunge_all()
+    mocker.patch.dict(crud.MAX_BIND_PARAMS, {"sqlite": 2})
+    statements.clear()
+
+    actual = loop.run_until_complete(
+        crud.retrieve_instances(Person, session, instance_ids)
+    )
+    assert actual == {"data": expected, "missing": [missing]}
+
+    actual = loop.run_until_complete(crud.retrieve_instances(
+        Person, session, instance_ids, read_only=True
+    ))
+    assert actual == {"data": expected, "missing": [missing]}
+    assert len(statements) == 4
+
+    actual = loop.run_until_complete(crud.retrieve_instances(
+        Person, session, instance_ids, fields=["name"]
+    ))
+    assert actual == {
+        "data": [{"name": data["name"]} for data in expected],
+        "missing": [missing],
+    }
+
+
+def test_crud_retrieve_many_str(session, loop):
+    people = load_people(session)
+    missing = uuid.uuid4()
+    instance_ids = [
+        str(people[0].id).upper(), people[1].id.hex, str(people[0].id),
+        str(missing).upper()
+    ]
+
+    actual = loop.run_until_complete(
+        crud.retrieve_instances(Person, session, instance_ids)
+    )
+    assert actual == {
+        "data": [people[0].as_dict(), people[1].as_dict()],
+        "missing": [missing],
+    }
+
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.retrieve_instances(Person, session, ["not-a-uuid"])
+        )
+    assert exc_info.value.status_code == 400
+
+
 def test_crud_update(session, loop):
     person = Person(**PEOPLE_DATA[0])
     session.add(person)
@@ -182,6 +348,25 @@ def test_crud_update(session, loop):
     assert person.name == "edith"
 
 
+def test_crud_update_statements(session, loop, statements):
+    person_id = load_people(session)[0].id
+    data = {**PEOPLE_DATA[0], "name": "edith"}
+    session.expunge_all()
+    statements.clear()
+
+    result = loop.run_until_complete(
+        crud.update_instance(
+            Person, session, person_id, PersonRequestModel(**data)
+        )
+    )
+    assert [statement.split()[0] for statement in statements] == \
+        ["SELECT", "UPDATE"]
+
+    person = session.query(Person).get(person_id)
+    assert _without_tz(result) == _without_tz(person.as_dict())
+    assert result["updated_at"] > result["created_at"]
+
+
 def test_crud_update_404(session, loop):
     with pytest.raises(HTTPException) as exc_info:
         loop.run_until_complete(
@@ -216,3 +401,477 @@ def test_crud_delete_404(session, loop):
             crud.delete_instance(Person, session, uuid.uuid4())
         )
     assert exc_info.value.status_code == 404
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 1000])
+def test_crud_create_many(session, loop, batch_size):
+    items = [PersonRequestModel(**data) for data in PEOPLE_DATA]
+    items.insert(2, PersonRequestModel(**{**PEOPLE_DATA[0], "order": 10}))
+
+    result = loop.run_until_complete(
+        crud.create_instances(Person, session, items, batch_size=batch_size)
+    )
+    assert [error["index"] for error in result["errors"]] == [2]
+    assert "UNIQUE" in result["errors"][0]["detail"]
+
+    session.rollback()
+    expected = {
+        person.id: person.as_dict() for person in session.query(Person)
+    }
+    assert len(expected) == len(PEOPLE_DATA)
+    for data in result["data"]:
+        # sqlite does not store the timezone
+        for key in ("created_at", "updated_at"):
+            data[key] = data[key].replace("+00:00", "")
+        assert data == expected[uuid.UUID(data["id"])]
+
+
+def test_crud_create_many_commit_per_batch(mocker, session, loop):
+    items = [PersonRequestModel(**data) for data in PEOPLE_DATA]
+    commit = mocker.spy(session, "commit")
+
+    result = loop.run_until_complete(
+        crud.create_instances(
+            Person, session, items, batch_size=3, commit_per_batch=True
+        )
+    )
+    assert len(result["data"]) == len(PEOPLE_DATA)
+    assert not result["errors"]
+    assert commit.call_count == 3
+    assert session.query(Person).count() == len(PEOPLE_DATA)
+
+
+def test_crud_update_where(session, loop):
+    load_people(session)
+    filter_spec = [{"field": "gender", "op": "==", "value": "M"}]
+
+    result = loop.run_until_complete(
+        crud.update_where(Person, session, filter_spec, {"age": 40})
+    )
+    assert result == {"count": 3, "data": None}
+
+    ages = {person.name: person.age for person in session.query(Person)}
+    assert ages == {"alice": 32, "bob": 40, "charlie": 40, "david": 40}
+
+
+def test_crud_update_where_returning(mocker, session, loop):
+    person = load_people(session)[0]
+    row = {
+        column: getattr(person, column.key)
+        for column in Person.__table__.columns
+    }
+    expected = person.as_dict()
+    mocker.patch("fastapi_sqlalchemy.crud.common.supports_returning",
+                 return_value=True)
+    execute = mocker.patch.object(session, "execute", return_value=[row])
+
+    result = loop.run_until_complete(
+        crud.update_where(
+            Person, session, [{"field": "name", "value": person.name}],
+            PersonRequestModel(**PEOPLE_DATA[0])
+        )
+    )
+    assert result == {"count": 1, "data": [expected]}
+    statement = execute.call_args[0][0]
+    assert statement._returning  # pylint: disable=protected-access
+
+
+def test_crud_update_where_409(session, loop):
+    load_people(session)
+    filter_spec = [{"field": "gender", "op": "==", "value": "M"}]
+
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.update_where(Person, session, filter_spec, {"name": "bob"})
+        )
+    assert exc_info.value.status_code == 409
+
+    # rolled back: the session is still usable
+    names = {person.name for person in session.query(Person)}
+    assert names == {"alice", "bob", "charlie", "david"}
+
+
+@pytest.mark.parametrize("data", [{}, {"unknown": 1}])
+def test_crud_update_where_400(session, loop, data):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(crud.update_where(Person, session, [], data))
+    assert exc_info.value.status_code == 400
+
+
+def test_crud_delete_where(session, loop):
+    load_people(session)
+    filter_spec = [{"or": [
+        {"field": "age", "op": ">", "value": 50},
+        {"field": "name", "op": "like", "value": "b%"},
+    ]}]
+
+    result = loop.run_until_complete(
+        crud.delete_where(Person, session, filter_spec)
+    )
+    assert result == {"count": 2, "data": None}
+
+    names = {person.name for person in session.query(Person)}
+    assert names == {"alice", "david"}
+
+
+def test_crud_delete_where_other_model(mocker, session, loop):
+    load_people(session)
+    mocker.patch(
+        "fastapi_sqlalchemy.query_cache.apply_filters",
+        side_effect=lambda query, _spec: query.filter(User.username == "x")
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.delete_where(Person, session, [{"field": "username"}])
+        )
+    assert exc_info.value.status_code == 400
+    assert session.query(Person).count() == len(PEOPLE_DATA)
+
+
+def test_crud_async(session, async_session, loop, statements):
+    people = load_people(session)
+    expected = [person.as_dict() for person in people]
+    statements.clear()
+
+    actual = loop.run_until_complete(
+        crud.list_instances(Person, async_session)
+    )
+    assert actual == expected
+    # executed by the async engine, not the synchronous one
+    assert not statements
+
+    actual = loop.run_until_complete(
+        crud.retrieve_instance(Person, async_session, people[0].id)
+    )
+    assert actual == expected[0]
+
+    actual = loop.run_until_complete(crud.count_instances(
+        Person, async_session, [{"field": "gender", "value": "M"}]
+    ))
+    assert actual == 3
+
+    data = PersonRequestModel(name="eve", order=5, gender="F", age=25)
+    created = loop.run_until_complete(
+        crud.create_instance(Person, async_session, data)
+    )
+    assert created["name"] == "eve"
+
+    result = loop.run_until_complete(crud.update_where(
+        Person, async_session, [{"field": "gender", "value": "F"}],
+        {"age": 30}
+    ))
+    assert result["count"] == 2
+
+    deleted = loop.run_until_complete(
+        crud.delete_instance(Person, async_session, created["id"])
+    )
+    assert deleted["age"] == 30
+    assert not statements
+
+    session.expire_all()
+    ages = {person.name: person.age for person in session.query(Person)}
+    assert ages == {"alice": 30, "bob": 22, "charlie": 60, "david": 32}
+
+
+def test_crud_patch(session, loop, statements):
+    person = load_people(session)[0]
+    expected = person.as_dict()
+    statements.clear()
+
+    result = loop.run_until_complete(crud.patch_instance(
+        Person, session, person.id, {"age": 33}
+    ))
+    assert result["age"] == 33
+    assert result["name"] == expected["name"]
+    assert result["created_at"] == expected["created_at"]
+    assert result["updated_at"] > expected["updated_at"]
+    expected_statements = ["UPDATE"] \
+        if crud.common.supports_returning(session) else ["UPDATE", "SELECT"]
+    assert [statement.split()[0] for statement in statements] == \
+        expected_statements
+
+    session.refresh(person)
+    assert person.age == 33
+
+
+def test_crud_patch_exclude_unset(session, loop):
+    person = load_people(session)[1]
+
+    class _PatchModel(PersonRequestModel):
+        name: str = None
+        order: int = None
+        gender: str = None
+        age: int = None
+
+    result = loop.run_until_complete(crud.patch_instance(
+        Person, session, person.id, _PatchModel(name="robert")
+    ))
+    assert result["name"] == "robert"
+    assert result["age"] == PEOPLE_DATA[1]["age"]
+
+
+def test_crud_patch_404(session, loop):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.patch_instance(Person, session, uuid.uuid4(), {"age": 33})
+        )
+    assert exc_info.value.status_code == 404
+
+
+@pytest.mark.parametrize("data, status_code", [
+    ({}, 400),
+    ({"unknown": 1}, 400),
+    ({"name": "bob"}, 409),
+])
+def test_crud_patch_error(session, loop, data, status_code):
+    person = load_people(session)[0]
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.patch_instance(Person, session, person.id, data)
+        )
+    assert exc_info.value.status_code == status_code
+
+
+def test_crud_cache(session, loop, statements):
+    ids = [person.id for person in load_people(session)]
+    filter_spec = [{"field": "gender", "value": "M"}]
+    session.expunge_all()
+    statements.clear()
+
+    def _list():
+        return loop.run_until_complete(crud.list_instances(
+            Person, session, filter_spec, cache=True
+        ))
+
+    def _retrieve():
+        return loop.run_until_complete(crud.retrieve_instance(
+            Person, session, ids[1], cache=True
+        ))
+
+    expected = _list()
+    assert _list() == expected
+    assert _retrieve() == _retrieve()
+    assert len(statements) == 2
+
+    # ORM flush
+    loop.run_until_complete(crud.delete_instance(
+        Person, session, ids[3]
+    ))
+    assert len(_list()) == 2
+
+    # Core statement
+    loop.run_until_complete(
+        crud.update_where(Person, session, filter_spec, {"age": 50})
+    )
+    assert [data["age"] for data in _list()] == [50, 50]
+    assert _retrieve()["age"] == 50
+    assert crud.RESPONSE_CACHE.info()["hits"] == 2
+
+
+def test_crud_conditional_retrieve(session, app, client, statements):
+    person_id = load_people(session)[0].id
+
+    @app.get("/people/{instance_id}")
+    async def _get(instance_id: uuid.UUID, request: Request,
+                   response: Response):
+        return await crud.retrieve_instance(
+            Person, session, instance_id, request=request, response=response
+        )
+
+    res = client.get(f"/people/{person_id}")
+    assert res.status_code == 200
+    assert res.json()["id"] == str(person_id)
+    etag = res.headers["etag"]
+    last_modified = res.headers["last-modified"]
+    assert etag.startswith('W/"')
+
+    statements.clear()
+    res = client.get(f"/people/{person_id}",
+                     headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["etag"] == etag
+    assert not res.content
+    # only the validator query: the row is not loaded
+    assert len(statements) == 1
+    assert "updated_at" in statements[0]
+    assert "people.name" not in statements[0]
+
+    res = client.get(f"/people/{person_id}",
+                     headers={"If-Modified-Since": last_modified})
+    assert res.status_code == 304
+
+    _increment_age(session, person_id)
+    res = client.get(f"/people/{person_id}",
+                     headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["etag"] != etag
+
+    res = client.get(f"/people/{uuid.uuid4()}")
+    assert res.status_code == 404
+
+
+def _increment_age(session, person_id):
+    person = session.query(Person).get(person_id)
+    person.age += 1
+    session.commit()
+
+
+def test_crud_conditional_list(session, app, client):
+    load_people(session)
+
+    @app.get("/people")
+    async def _get(request: Request, response: Response, gender: str = "M"):
+        return await crud.list_instances(
+            Person, session, [{"field": "gender", "value": gender}],
+            request=request, response=response
+        )
+
+    res = client.get("/people")
+    assert res.status_code == 200
+    assert len(res.json()) == 3
+    etag = res.headers["etag"]
+    # MAX(updated_at) does not change when a row is deleted
+    assert "last-modified" not in res.headers
+
+    res = client.get("/people", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+    res = client.get("/people", headers={
+        "If-Modified-Since": "Thu, 01 Jan 2099 00:00:00 GMT"
+    })
+    assert res.status_code == 200
+
+    # different filter, different etag
+    res = client.get("/people", params={"gender": "F"},
+                     headers={"If-None-Match": etag})
+    assert res.status_code == 200
+
+    session.add(Person(name="eve", order=5, gender="M", age=20))
+    session.commit()
+    res = client.get("/people", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert len(res.json()) == 4
+    etag = res.headers["etag"]
+
+    session.delete(session.query(Person).filter_by(name="bob").one())
+    session.commit()
+    res = client.get("/people", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert len(res.json()) == 3
+
+
+def test_crud_list_timeout(session, loop):
+    expected = [person.as_dict() for person in load_people(session)]
+    actual = loop.run_until_complete(
+        crud.list_instances(Person, session, timeout=5)
+    )
+    assert expected == actual
+
+
+def test_crud_write_timeout(mocker, session, loop):
+    people = load_people(session)
+    person_id = people[0].id
+    run_sync = mocker.spy(crud.timeouts, "run_sync")
+    filter_spec = [{"field": "name", "op": "==", "value": "bob"}]
+
+    async def _run():
+        await crud.approximate_count(Person, session, timeout=5)
+        await crud.retrieve_instances(Person, session, [person_id], timeout=5)
+        item = PersonRequestModel(name="eve", order=5, gender="F", age=20)
+        await crud.create_instances(Person, session, [item], timeout=5)
+        await crud.patch_instance(
+            Person, session, person_id, {"age": 40}, timeout=5
+        )
+        await crud.update_where(
+            Person, session, filter_spec, {"age": 41}, timeout=5
+        )
+        await crud.delete_where(Person, session, filter_spec, timeout=5)
+        await crud.batch_instances(session, [], {}, timeout=5)
+
+    loop.run_until_complete(_run())
+    assert run_sync.call_count == 7
+    for call in run_sync.call_args_list:
+        assert call[1]["timeout"] == 5
+
+
+def test_crud_soft_delete(session, loop):
+    tasks = load_tasks(session)
+    task_id = tasks[0].id
+
+    actual = loop.run_until_complete(
+        crud.delete_instance(Task, session, task_id)
+    )
+    assert actual["name"] == "write"
+    assert actual["deleted_at"] is not None
+
+    # the row is kept, as a tombstone
+    session.expire_all()
+    assert session.query(Task).get(task_id).deleted
+
+    def _names(**kwargs):
+        return sorted(task["name"] for task in loop.run_until_complete(
+            crud.list_instances(Task, session, **kwargs)
+        ))
+
+    assert _names() == ["merge", "review"]
+    assert _names(read_only=True) == ["merge", "review"]
+    assert loop.run_until_complete(crud.count_instances(Task, session)) == 2
+    assert loop.run_until_complete(crud.retrieve_instances(
+        Task, session, [task_id, tasks[1].id]
+    ))["missing"] == [task_id]
+
+    for coroutine in (
+            crud.retrieve_instance(Task, session, task_id),
+            crud.retrieve_instance(Task, session, task_id, read_only=True),
+            crud.patch_instance(Task, session, task_id, {"name": "x"}),
+            crud.delete_instance(Task, session, task_id),
+    ):
+        with pytest.raises(HTTPException) as exc_info:
+            loop.run_until_complete(coroutine)
+        assert exc_info.value.status_code == 404
+
+    actual = loop.run_until_complete(crud.update_where(
+        Task, session, [{"field": "name", "op": "!=", "value": "merge"}],
+        {"name": "done"}
+    ))
+    assert actual["count"] == 1
+
+    actual = loop.run_until_complete(crud.delete_where(
+        Task, session, [{"field": "id", "value": tasks[1].id}]
+    ))
+    assert actual["count"] == 1
+    assert _names() == ["merge"]
+    assert session.query(Task).count() == 3
+
+
+def test_crud_soft_delete_batch(session, loop):
+    tasks = load_tasks(session)
+    operations = [{"op": "delete", "model": "Task", "id": tasks[0].id}] * 2
+    actual = loop.run_until_complete(crud.batch_instances(
+        session, operations, registry={"Task": Task}
+    ))
+    assert [result["status"] for result in actual] == [200, 404]
+    assert session.query(Task).count() == 3
+
+
+def test_crud_purge(session, loop):
+    for index in range(5):
+        session.add(Task(name=f"task{index}", deleted_at=tz.utcnow()))
+    session.add(Task(name="live"))
+    session.commit()
+
+    actual = loop.run_until_complete(crud.purge_instances(
+        Task, session, older_than=tz.timedelta(hours=1)
+    ))
+    assert actual == 0
+
+    actual = loop.run_until_complete(
+        crud.purge_instances(Task, session, batch_size=2)
+    )
+    assert actual == 5
+    assert [task.name for task in session.query(Task)] == ["live"]
+
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(crud.purge_instances(Person, session))
+    assert exc_info.value.status_code == 400
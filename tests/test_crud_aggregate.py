@@ -0,0 +1,143 @@
+import pytest
+import sqlalchemy.exc
+import sqlalchemy.dialects.postgresql
+
+from starlette.exceptions import HTTPException
+
+from fastapi_sqlalchemy import crud
+
+from tests.data.people import load_people, Person
+
+
+def test_crud_aggregate(session, loop):
+    load_people(session)
+    actual = loop.run_until_complete(crud.aggregate_instances(
+        Person, session, group_by=["gender"],
+        metrics={"count": "*", "sum": "age", "max": ["age", "order"]}
+    ))
+    assert actual == [
+        {"gender": "F", "count": 1, "sum_age": 32, "max_age": 32,
+         "max_order": 1},
+        {"gender": "M", "count": 3, "sum_age": 114, "max_age": 60,
+         "max_order": 4},
+    ]
+
+    actual = loop.run_until_complete(crud.aggregate_instances(
+        Person, session, [{"field": "gender", "value": "M"}]
+    ))
+    assert actual == [{"count": 3}]
+
+    actual = loop.run_until_complete(
+        crud.aggregate_instances(Person, session, metrics={"avg": "age"})
+    )
+    assert actual == [{"avg_age": 36.5}]
+
+
+def test_crud_aggregate_grouping_sets(session, loop):
+    load_people(session)
+    actual = loop.run_until_complete(crud.aggregate_instances(
+        Person, session, grouping_sets=[["gender"], ["age"], []],
+        metrics={"count": "*"}
+    ))
+    assert actual == [
+        {"gender": "F", "count": 1},
+        {"gender": "M", "count": 3},
+        {"age": 22, "count": 1},
+        {"age": 32, "count": 2},
+        {"age": 60, "count": 1},
+        {"count": 4},
+    ]
+
+
+def test_crud_aggregate_grouping_sets_postgresql(session, mocker):
+    mock_session = mocker.Mock()
+    mock_session.get_bind.return_value.dialect.name = "postgresql"
+    # pylint: disable=protected-access
+    statement = crud.aggregate._aggregate_statement(
+        mock_session, Person, session.query(Person),
+        [Person.gender, Person.age],
+        [sqlalchemy.func.count()], [[0], [1], []]
+    )
+    sql = str(statement.compile(
+        dialect=sqlalchemy.dialects.postgresql.dialect()
+    ))
+    assert "GROUP BY GROUPING SETS((people.gender), (people.age), ())" in sql
+    assert "grouping(people.gender, people.age)" in sql
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"metrics": {"median": "age"}},
+    {"metrics": {"sum": "*"}},
+    {"metrics": {"sum": "unknown"}},
+    {"group_by": ["unknown"]},
+    {"group_by": ["gender"], "grouping_sets": [["gender"]]},
+    {"grouping_sets": [["gender", "age"], ["age", "gender"]]},
+])
+def test_crud_aggregate_invalid(session, loop, kwargs):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.aggregate_instances(Person, session, **kwargs)
+        )
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.parametrize("cap,expected", [
+    (None, {"count": 4, "exact": True}),
+    (4, {"count": 4, "exact": True}),
+    (2, {"count": 2, "exact": False}),
+])
+def test_crud_approximate_count_cap(session, loop, cap, expected):
+    load_people(session)
+    actual = loop.run_until_complete(
+        crud.approximate_count(Person, session, cap=cap)
+    )
+    assert actual == expected
+
+
+def test_crud_approximate_count_estimate(session, loop):
+    load_people(session)
+    filter_spec = [{"field": "gender", "value": "M"}]
+
+    # No statistics yet: fallback to counting
+    actual = loop.run_until_complete(
+        crud.approximate_count(Person, session, estimate=True)
+    )
+    assert actual == {"count": 4, "exact": True}
+
+    session.execute("ANALYZE")
+    actual = loop.run_until_complete(
+        crud.approximate_count(Person, session, estimate=True)
+    )
+    assert actual == {"count": 4, "exact": False}
+
+    # sqlite has no estimate for a filtered count
+    actual = loop.run_until_complete(crud.approximate_count(
+        Person, session, filter_spec, cap=2, estimate=True
+    ))
+    assert actual == {"count": 2, "exact": False}
+
+
+def test_crud_approximate_count_postgresql(mocker, session, loop):
+    execute = mocker.patch.object(session, "execute")
+    session.get_bind = mocker.Mock(return_value=mocker.Mock(
+        dialect=sqlalchemy.dialects.postgresql.dialect()
+    ))
+
+    execute.return_value.scalar.return_value = 1234.0
+    actual = loop.run_until_complete(
+        crud.approximate_count(Person, session, estimate=True)
+    )
+    assert actual == {"count": 1234, "exact": False}
+    assert "pg_class" in str(execute.call_args[0][0])
+
+    execute.return_value.scalar.return_value = '[{"Plan": {"Plan Rows": 3}}]'
+    actual = loop.run_until_complete(crud.approximate_count(
+        Person, session, [{"field": "age", "op": ">", "value": 30}],
+        estimate=True
+    ))
+    assert actual == {"count": 3, "exact": False}
+
+    statement = execute.call_args[0][0].compile(
+        dialect=sqlalchemy.dialects.postgresql.dialect()
+    )
+    assert str(statement).startswith("EXPLAIN (FORMAT JSON) SELECT")
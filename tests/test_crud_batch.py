@@ -0,0 +1,94 @@
+import uuid
+
+from fastapi_sqlalchemy import crud
+
+from tests.data.models import User
+from tests.data.people import load_people, Person, PEOPLE_DATA
+
+
+def test_crud_batch(session, loop):
+    people = load_people(session)
+    registry = {"Person": Person}
+
+    results = loop.run_until_complete(crud.batch_instances(session, [
+        {"op": "create", "model": "Person", "data": {
+            "name": "eve", "order": 5, "gender": "F", "age": 25,
+            "created_at": "2020-01-02T03:04:05"
+        }},
+        {"op": "update", "model": "Person", "id": str(people[0].id),
+         "data": {"age": 33}},
+        {"op": "delete", "model": "Person", "id": str(people[1].id)},
+    ], registry=registry))
+    assert [result["status"] for result in results] == [201, 200, 200]
+    assert results[0]["data"]["name"] == "eve"
+    assert results[0]["data"]["created_at"] == "2020-01-02T03:04:05+00:00"
+    assert results[1]["data"]["age"] == 33
+    assert results[2]["data"]["name"] == "bob"
+
+    session.expire_all()
+    assert sorted(person.name for person in session.query(Person)) == [
+        "alice", "charlie", "david", "eve"
+    ]
+    assert session.query(Person).get(people[0].id).age == 33
+
+
+def test_crud_batch_excluded_fields(session, loop):
+    user = User(username="user")
+    user.password = "secret"
+    session.add(user)
+    session.commit()
+    hashed_password = user.hashed_password
+
+    results = loop.run_until_complete(crud.batch_instances(session, [
+        {"op": "update", "model": "User", "id": str(user.id),
+         "data": {"hashed_password": "x"}},
+    ], registry={"User": User}))
+    assert results == [
+        {"status": 400, "detail": "Invalid field(s): hashed_password"}
+    ]
+    session.expire_all()
+    assert user.hashed_password == hashed_password
+
+
+def test_crud_batch_errors(session, loop):
+    people = load_people(session)
+    registry = {"Person": Person}
+
+    results = loop.run_until_complete(crud.batch_instances(session, [
+        {"op": "create", "model": "Person", "data": {
+            "name": "eve", "order": 5, "gender": "F", "age": 25
+        }},
+        # duplicate name
+        {"op": "create", "model": "Person", "data": {
+            "name": "alice", "order": 6, "gender": "F", "age": 25
+        }},
+        {"op": "update", "model": "Person", "id": str(uuid.uuid4()),
+         "data": {"age": 33}},
+        {"op": "update", "model": "Person", "id": str(people[0].id),
+         "data": {"missing": 1}},
+        {"op": "create", "model": "Missing", "data": {}},
+        {"op": "merge", "model": "Person", "id": str(people[0].id)},
+        {"model": "Person"},
+        # methods are not fields
+        {"op": "update", "model": "Person", "id": str(people[0].id),
+         "data": {"as_dict": 1}},
+        {"op": "create", "model": "Person", "data": {"as_dict": 1}},
+        # not bound by the GUID type
+        {"op": "create", "model": "Person", "data": {
+            "id": "not-a-uuid", "name": "frank", "order": 7, "gender": "M",
+            "age": 25
+        }},
+        {"op": "update", "model": "Person", "id": str(people[0].id),
+         "data": {"age": "old"}},
+    ], registry=registry))
+    assert [result["status"] for result in results] == [
+        201, 409, 404, 400, 400, 400, 400, 400, 400, 400, 400
+    ]
+    assert results[3]["detail"] == "Invalid field(s): missing"
+    assert results[7]["detail"] == "Invalid field(s): as_dict"
+    assert results[10]["detail"].startswith("age:")
+    assert people[0].as_dict()["name"] == "alice"
+
+    # the failed operations are rolled back alone
+    session.expire_all()
+    assert session.query(Person).count() == len(PEOPLE_DATA) + 1
@@ -0,0 +1,235 @@
+import io
+import csv
+import json
+import uuid
+import tracemalloc
+
+import pytest
+
+from starlette.exceptions import HTTPException
+
+from fastapi_sqlalchemy import concurrency, crud
+
+from tests.data.people import load_people, Person, PEOPLE_DATA
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_crud_stream(session, app, client, chunk_size):
+    people = load_people(session)
+    expected = [person.as_dict() for person in people]
+    sort_spec = [{"field": "order", "direction": "asc"}]
+
+    @app.get("/people")
+    async def _get(fmt: str = "json"):
+        return await crud.stream_instances(
+            Person, session, sort_spec=sort_spec, format=fmt,
+            chunk_size=chunk_size
+        )
+
+    res = client.get("/people")
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/json"
+    assert res.json() == expected
+
+    res = client.get("/people", params={"fmt": "ndjson"})
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    lines = res.text.splitlines()
+    assert [json.loads(line) for line in lines] == expected
+
+
+def test_crud_stream_empty(session, app, client):
+    @app.get("/people")
+    async def _get():
+        return await crud.stream_instances(Person, session)
+
+    res = client.get("/people")
+    assert res.status_code == 200
+    assert res.json() == []
+
+
+@pytest.mark.parametrize("export", [False, True])
+def test_crud_stream_executor(mocker, session, loop, export):
+    load_people(session)
+    run = mocker.spy(concurrency.DatabaseExecutor, "run")
+
+    async def _read():
+        if export:
+            response = await crud.export_instances(
+                Person, session, fields=["name"], chunk_size=1
+            )
+        else:
+            response = await crud.stream_instances(
+                Person, session, chunk_size=1
+            )
+        return [chunk async for chunk in response.body_iterator]
+
+    chunks = loop.run_until_complete(_read())
+    assert len(chunks) == len(PEOPLE_DATA) + 2
+    # a chunk per call, then the end of the rows and the close
+    assert run.call_count == len(PEOPLE_DATA) + 2
+
+
+def test_crud_stream_400(session, loop):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.stream_instances(Person, session, format="xml")
+        )
+    assert exc_info.value.status_code == 400
+
+
+def test_crud_async_stream(session, async_session, loop):
+    expected = [person.as_dict() for person in load_people(session)]
+    sort_spec = [{"field": "order", "direction": "asc"}]
+
+    async def _read():
+        response = await crud.stream_instances(
+            Person, async_session, sort_spec=sort_spec, chunk_size=3
+        )
+        return "".join([chunk async for chunk in response.body_iterator])
+
+    assert json.loads(loop.run_until_complete(_read())) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_crud_export_csv(session, app, client, chunk_size):
+    load_people(session)
+    sort_spec = [{"field": "order", "direction": "asc"}]
+
+    @app.get("/people.csv")
+    async def _get():
+        return await crud.export_instances(
+            Person, session, sort_spec=sort_spec, fields=["name", "age"],
+            chunk_size=chunk_size
+        )
+
+    res = client.get("/people.csv")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/csv")
+    assert list(csv.reader(io.StringIO(res.text))) == [["name", "age"]] + [
+        [data["name"], str(data["age"])] for data in PEOPLE_DATA
+    ]
+
+
+def test_crud_export_ndjson(session, app, client):
+    people = load_people(session)
+    filter_spec = [{"field": "gender", "op": "==", "value": "M"}]
+    sort_spec = [{"field": "order", "direction": "asc"}]
+
+    @app.get("/people")
+    async def _get():
+        return await crud.export_instances(
+            Person, session, filter_spec, sort_spec, format="ndjson"
+        )
+
+    res = client.get("/people")
+    assert res.status_code == 200
+    assert [json.loads(line) for line in res.text.splitlines()] == [
+        person.as_dict() for person in people if person.gender == "M"
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_crud_export_arrow(session, app, client, fmt):
+    pyarrow = pytest.importorskip("pyarrow")
+    pytest.importorskip("pyarrow.parquet")
+    people = load_people(session)
+    sort_spec = [{"field": "order", "direction": "asc"}]
+
+    @app.get("/people")
+    async def _get():
+        return await crud.export_instances(
+            Person, session, sort_spec=sort_spec, format=fmt, chunk_size=3
+        )
+
+    res = client.get("/people")
+    assert res.status_code == 200
+    if fmt == "arrow":
+        table = pyarrow.ipc.open_stream(res.content).read_all()
+    else:
+        parquet_file = pyarrow.parquet.ParquetFile(io.BytesIO(res.content))
+        assert parquet_file.num_row_groups == 2
+        table = parquet_file.read()
+
+    assert table.schema.field("age").type == pyarrow.int64()
+    assert table.schema.field("created_at").type == \
+        pyarrow.timestamp("us", tz="UTC")
+    assert table.column("id").to_pylist() == [
+        str(person.id) for person in people
+    ]
+    assert table.column("name").to_pylist() == [
+        data["name"] for data in PEOPLE_DATA
+    ]
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_crud_export_memory(request, session, loop, is_async):
+    reader = request.getfixturevalue("async_session") if is_async \
+        else session
+
+    def _peak(count: int) -> int:
+        session.execute(Person.__table__.delete())
+        session.execute(Person.__table__.insert(), [
+            {"id": uuid.uuid4(), "name": f"person{index}", "order": index,
+             "gender": "F", "age": 20} for index in range(count)
+        ])
+        session.commit()
+
+        async def _export():
+            response = await crud.export_instances(
+                Person, reader, chunk_size=100
+            )
+            async for _chunk in response.body_iterator:
+                pass
+
+        tracemalloc.start()
+        loop.run_until_complete(_export())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    _peak(100)  # warm up
+    # the rows are fetched a chunk at a time, not all at once
+    assert _peak(8000) < 2 * _peak(2000)
+
+
+def test_crud_export_empty(session, app, client):
+    @app.get("/people.csv")
+    async def _get():
+        return await crud.export_instances(Person, session, fields=["name"])
+
+    res = client.get("/people.csv")
+    assert res.status_code == 200
+    assert res.text.splitlines() == ["name"]
+
+
+def test_crud_export_400(session, loop, mocker):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.export_instances(Person, session, format="xml")
+        )
+    assert exc_info.value.status_code == 400
+
+    mocker.patch("fastapi_sqlalchemy.crud.bulk_export.pyarrow", None)
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.export_instances(Person, session, format="parquet")
+        )
+    assert exc_info.value.status_code == 400
+    assert "pyarrow" in exc_info.value.detail
+
+
+def test_crud_async_export(session, async_session, loop):
+    load_people(session)
+    sort_spec = [{"field": "order", "direction": "asc"}]
+
+    async def _read():
+        response = await crud.export_instances(
+            Person, async_session, sort_spec=sort_spec, fields=["name"],
+            chunk_size=3
+        )
+        return "".join([chunk async for chunk in response.body_iterator])
+
+    assert loop.run_until_complete(_read()).splitlines() == ["name"] + [
+        data["name"] for data in PEOPLE_DATA
+    ]
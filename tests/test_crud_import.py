@@ -0,0 +1,172 @@
+import io
+import csv
+import json
+import uuid
+
+import pytest
+import sqlalchemy.exc
+import sqlalchemy.dialects.postgresql
+
+from starlette.exceptions import HTTPException
+
+from fastapi_sqlalchemy import crud
+
+from tests.data.people import load_people, Person, PEOPLE_DATA
+
+
+def _people_csv(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["name", "order", "gender", "age"])
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 1000])
+def test_crud_import_csv(session, loop, batch_size):
+    rows = [
+        [data[key] for key in ("name", "order", "gender", "age")]
+        for data in PEOPLE_DATA
+    ]
+    rows.extend([
+        ["eve", "5"],  # missing values
+        ["frank", "six", "M", "20"],  # invalid integer
+        ["alice", "7", "F", "30"],  # duplicate name
+        ['"gina"\nsmith', "8", "F", ""],  # NULL age
+        ['gina\n"smith"', "9", "F", "41"],
+    ])
+    text = _people_csv(rows)
+    # chunks splitting lines and quoted values
+    chunks = [text[index:index + 7] for index in range(0, len(text), 7)]
+
+    result = loop.run_until_complete(crud.import_instances(
+        Person, session, chunks, batch_size=batch_size
+    ))
+    assert result["count"] == len(PEOPLE_DATA) + 1
+    assert [error["index"] for error in result["errors"]] == [4, 5, 6, 7]
+    assert "Expected 4 values" in result["errors"][0]["detail"]
+    assert result["errors"][1]["detail"].startswith("order:")
+    assert "UNIQUE" in result["errors"][2]["detail"]
+    assert "NOT NULL" in result["errors"][3]["detail"]
+
+    session.rollback()
+    people = {person.name: person for person in session.query(Person)}
+    assert sorted(people) == sorted(
+        [data["name"] for data in PEOPLE_DATA] + ['gina\n"smith"']
+    )
+    assert people["alice"].age == 32
+    assert isinstance(people["alice"].id, uuid.UUID)
+    assert people["alice"].created_at is not None
+
+
+def test_crud_async_import(session, async_session, loop):
+    load_people(session)
+    text = _people_csv([
+        ["eve", "5", "F", "25"],
+        ["alice", "6", "F", "30"],  # duplicate name
+    ])
+
+    result = loop.run_until_complete(crud.import_instances(
+        Person, async_session, [text], batch_size=2
+    ))
+    assert result["count"] == 1
+    assert [error["index"] for error in result["errors"]] == [1]
+    assert "UNIQUE" in result["errors"][0]["detail"]
+
+    session.expire_all()
+    assert session.query(Person).count() == len(PEOPLE_DATA) + 1
+
+
+def test_crud_import_ndjson(session, loop):
+    person_id = uuid.uuid4()
+    lines = [
+        json.dumps({**PEOPLE_DATA[0], "id": str(person_id),
+                    "created_at": "2020-01-02T03:04:05"}),
+        "",
+        "not json",
+        json.dumps([1, 2]),
+        json.dumps("hello"),
+        json.dumps({**PEOPLE_DATA[1], "missing": 1}),
+        json.dumps({**PEOPLE_DATA[2], "id": "not-a-uuid"}),
+        json.dumps(PEOPLE_DATA[3]),
+    ]
+
+    async def _source():
+        for line in lines:
+            yield (line + "\n").encode("utf-8")
+
+    result = loop.run_until_complete(crud.import_instances(
+        Person, session, _source(), format="ndjson"
+    ))
+    assert result["count"] == 2
+    assert [error["index"] for error in result["errors"]] == [1, 2, 3, 4, 5]
+    assert "Invalid JSON" in result["errors"][0]["detail"]
+    assert result["errors"][1]["detail"] == "Expected a JSON object"
+    assert result["errors"][2]["detail"] == "Expected a JSON object"
+    assert result["errors"][3]["detail"] == "Invalid field(s): missing"
+    assert result["errors"][4]["detail"].startswith("id:")
+
+    session.rollback()
+    person = session.query(Person).get(person_id)
+    assert person.name == PEOPLE_DATA[0]["name"]
+    assert person.as_dict()["created_at"].startswith("2020-01-02T03:04:05")
+
+
+def test_crud_import_export(session, app, client, loop):
+    people = load_people(session)
+    expected = sorted(
+        (person.as_dict() for person in people), key=lambda x: x["order"]
+    )
+
+    @app.get("/people.csv")
+    async def _get():
+        return await crud.export_instances(Person, session)
+
+    text = client.get("/people.csv").text
+    session.query(Person).delete()
+    session.commit()
+
+    result = loop.run_until_complete(crud.import_instances(
+        Person, session, [text.encode("utf-8")], commit_per_batch=False
+    ))
+    assert result == {"count": len(people), "errors": []}
+
+    session.expire_all()
+    actual = sorted(
+        (person.as_dict() for person in session.query(Person)),
+        key=lambda x: x["order"]
+    )
+    assert actual == expected
+
+
+def test_crud_import_400(session, loop):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.import_instances(Person, session, [], format="xml")
+        )
+    assert exc_info.value.status_code == 400
+
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.import_instances(Person, session, ["name,missing\n"])
+        )
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Invalid field(s): missing"
+
+
+def test_crud_import_copy_text():
+    dialect = sqlalchemy.dialects.postgresql.dialect()
+    columns = [
+        Person.__table__.c.id, Person.__table__.c.name,
+        Person.__table__.c.age,
+    ]
+    person_id = uuid.uuid4()
+    # pylint: disable=protected-access
+    text = crud.bulk_import._copy_text(dialect, columns, [
+        [person_id, 'alice "al"', 32],
+        [person_id, "\\N", None],
+    ])
+    assert text == (
+        f'"{person_id}","alice ""al""","32"\n'
+        f'"{person_id}","\\N",\\N\n'
+    )
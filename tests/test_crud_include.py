@@ -0,0 +1,83 @@
+import pytest
+
+from starlette.exceptions import HTTPException
+
+from fastapi_sqlalchemy import crud
+
+from tests.data.models import User, Group, Permission
+
+
+def _create_users(session, count):
+    read, write = Permission(name="READ"), Permission(name="WRITE")
+    admins = Group(name="admins", permissions=[write])
+    users = [
+        User(
+            username=f"user{index}", groups=[admins],
+            user_permissions=[read]
+        )
+        for index in range(count)
+    ]
+    session.add_all(users)
+    session.commit()
+    session.expunge_all()
+
+
+@pytest.mark.parametrize("count", [2, 8])
+def test_crud_list_include(session, loop, statements, count):
+    _create_users(session, count)
+
+    del statements[:]
+    actual = loop.run_until_complete(crud.list_instances(
+        User, session, include=["groups", "permissions"]
+    ))
+    # users, groups, user_permissions and groups.permissions
+    assert len(statements) == 4
+
+    assert len(actual) == count
+    for user in actual:
+        assert "hashed_password" not in user
+        assert [group["name"] for group in user["groups"]] == ["admins"]
+        assert "permissions" not in user["groups"][0]
+        assert sorted(
+            permission["name"] for permission in user["permissions"]
+        ) == ["READ", "WRITE"]
+
+
+def test_crud_list_include_nested(session, loop):
+    _create_users(session, 1)
+
+    actual = loop.run_until_complete(crud.list_instances(
+        User, session, include=["groups.permissions"]
+    ))
+    assert [
+        permission["name"]
+        for permission in actual[0]["groups"][0]["permissions"]
+    ] == ["WRITE"]
+
+
+def test_crud_retrieve_include(session, loop, statements):
+    _create_users(session, 1)
+    user_id = session.query(User.id).scalar()
+    session.expunge_all()
+
+    del statements[:]
+    actual = loop.run_until_complete(crud.retrieve_instance(
+        User, session, user_id, include=["groups"]
+    ))
+    assert len(statements) == 2
+    assert actual["id"] == str(user_id)
+    assert [group["name"] for group in actual["groups"]] == ["admins"]
+
+
+@pytest.mark.parametrize("include,read_only", [
+    (["missing"], False),
+    (["groups.missing"], False),
+    (["permissions.name"], False),
+    (["groups"], True),
+])
+def test_crud_list_include_invalid(session, loop, include, read_only):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(crud.list_instances(
+            User, session, include=include, read_only=read_only
+        ))
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,107 @@
+import pytest
+import sqlalchemy.exc
+import sqlalchemy.dialects.postgresql
+
+from starlette.exceptions import HTTPException
+
+from fastapi_sqlalchemy import crud
+
+from fastapi_sqlalchemy.models import fulltext
+from tests.data.notes import Note, load_notes
+from tests.data.people import Person
+
+
+def test_crud_list_search(session, loop):
+    notes = load_notes(session)
+
+    def _titles(search, **kwargs):
+        return [note["title"] for note in loop.run_until_complete(
+            crud.list_instances(Note, session, search=search, **kwargs)
+        )]
+
+    assert sorted(_titles("apple")) == ["Apples", "Recipes", "Shopping"]
+    assert _titles("APPLE pie") == ["Recipes"]
+    assert _titles("apple", sort_spec=[
+        {"field": "title", "direction": "asc"}
+    ]) == ["Apples", "Recipes", "Shopping"]
+    assert _titles("apple", limit=1, sort_spec=[
+        {"field": "title", "direction": "desc"}
+    ]) == ["Shopping"]
+    assert _titles("granny", filter_spec=[
+        {"field": "title", "value": "Travel"}
+    ]) == []
+    assert _titles("!!") == []
+    assert loop.run_until_complete(
+        crud.count_instances(Note, session, search="apple")
+    ) == 3
+    assert loop.run_until_complete(crud.aggregate_instances(
+        Note, session, grouping_sets=[[]], search="apple"
+    )) == [{"count": 3}]
+
+    # the index is kept up to date
+    notes[3].body = "apple strudel"
+    session.delete(notes[2])
+    session.commit()
+    assert sorted(_titles("apple")) == ["Recipes", "Shopping", "Travel"]
+    assert _titles("granny") == []
+    assert _titles("flights") == []
+    # the primary key is indexed, but not searched
+    assert _titles(notes[0].id.hex) == []
+
+    # the rowids of a table without INTEGER PRIMARY KEY are not stable
+    session.execute("VACUUM")
+    notes[0].body = "pears"
+    session.commit()
+    assert sorted(_titles("apple")) == ["Recipes", "Travel"]
+    assert _titles("pears") == ["Shopping"]
+
+
+def test_fulltext_create_index(engine, session, loop):
+    load_notes(session)
+    # as if the table was created without the index
+    with engine.begin() as connection:
+        connection.execute("DROP TABLE notes_fts")
+        for trigger in ("ai", "ad", "au"):
+            connection.execute(f"DROP TRIGGER notes_fts_{trigger}")
+        fulltext.create_index(Note, connection)
+
+    actual = loop.run_until_complete(
+        crud.count_instances(Note, session, search="apple")
+    )
+    assert actual == 3
+
+
+def test_crud_list_search_rank(session, loop):
+    load_notes(session)
+    actual = loop.run_until_complete(crud.list_instances(
+        Note, session, search="apples", fields=["title"]
+    ))
+    # the title is shorter than the bodies
+    assert actual[0] == {"title": "Apples"}
+
+
+def test_crud_list_search_not_indexed(session, loop):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.list_instances(Person, session, search="alice")
+        )
+    assert exc_info.value.status_code == 400
+
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            crud.count_instances(Person, session, search="alice")
+        )
+    assert exc_info.value.status_code == 400
+
+
+def test_fulltext_postgresql_index():
+    dialect = sqlalchemy.dialects.postgresql.dialect()
+    # pylint: disable=protected-access
+    document = dialect.statement_compiler(dialect, None).process(
+        fulltext._document(Note.__table__),
+        include_table=False, literal_binds=True
+    )
+    assert document == (
+        "to_tsvector('simple', (coalesce(title, '') || ' ') || "
+        "coalesce(body, ''))"
+    )
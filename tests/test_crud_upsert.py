@@ -0,0 +1,140 @@
+import uuid
+
+import pytest
+import sqlalchemy.exc
+import sqlalchemy.dialects.mssql
+import sqlalchemy.dialects.mysql
+import sqlalchemy.dialects.postgresql
+
+from pydantic import BaseModel
+from starlette.exceptions import HTTPException
+
+from fastapi_sqlalchemy import crud
+
+from tests.data.tasks import Task, TASKS_DATA, load_tasks
+from tests.data.people import (
+    load_people, Person, PersonRequestModel, PEOPLE_DATA
+)
+
+
+def test_crud_upsert(session, loop):
+    people = load_people(session)
+    items = [
+        PersonRequestModel(**{**PEOPLE_DATA[1], "age": 23}),
+        PersonRequestModel(name="eve", order=5, gender="F", age=25),
+        PersonRequestModel(**{**PEOPLE_DATA[3], "age": 33}),
+    ]
+
+    result = loop.run_until_complete(crud.upsert_instances(
+        Person, session, items, conflict_columns=["name"]
+    ))
+    assert [data["name"] for data in result] == ["bob", "eve", "david"]
+    assert [data["age"] for data in result] == [23, 25, 33]
+    # existing rows keep their id and created_at, but updated_at is bumped
+    assert result[0]["id"] == str(people[1].id)
+    assert result[0]["created_at"].replace("+00:00", "") == \
+        people[1].created_at.isoformat().replace("+00:00", "")
+    assert result[0]["updated_at"] > result[0]["created_at"]
+
+    session.expire_all()
+    ages = {person.name: person.age for person in session.query(Person)}
+    assert ages == {"alice": 32, "bob": 23, "charlie": 60, "david": 33,
+                    "eve": 25}
+
+    data = PersonRequestModel(**{**PEOPLE_DATA[0], "age": 40})
+    result = loop.run_until_complete(crud.upsert_instance(
+        Person, session, data, conflict_columns=["order"]
+    ))
+    assert result["id"] == str(people[0].id)
+    assert result["age"] == 40
+    assert session.query(Person).count() == 5
+
+
+def test_crud_upsert_statement():
+    # pylint: disable=protected-access
+    rows = [crud.common.insert_values(Person, data) for data in PEOPLE_DATA]
+    update = {"age": None, "updated_at": crud.tz.utcnow()}
+
+    dialect = sqlalchemy.dialects.postgresql.dialect()
+    statement = crud.upsert._upsert_statement(
+        Person, dialect, rows, ["name"], update
+    )
+    sql = str(statement.compile(dialect=dialect))
+    assert "ON CONFLICT (name) DO UPDATE SET age = excluded.age" in sql
+
+    dialect = sqlalchemy.dialects.mysql.dialect()
+    statement = crud.upsert._upsert_statement(
+        Person, dialect, rows, ["name"], update
+    )
+    sql = str(statement.compile(dialect=dialect))
+    assert "ON DUPLICATE KEY UPDATE age = VALUES(age)" in sql
+
+    assert crud.upsert._upsert_statement(
+        Person, sqlalchemy.dialects.mssql.dialect(), rows, ["name"], update
+    ) is None
+
+
+@pytest.mark.parametrize("conflict_columns", [["unknown"]])
+def test_crud_upsert_400(session, loop, conflict_columns):
+    data = PersonRequestModel(**PEOPLE_DATA[0])
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(crud.upsert_instance(
+            Person, session, data, conflict_columns=conflict_columns
+        ))
+    assert exc_info.value.status_code == 400
+
+
+def test_crud_upsert_409(session, loop):
+    load_people(session)
+    # a new name, but a conflicting (unique) order
+    data = PersonRequestModel(**{**PEOPLE_DATA[0], "name": "eve"})
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(crud.upsert_instance(
+            Person, session, data, conflict_columns=["name"]
+        ))
+    assert exc_info.value.status_code == 409
+
+
+class TaskRequestModel(BaseModel):
+    id: uuid.UUID = None
+    name: str
+
+
+def test_crud_soft_delete_upsert(session, loop):
+    tasks = load_tasks(session)
+    loop.run_until_complete(crud.delete_instance(Task, session, tasks[0].id))
+
+    # the name of a tombstone is free (see live_index)
+    result = loop.run_until_complete(crud.upsert_instances(
+        Task, session, [
+            TaskRequestModel(name="write"), TaskRequestModel(name="review")
+        ], conflict_columns=["name"]
+    ))
+    assert result[0]["id"] != str(tasks[0].id)
+    assert result[1]["id"] == str(tasks[1].id)
+    assert loop.run_until_complete(crud.count_instances(Task, session)) == 3
+    assert session.query(Task).count() == 4
+
+    # upserting a tombstone restores it
+    loop.run_until_complete(crud.delete_instance(Task, session, tasks[2].id))
+    result = loop.run_until_complete(crud.upsert_instance(
+        Task, session, TaskRequestModel(id=tasks[2].id, name="merged")
+    ))
+    assert result["deleted_at"] is None
+    assert loop.run_until_complete(
+        crud.retrieve_instance(Task, session, tasks[2].id)
+    )["name"] == "merged"
+
+
+def test_crud_soft_delete_upsert_statement():
+    # pylint: disable=protected-access
+    rows = [crud.common.insert_values(Task, data) for data in TASKS_DATA]
+    dialect = sqlalchemy.dialects.postgresql.dialect()
+    statement = crud.upsert._upsert_statement(
+        Task, dialect, rows, ["name"], {"deleted_at": None}
+    )
+    sql = str(statement.compile(dialect=dialect))
+    assert "ON CONFLICT (name) WHERE deleted_at IS NULL DO UPDATE" in sql
+    assert crud.upsert._live_conflict(Task, ["name"])
+    assert not crud.upsert._live_conflict(Task, ["id"])
+    assert not crud.upsert._live_conflict(Person, ["name"])
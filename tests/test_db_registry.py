@@ -1,4 +1,6 @@
 import pytest
+import sqlalchemy
+import sqlalchemy.pool
 
 from fastapi_sqlalchemy import db_registry
 
@@ -58,3 +60,39 @@ def test_get_or_create_by_url(mock_create_engine):
     assert registered_engine_2 is created_engine_2
 
     assert mock_create_engine.call_count == 2
+
+
+def test_register_async(mocker):
+    mock_create_async_engine = mocker.patch(
+        "fastapi_sqlalchemy.db_registry.create_async_engine",
+        side_effect=lambda url, **kwargs: mocker.Mock(url=url, **kwargs))
+    url = "/fake/async/url"
+
+    created_engine = db_registry.get_or_create_async(url)
+    assert created_engine
+
+    registered_engine = db_registry.get_or_create_async(url)
+    assert registered_engine is created_engine
+
+    assert mock_create_async_engine.call_args_list == [
+        mocker.call(url, pool_pre_ping=True)
+    ]
+
+
+def test_register_async_unavailable(mocker):
+    mocker.patch("fastapi_sqlalchemy.db_registry.create_async_engine", None)
+    with pytest.raises(RuntimeError):
+        db_registry.register_async("/fake/async/url")
+
+
+@pytest.mark.parametrize("pool_kwargs, expected", [
+    ({"pool_size": 5, "max_overflow": 10}, 15),
+    ({"pool_size": 5, "max_overflow": -1}, None),
+    ({"poolclass": sqlalchemy.pool.StaticPool}, None),
+    ({"poolclass": sqlalchemy.pool.SingletonThreadPool}, None),
+])
+def test_pool_capacity(pool_kwargs, expected):
+    engine = sqlalchemy.create_engine(
+        "sqlite://", **{"poolclass": sqlalchemy.pool.QueuePool, **pool_kwargs}
+    )
+    assert db_registry.pool_capacity(engine) == expected
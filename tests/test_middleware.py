@@ -1,9 +1,10 @@
 import jwt
+import sqlalchemy
 from fastapi import Depends
 
 from starlette.requests import Request
 
-from fastapi_sqlalchemy import middleware, utils
+from fastapi_sqlalchemy import concurrency, middleware, timeouts, utils
 
 
 def test_middleware_upstream(session, app, client):
@@ -76,3 +77,72 @@ def test_middleware_session(engine, app, client):
     response = client.get("/session")
     assert response.status_code == 200
     assert response.json() == "1"
+
+
+def test_middleware_session_async(session, async_url, app, client):
+    app.add_middleware(
+        middleware.SessionMiddleware, bind=str(async_url), asynchronous=True
+    )
+
+    @app.get("/session")
+    async def _get(request: Request, session=Depends(utils.get_session)):
+        assert request.state.session is session
+        assert isinstance(session, concurrency.AsyncSession)
+
+        result = await session.execute(sqlalchemy.text("SELECT 1"))
+        return str(result.scalar())
+
+    response = client.get("/session")
+    assert response.status_code == 200
+    assert response.json() == "1"
+
+
+def test_middleware_session_executor(engine, app, client):
+    app.add_middleware(
+        middleware.SessionMiddleware, bind=engine, max_workers=7
+    )
+
+    @app.get("/executor")
+    def _get():
+        return concurrency.get_executor().metrics()
+
+    try:
+        response = client.get("/executor")
+        assert response.status_code == 200
+        assert response.json()["max_workers"] == 7
+    finally:
+        concurrency.configure_executor()
+
+
+def test_middleware_session_memory(app, client):
+    # the default pool of an in-memory database is a SingletonThreadPool
+    app.add_middleware(middleware.SessionMiddleware, bind="sqlite://")
+
+    @app.get("/executor")
+    def _get():
+        return concurrency.get_executor().metrics()
+
+    try:
+        response = client.get("/executor")
+        assert response.status_code == 200
+        assert response.json()["max_workers"] == \
+            concurrency.DEFAULT_MAX_WORKERS
+    finally:
+        concurrency.configure_executor()
+
+
+def test_middleware_session_statement_timeout(engine, app, client):
+    app.add_middleware(
+        middleware.SessionMiddleware, bind=engine, statement_timeout=2.5
+    )
+
+    @app.get("/timeout")
+    def _get(request: Request):
+        return timeouts.default_timeout(request.state.session)
+
+    try:
+        response = client.get("/timeout")
+        assert response.status_code == 200
+        assert response.json() == 2.5
+    finally:
+        concurrency.configure_executor()
@@ -0,0 +1,109 @@
+import sqlalchemy
+import pytest
+
+from fastapi_sqlalchemy import models
+from fastapi_sqlalchemy.query_cache import QueryCache
+
+from tests.data.people import load_people, Person
+
+
+class Document(models.BASE, models.GuidMixin):
+    __tablename__ = "query_cache_documents"
+
+    person_id = sqlalchemy.Column(models.GUID, nullable=True)
+    data = sqlalchemy.Column(models.JSON_TYPE)
+
+
+@pytest.fixture(name="cache")
+def fixture_cache():
+    return QueryCache(maxsize=2)
+
+
+def _names(query):
+    return sorted(person.name for person in query)
+
+
+def test_query_cache_hit(session, cache):
+    load_people(session)
+    sort_spec = [{"field": "age", "direction": "asc"}]
+
+    query = cache.query(Person, session, [
+        {"field": "age", "op": ">", "value": 30}
+    ], sort_spec)
+    assert [person.name for person in query] == ["alice", "david", "charlie"]
+
+    query = cache.query(Person, session, [
+        {"field": "age", "op": ">", "value": 50}
+    ], sort_spec)
+    assert [person.name for person in query] == ["charlie"]
+    assert query.count() == 1
+
+    assert cache.info() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+
+
+def test_query_cache_shapes(session, cache):
+    people = load_people(session)
+
+    filter_spec = [{"or": [
+        {"field": "name", "op": "in", "value": ["alice", "bob"]},
+        {"field": "name", "op": "like", "value": "c%"},
+    ]}]
+    assert _names(cache.query(Person, session, filter_spec)) == \
+        ["alice", "bob", "charlie"]
+
+    filter_spec = [{"field": "id", "op": "in", "value": [people[3].id]}]
+    assert _names(cache.query(Person, session, filter_spec)) == ["david"]
+
+    filter_spec = [{"field": "id", "op": "not_in", "value": []}]
+    assert len(_names(cache.query(Person, session, filter_spec))) == 4
+
+    assert cache.info()["misses"] == 3
+    assert cache.info()["size"] == 2
+
+
+def test_query_cache_none_value(session, cache):
+    person = load_people(session)[0]
+    session.add_all([
+        Document(person_id=person.id, data={"key": "value"}),
+        Document(data={"key": "other"}),
+    ])
+    session.commit()
+
+    query = cache.query(Document, session, [
+        {"field": "person_id", "value": None}
+    ])
+    assert [doc.data for doc in query] == [{"key": "other"}]
+
+    query = cache.query(Document, session, [
+        {"field": "person_id", "value": person.id}
+    ])
+    assert [doc.data for doc in query] == [{"key": "value"}]
+
+    # JSON columns are compared as strings by pattern operators
+    query = cache.query(Document, session, [
+        {"field": "data", "op": "like", "value": "%other%"}
+    ])
+    assert [doc.data for doc in query] == [{"key": "other"}]
+
+    assert cache.info()["misses"] == 3
+
+
+def test_query_cache_criterion(session, cache):
+    load_people(session)
+    assert cache.criterion(Person) is None
+
+    criterion = cache.criterion(Person, [{"field": "name", "value": "bob"}])
+    assert _names(session.query(Person).filter(criterion)) == ["bob"]
+
+    criterion = cache.criterion(Person, [{"field": "name", "value": "alice"}])
+    assert _names(session.query(Person).filter(criterion)) == ["alice"]
+    assert cache.info()["hits"] == 1
+
+
+def test_query_cache_clear(session, cache):
+    cache.query(Person, session)
+    cache.query(Person, session)
+    assert cache.info() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 2}
+
+    cache.clear()
+    assert cache.info() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 2}
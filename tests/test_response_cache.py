@@ -0,0 +1,127 @@
+import pytest
+
+from fastapi_sqlalchemy.response_cache import ResponseCache, touch
+
+from tests.data.people import load_people, Person, PEOPLE_DATA
+
+
+class Other:
+    pass
+
+
+@pytest.fixture(name="cache")
+def fixture_cache():
+    return ResponseCache(maxsize=2)
+
+
+def _set(cache, key, value):
+    cache.set(key, value, cache.generation(key[0]))
+
+
+def test_response_cache_lru(cache):
+    _set(cache, (Person, 1), [{"name": "alice"}])
+    _set(cache, (Person, 2), [{"name": "bob"}])
+
+    value = cache.get((Person, 1))
+    assert value == [{"name": "alice"}]
+    # a copy is returned every time
+    value.clear()
+    assert cache.get((Person, 1)) == [{"name": "alice"}]
+
+    _set(cache, (Person, 3), [])
+    assert cache.get((Person, 2)) is None
+    assert cache.get((Person, 3)) == []
+    assert cache.info() == {
+        "hits": 3,
+        "misses": 1,
+        "size": 2,
+        "maxsize": 2,
+        "bytes": len('[{"name": "alice"}]') + len("[]"),
+        "max_bytes": cache.max_bytes,
+    }
+
+    cache.clear()
+    assert cache.get((Person, 1)) is None
+    assert cache.info()["bytes"] == 0
+
+
+def test_response_cache_ttl(mocker, cache):
+    monotonic = mocker.patch("time.monotonic", return_value=100.0)
+    _set(cache, (Person, 1), {"name": "alice"})
+
+    monotonic.return_value = 100.0 + cache.ttl - 1
+    assert cache.get((Person, 1)) == {"name": "alice"}
+
+    monotonic.return_value = 100.0 + cache.ttl + 1
+    assert cache.get((Person, 1)) is None
+    assert cache.info()["size"] == 0
+
+
+def test_response_cache_max_bytes():
+    cache = ResponseCache(max_bytes=9)
+    _set(cache, (Person, 1), "0123")  # 6 bytes, quoted
+    _set(cache, (Person, 2), "01")
+    assert cache.get((Person, 1)) is None
+    assert cache.get((Person, 2)) == "01"
+
+    # too large to be cached at all
+    _set(cache, (Person, 3), "012345678")
+    assert cache.get((Person, 3)) is None
+    assert cache.get((Person, 2)) == "01"
+
+
+def test_response_cache_invalidate(cache):
+    _set(cache, (Person, 1), 1)
+    _set(cache, (Other, 1), 2)
+
+    cache.invalidate(Person)
+    assert cache.get((Person, 1)) is None
+    assert cache.get((Other, 1)) == 2
+
+
+def test_response_cache_generation(cache):
+    generation = cache.generation(Person)
+    # modified while the value was read: not cached
+    cache.invalidate(Person)
+    cache.set((Person, 1), 1, generation)
+    assert cache.get((Person, 1)) is None
+
+
+def test_response_cache_session_events(session, cache):
+    people = load_people(session)
+
+    _set(cache, (Person, 1), 1)
+    people[0].age = 33
+    session.flush()
+    assert cache.get((Person, 1)) is None
+
+    # re-populated with the uncommitted state by another session
+    _set(cache, (Person, 1), 1)
+    session.commit()
+    assert cache.get((Person, 1)) is None
+
+    _set(cache, (Person, 1), 1)
+    session.add(Person(**{**PEOPLE_DATA[0], "name": "eve", "order": 5}))
+    session.rollback()
+    assert cache.get((Person, 1)) == 1
+
+
+def test_response_cache_rollback(session, cache):
+    people = load_people(session)
+    people[0].age = 99
+    session.flush()
+
+    # read with the flushed changes, that are then rolled back
+    _set(cache, (Person, 1), 99)
+    session.rollback()
+    assert cache.get((Person, 1)) is None
+
+
+def test_response_cache_touch(session, cache):
+    _set(cache, (Person, 1), 1)
+    touch(session, Person)
+    assert cache.get((Person, 1)) is None
+
+    _set(cache, (Person, 1), 1)
+    session.commit()
+    assert cache.get((Person, 1)) is None
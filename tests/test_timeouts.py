@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+import pytest
+import sqlalchemy
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+
+from fastapi_sqlalchemy import concurrency, timeouts
+
+# Counting to a billion takes minutes, unless interrupted
+SLOW_QUERY = sqlalchemy.text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL "
+    "SELECT x + 1 FROM c WHERE x < 1000000000) SELECT count(*) FROM c"
+)
+
+
+@pytest.fixture(scope="function", name="sqlite")
+def sqlite_fixture(session):
+    if session.get_bind().dialect.name != "sqlite":
+        pytest.skip("statement interruption is tested with sqlite")
+    return session
+
+
+def _slow(session):
+    return session.execute(SLOW_QUERY).scalar()
+
+
+def test_run_sync(session, loop):
+    result = loop.run_until_complete(timeouts.run_sync(
+        session, lambda session, value: value, 1, timeout=5
+    ))
+    assert result == 1
+
+
+def test_run_sync_timeout(sqlite, loop):
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(
+            timeouts.run_sync(sqlite, _slow, timeout=0.1)
+        )
+    assert exc_info.value.status_code == 504
+
+    # the session is usable again
+    assert sqlite.execute(sqlalchemy.text("SELECT 1")).scalar() == 1
+
+
+def test_run_sync_default_timeout(sqlite, loop):
+    sqlite.info[timeouts.INFO_KEY] = 0.1
+    assert timeouts.default_timeout(sqlite) == 0.1
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(timeouts.run_sync(sqlite, _slow))
+    assert exc_info.value.status_code == 504
+
+
+def test_run_sync_queued(session, loop):
+    executor = concurrency.configure_executor(max_workers=1)
+    release = threading.Event()
+    called = []
+
+    async def _run():
+        blocked = asyncio.ensure_future(executor.run(release.wait))
+        try:
+            return await timeouts.run_sync(
+                session, lambda session: called.append(1), timeout=0.05
+            )
+        finally:
+            release.set()
+            await blocked
+
+    try:
+        with pytest.raises(HTTPException) as exc_info:
+            loop.run_until_complete(_run())
+        assert exc_info.value.status_code == 503
+        assert not called
+    finally:
+        concurrency.configure_executor()
+
+
+def test_run_sync_disconnect(sqlite, loop):
+    async def _receive():
+        await asyncio.sleep(0.1)
+        return {"type": "http.disconnect"}
+
+    request = Request({"type": "http", "method": "GET"}, _receive)
+
+    async def _run():
+        return await timeouts.run_sync(sqlite, _slow, request=request)
+
+    with pytest.raises(HTTPException) as exc_info:
+        loop.run_until_complete(_run())
+    assert exc_info.value.status_code == 503
+
+
+def test_run_sync_error(sqlite, loop):
+    def _invalid(session):
+        return session.execute(sqlalchemy.text("SELECT * FROM missing"))
+
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        loop.run_until_complete(
+            timeouts.run_sync(sqlite, _invalid, timeout=5)
+        )